@@ -1,10 +1,19 @@
 from flask import Flask, jsonify, request, send_from_directory
 from flask_cors import CORS
-from pathlib import Path
 import json
+import math
 import os
 import shutil
-from recipe_matcher import get_recipe_matches, load_inventory, INVENTORY_PATH
+import threading
+from recipe_matcher import get_recipe_matches, build_inventory_flags, DEFAULT_ENGINE, FILTERS
+from recipe_sources import get_catalog, load_favorite_ids, use_sqlite
+from recipe_index import get_ingredient_index
+from match_cache import MATCH_CACHE
+from matcher_session import MatcherSession
+from inventory_store import STORE
+from buy_optimizer import get_purchase_suggestions
+from shopping_list import build_shopping_list, recipes_by_ids
+from meal_planner import DEFAULT_BUDGET, get_meal_plan
 
 app = Flask(__name__, static_folder="static")
 
@@ -39,30 +48,49 @@ def home():
 
 # ---- Inventory ---- #
 
-def load_inventory(path: Path) -> dict:
-    if not path.exists():
-        default = {
-            "salt": {"quantity": 1, "unit": "tsp"},
-            "pepper": {"quantity": 1, "unit": "tsp"}
-        }
-        path.write_text(json.dumps(default, indent=2), encoding="utf-8")
-        return default
-    try:
-        raw = json.loads(path.read_text(encoding="utf-8"))
-        for item in raw.values():
-            item["quantity"] = float(item.get("quantity", 0))
-    except Exception as e:
-        print(f"[warn] Could not parse inventory JSON: {e}")
-        return {}
-    return raw
-
-
-
-def save_inventory(data):
-
-    for item in data.values():
-        item["quantity"] = float(item.get("quantity", 0))
-    INVENTORY_PATH.write_text(json.dumps(data, indent=2), encoding="utf-8")
+# The pantry lives in inventory_store.STORE: in memory behind a lock, every change
+# appended to a journal that gets folded back into inventory.json now and then.
+def _inventory_changed(txn):
+    # Last step inside STORE.transaction(): edits reach the session in the same order
+    # they reach the store. Cached matches were computed for the old pantry.
+    MATCH_CACHE.clear()
+    _sync_session(txn.items())
+
+# One incremental matcher for the pantry. Inventory edits push their change into it
+# so the next match only has to touch recipes that use the edited ingredient.
+_session = None
+_session_lock = threading.Lock()
+
+def _use_session() -> bool:
+    # matching runs in SQLite / the shared file; the session would load the whole catalog
+    return not (use_sqlite() or DEFAULT_ENGINE == "shared")
+
+def _sync_session(inv) -> None:
+    # Mutation path only. A session built for an older catalog is dropped here and
+    # rebuilt by the next read, so an edit never waits for the index to load.
+    global _session
+    if not _use_session():
+        return
+    with _session_lock:
+        if _session is None:
+            return
+        if _session.index is get_ingredient_index():
+            _session.sync(build_inventory_flags(inv))
+        else:
+            _session = None
+
+def _matcher_session(inv) -> MatcherSession:
+    # Read path: builds the session on first use (or after a catalog reload) but never
+    # syncs it. If it doesn't own exactly this pantry (an edit from another worker, or
+    # one racing this read) the matcher just doesn't use it, see candidates_if_owns.
+    global _session
+    if not _use_session():
+        return None
+    index = get_ingredient_index()
+    with _session_lock:
+        if _session is None or _session.index is not index:
+            _session = MatcherSession(index, build_inventory_flags(inv))
+        return _session
 
 def _to_ui_shape(inv):
     out = {}
@@ -79,8 +107,7 @@ def _to_ui_shape(inv):
 
 @app.route("/api/inventory", methods=["GET"])
 def get_inventory():
-    inv = load_inventory(INVENTORY_PATH)
-    return jsonify(_to_ui_shape(inv))
+    return jsonify(_to_ui_shape(STORE.items()))
 
 @app.route("/api/inventory", methods=["POST"])
 def add_inventory_item():
@@ -93,62 +120,172 @@ def add_inventory_item():
     if not name:
         return jsonify({"error": "name required"}), 400
 
-    inv = load_inventory(INVENTORY_PATH) or {}
-
-
-    inv[name] = {"quantity": qty, "unit": unit}
-    save_inventory(inv)
+    with STORE.transaction() as txn:
+        item = txn.set(name, {"quantity": qty, "unit": unit})
+        _inventory_changed(txn)
 
     return jsonify({"message": "Item added/updated",
-                    "item": {"quantity": qty, "unit": unit}}), 201
+                    "item": item}), 201
+
+
+# Batch edits: one validation pass, one journal record, one cache invalidation.
+# Body: {"ops": [...]} (or just the list), each op one of
+#   {"op": "upsert", "name": "rice", "quantity": 2, "unit": "cup"}
+#   {"op": "delete", "name": "rice"}
+#   {"op": "adjust", "name": "rice", "delta": -0.5}     <- quantity change, never below 0
+# Quantities and deltas have to be finite numbers, upsert quantities not negative.
+# Nothing is applied unless every op is valid.
+BATCH_OPS = ("upsert", "delete", "adjust")
+MAX_BATCH = 1000
+
+def _parse_batch(data):
+    ops = data.get("ops") if isinstance(data, dict) else data
+    if not isinstance(ops, list) or not ops:
+        return None, [{"error": "expected a non-empty list of ops"}]
+    if len(ops) > MAX_BATCH:
+        return None, [{"error": f"at most {MAX_BATCH} ops per request"}]
+    parsed, errors = [], []
+    for i, op in enumerate(ops):
+        if not isinstance(op, dict):
+            errors.append({"index": i, "error": "op must be an object"})
+            continue
+        kind = op.get("op")
+        name = normalize_name(op.get("name", ""))
+        if kind not in BATCH_OPS:
+            errors.append({"index": i, "error": f"op must be one of {', '.join(BATCH_OPS)}"})
+            continue
+        if not name:
+            errors.append({"index": i, "error": "name required"})
+            continue
+        number = op.get("delta" if kind == "adjust" else "quantity", 0)
+        if kind != "delete":
+            try:
+                number = float(number or 0)
+            except (TypeError, ValueError):
+                errors.append({"index": i, "error": "quantity/delta must be a number"})
+                continue
+            if not math.isfinite(number):
+                errors.append({"index": i, "error": "quantity/delta must be a finite number"})
+                continue
+            if kind == "upsert" and number < 0:
+                errors.append({"index": i, "error": "quantity must not be negative"})
+                continue
+        unit = op.get("unit")
+        parsed.append((kind, name, number, unit.strip() if isinstance(unit, str) else None))
+    return parsed, errors
+
+@app.route("/api/inventory", methods=["PATCH"])
+def patch_inventory():
+    ops, errors = _parse_batch(request.get_json(silent=True))
+    if errors:
+        return jsonify({"error": "invalid batch", "details": errors}), 400
+
+    with STORE.transaction() as txn:
+        for kind, name, number, unit in ops:
+            if kind == "delete":
+                txn.delete(name)
+            elif kind == "upsert":
+                txn.set(name, {"quantity": number, "unit": unit or ""})
+            else:
+                item = txn.get(name) or {"quantity": 0.0, "unit": ""}
+                txn.set(name, {"quantity": max(item["quantity"] + number, 0.0),
+                               "unit": item["unit"] if unit is None else unit})
+        inv = txn.items()
+        _inventory_changed(txn)
+    return jsonify({"version": txn.version, "applied": len(ops), "inventory": _to_ui_shape(inv)})
 
 
 @app.route("/api/inventory/reset", methods=["POST"])
 def reset_inventory():
 
-    save_inventory({})
+    with STORE.transaction() as txn:
+        txn.reset()
+        _inventory_changed(txn)
     return jsonify({"message": "Inventory reset"})
 
 
 @app.route("/api/inventory/<name>", methods=["PUT"])
 def update_inventory_item(name):
     name = normalize_name(name)
-    inv = load_inventory(INVENTORY_PATH) or {}
-    if name not in inv:
-        return jsonify({"error": "Not found"}), 404
-
     data = request.json or {}
     qty = float(data.get("quantity", 0) or 0)
     unit = (data.get("unit") or "").strip() 
 
-    inv[name] = {"quantity": qty, "unit": unit}
-    save_inventory(inv)
-    return jsonify({"message": "Updated", "item": {"quantity": qty, "unit": unit}})
+    with STORE.transaction() as txn:
+        if name not in txn:
+            return jsonify({"error": "Not found"}), 404
+        item = txn.set(name, {"quantity": qty, "unit": unit})
+        _inventory_changed(txn)
+    return jsonify({"message": "Updated", "item": item})
 
 
 @app.route("/api/inventory/<name>", methods=["DELETE"])
 def delete_inventory_item(name):
     name = normalize_name(name)
-    inv = load_inventory(INVENTORY_PATH)
-    if name not in inv:
+    with STORE.transaction() as txn:
+        removed = txn.delete(name)
+        if removed is not None:
+            _inventory_changed(txn)
+    if removed is None:
         return jsonify({"error": "Not found"}), 404
-
-    removed = inv.pop(name)
-    save_inventory(inv)
     return jsonify({"message": "Deleted", "item": removed})
 
 
+# ?quantities=1: having too little of an ingredient counts as missing it
+# (default from RECIPE_MATCH_QUANTITIES=1)
+MATCH_QUANTITIES = os.environ.get("RECIPE_MATCH_QUANTITIES", "0") == "1"
+
+# ?fuzzy=1: "chicken" in the pantry also covers "chicken thigh" (default from RECIPE_MATCH_FUZZY=1)
+MATCH_FUZZY = os.environ.get("RECIPE_MATCH_FUZZY", "0") == "1"
+
+def _flag_arg(name, default):
+    value = request.args.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes")
+
+def _use_quantities():
+    return _flag_arg("quantities", MATCH_QUANTITIES)
+
+# ?category=Dessert&area=Indian,Thai&tags=Spicy&require=chicken&exclude=peanut
+# (repeat a parameter or separate values with commas; cuisine= is the same as area=)
+FILTER_ALIASES = {"cuisine": "area", "tag": "tags"}
+
+def _filter_args():
+    filters = {name: [] for name in FILTERS}
+    for param in list(FILTERS) + list(FILTER_ALIASES):
+        for value in request.args.getlist(param):
+            filters[FILTER_ALIASES.get(param, param)] += [v for v in value.split(",") if v.strip()]
+    return filters
+
 @app.route("/api/inventory/recipes")
 def api_inventory_recipes():
-    raw = load_inventory(INVENTORY_PATH)
-    inventory = _to_bool_inv(raw) 
-    matches = get_recipe_matches(inventory)
-
-    combined = matches["cookable"] + matches["near"]
-    search = (request.args.get("search") or "").strip().lower()
-    if search:
-        combined = [r for r in combined if search in r.get("title", "").lower()]
-    return jsonify({"recipes": combined})
+    raw = STORE.items()
+    quantities = _use_quantities()
+    fuzzy = _flag_arg("fuzzy", MATCH_FUZZY)
+    inventory = raw if quantities else _to_bool_inv(raw)
+    # a search picks the recipes first (search_index.py), then only those get matched
+    search = request.args.get("search") or None
+    matches = get_recipe_matches(inventory, session=_matcher_session(inventory), quantities=quantities, fuzzy=fuzzy, search=search)
+    return jsonify({"recipes": matches["cookable"] + matches["near"]})
+
+# What to buy next: ?n=5&max_missing=2&exclude=saffron,truffle
+@app.route("/api/inventory/suggestions")
+def api_inventory_suggestions():
+    n = min(max(request.args.get("n", 5, type=int), 1), 50)
+    max_missing = min(max(request.args.get("max_missing", 2, type=int), 1), 10)
+    exclude = [v for value in request.args.getlist("exclude") for v in value.split(",") if v.strip()]
+    return jsonify(get_purchase_suggestions(_to_bool_inv(STORE.items()), n, max_missing, exclude))
+
+# ?n=7&max_missing=2&budget=1 plus the same search= and filter parameters as matching
+# (e.g. tags=Dinner). budget is the seconds spent looking for a cheaper plan.
+@app.route("/api/meal-plan")
+def api_meal_plan():
+    n = min(max(request.args.get("n", 7, type=int), 1), 31)
+    max_missing = min(max(request.args.get("max_missing", 2, type=int), 0), 5)
+    budget = min(max(request.args.get("budget", DEFAULT_BUDGET, type=float), 0.05), 10.0)
+    search = request.args.get("search") or None
+    return jsonify(get_meal_plan(STORE.items(), n, max_missing, budget, search, _filter_args()))
 
 # ---- Recipes ---- #
 
@@ -158,16 +295,34 @@ def get_recipes():
 
 @app.route("/api/recipes/match")
 def api_match_recipes():
-    raw = load_inventory(INVENTORY_PATH)
-    inventory = _to_bool_inv(raw)
-    matches = get_recipe_matches(inventory, max_missing=3, top=50)
-    recipes = matches["cookable"] + matches["near"]
-
-    search = request.args.get("search", "").lower()
-    if search:
-        recipes = [r for r in recipes if search in r["title"].lower()]
-
-    return jsonify({"recipes": recipes})
+    raw = STORE.items()
+    quantities = _use_quantities()
+    fuzzy = _flag_arg("fuzzy", MATCH_FUZZY)
+    inventory = raw if quantities else _to_bool_inv(raw)
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    limit = min(max(request.args.get("limit", 50, type=int), 0), 500)
+
+    # cookable comes before near, so offset+limit from each bucket covers the page.
+    # A search and the filters narrow the candidates before matching; a search also
+    # orders them by relevance. facets counts every match per category / area / tag
+    # (off by default with the sql and shared engines: counting needs the catalog in
+    # memory, which those engines are there to avoid).
+    search = request.args.get("search") or None
+    facets = _flag_arg("facets", DEFAULT_ENGINE not in ("sql", "shared"))
+    matches = get_recipe_matches(inventory, max_missing=3, top=offset + limit, session=_matcher_session(inventory), quantities=quantities, fuzzy=fuzzy,
+                                 search=search, filters=_filter_args(), facets=facets)
+    recipes = (matches["cookable"] + matches["near"])[offset:offset + limit]
+    total = matches["counts"]["cookable"] + matches["counts"]["near"]
+
+    return jsonify({"recipes": recipes, "total": total, "offset": offset, "limit": limit, "facets": matches.get("facets")})
+
+@app.route("/api/catalog/stats")
+def api_catalog_stats():
+    return jsonify(get_catalog().stats())
+
+@app.route("/api/recipes/cache/stats")
+def api_match_cache_stats():
+    return jsonify(MATCH_CACHE.stats())
 
 
 # ---- Favorites ---- #
@@ -206,6 +361,30 @@ def delete_favorite():
     return jsonify({"message": "Favorite removed"})
 
 
+# ---- Shopping list ---- #
+
+# GET /api/shopping-list?ids=52795,52772&favorites=1 or POST {"ids": [...], "favorites": true}.
+# A recipe id given twice counts twice (e.g. a meal plan). favorites are the ids in
+# data/favorites.json, the same ones shopping_list.py --favorites and favorites_cli use.
+@app.route("/api/shopping-list", methods=["GET", "POST"])
+def api_shopping_list():
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        ids = data.get("ids") or []
+        with_favorites = bool(data.get("favorites"))
+        if not isinstance(ids, list):
+            return jsonify({"error": "ids must be a list"}), 400
+    else:
+        ids = [v for value in request.args.getlist("ids") for v in value.split(",") if v.strip()]
+        with_favorites = _flag_arg("favorites", False)
+    if with_favorites:
+        ids = list(ids) + sorted(load_favorite_ids())
+    recipes = recipes_by_ids(ids)
+    if not recipes:
+        return jsonify({"error": "no known recipe ids given"}), 400
+    return jsonify(build_shopping_list(recipes, STORE.items()))
+
+
 @app.get("/")
 def index():
     return send_from_directory(app.static_folder, "index.html")
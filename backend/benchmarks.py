@@ -0,0 +1,968 @@
+# Benchmarks for the matcher on synthetic catalogs (no network, no data files needed)
+#
+# HOW TO RUN:
+    # python backend/benchmarks.py matching
+    # python backend/benchmarks.py matching --sizes 1000 10000 100000 --pantry 10
+    # python backend/benchmarks.py engines --recipes 50000 --seconds 2
+    # python backend/benchmarks.py titles --meals 2000 --titles 50
+    # python backend/benchmarks.py session --recipes 50000 --edits 500
+    # python backend/benchmarks.py import --meals 200 --latency 0.05
+    # python backend/benchmarks.py memory --recipes 50000
+    # python backend/benchmarks.py shared --recipes 100000 --workers 4
+    # python backend/benchmarks.py inventory --threads 8 --processes 4 --ops 200
+    # python backend/benchmarks.py quantities --recipes 50000
+    # python backend/benchmarks.py canonicalize --calls 2000000
+    # python backend/benchmarks.py fuzzy --vocab 20000
+    # python backend/benchmarks.py search --recipes 50000
+    # python backend/benchmarks.py facets --recipes 50000
+    # python backend/benchmarks.py buy --recipes 50000 --n 10
+    # python backend/benchmarks.py plan --recipes 50000 --n 14 --budgets 0.1 1 5
+# OUTPUT: timings per catalog size for each matching strategy
+# ------------------------------------------------------------
+
+import argparse
+import copy
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import random
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List
+from urllib.parse import parse_qs, urlparse
+
+import catalog_snapshot
+import recipe_sources
+from match_cache import MATCH_CACHE
+from recipe_index import Recipe, build_ingredient_index, build_bitset_index, build_quantity_index, get_recipe_lookup, prepare_meals, title_ranks, np
+from recipe_matcher import (
+    get_recipe_matches,
+    partition_prepared, partition_indexed, partition_bitset, scan_candidates, indexed_candidates, top_buckets,
+    build_inventory_amounts, quantity_shortfalls, with_shortfalls, SEARCH_SCAN_RATIO,
+)
+from matcher_session import MatcherSession
+from bulk_import import MealDBClient
+from http_cache import HttpCache
+from shared_catalog import SharedIndex, write_shared
+from inventory_store import InventoryStore, read_inventory
+from ingredients import SYNONYMS, ingredient_key
+from fuzzy_match import FuzzyIndex, trigrams
+from search_index import build_search_index, relevance_ranks
+from facet_index import FacetIndex, mask_rids, recipe_facets, rid_mask
+from buy_optimizer import plan_purchases
+from meal_planner import plan_meals
+
+
+# Synthetic data
+# A few common ingredients show up everywhere (salt, onion...), most are rare,
+# which is roughly what TheMealDB looks like.
+def make_vocab(size: int) -> List[str]:
+    return [f"ingredient {i}" for i in range(size)]
+
+def make_recipes(n: int, vocab: List[str], seed: int = 0) -> List[Recipe]:
+    rng = random.Random(seed)
+    weights = [1.0 / (i + 1) for i in range(len(vocab))]
+    recipes = []
+    for rid in range(n):
+        k = rng.randint(3, 15)
+        keys = tuple(dict.fromkeys(rng.choices(vocab, weights=weights, k=k)))
+        recipes.append(Recipe(
+            rid=rid,
+            id=str(100000 + rid),
+            title=f"Recipe {rng.randrange(n)}",
+            image="",
+            instructions="",
+            names=keys,
+            keys=keys,
+            ingredients=tuple((k, "1 cup") for k in keys),
+        ))
+    return recipes
+
+def make_pantry(vocab: List[str], size: int, seed: int = 0) -> Dict[str, bool]:
+    rng = random.Random(seed)
+    # mostly common things plus a couple of rare ones
+    common = vocab[: max(size * 3, 1)]
+    picked = rng.sample(common, min(size, len(common)))
+    return {k: True for k in picked}
+
+def time_it(fn: Callable[[], object], repeat: int) -> float:
+    # best of N, in milliseconds
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def bench_matching(args) -> None:
+    vocab = make_vocab(args.vocab)
+    pantry = make_pantry(vocab, args.pantry)
+    print(f"pantry={len(pantry)} items, vocab={len(vocab)}, max_missing={args.max_missing}")
+    print(f"{'recipes':>9} {'linear ms':>10} {'index ms':>10} {'speedup':>8}")
+    for n in args.sizes:
+        recipes = make_recipes(n, vocab)
+        index = build_ingredient_index(recipes)
+
+        linear = partition_prepared(recipes, pantry, args.max_missing)
+        indexed = partition_indexed(index, pantry, args.max_missing)
+        assert linear == indexed, "index engine disagrees with the linear scan"
+
+        t_lin = time_it(lambda: partition_prepared(recipes, pantry, args.max_missing), args.repeat)
+        t_idx = time_it(lambda: partition_indexed(index, pantry, args.max_missing), args.repeat)
+        print(f"{n:>9} {t_lin:>10.2f} {t_idx:>10.2f} {t_lin / t_idx:>7.1f}x")
+
+
+def queries_per_second(fn: Callable[[], object], seconds: float) -> float:
+    done = 0
+    t0 = time.perf_counter()
+    while True:
+        fn()
+        done += 1
+        elapsed = time.perf_counter() - t0
+        if elapsed >= seconds:
+            return done / elapsed
+
+
+def bench_engines(args) -> None:
+    vocab = make_vocab(args.vocab)
+    recipes = make_recipes(args.recipes, vocab)
+    # a different pantry per query so nothing gets lucky with one shape
+    pantries = [make_pantry(vocab, args.pantry, seed=s) for s in range(32)]
+
+    engines = {
+        "scan": (lambda inv: partition_prepared(recipes, inv, args.max_missing)),
+    }
+    index = build_ingredient_index(recipes)
+    engines["index"] = lambda inv: partition_indexed(index, inv, args.max_missing)
+    bits_int = build_bitset_index(recipes, use_numpy=False)
+    engines["bitset (int)"] = lambda inv: partition_bitset(bits_int, inv, args.max_missing)
+    if np is not None:
+        bits_np = build_bitset_index(recipes, use_numpy=True)
+        engines["bitset (numpy)"] = lambda inv: partition_bitset(bits_np, inv, args.max_missing)
+    else:
+        print("[info] numpy not installed, skipping the numpy bitset engine")
+
+    expected = [engines["scan"](inv) for inv in pantries]
+    for name, run in engines.items():
+        assert [run(inv) for inv in pantries] == expected, f"{name} disagrees with scan"
+
+    print(f"recipes={len(recipes)}, vocab={len(vocab)}, pantry={args.pantry}, max_missing={args.max_missing}")
+    print(f"{'engine':>15} {'queries/s':>10}")
+    for name, run in engines.items():
+        state = {"i": 0}
+        def one_query():
+            state["i"] += 1
+            run(pantries[state["i"] % len(pantries)])
+        print(f"{name:>15} {queries_per_second(one_query, args.seconds):>10.1f}")
+
+
+# Duplicate titles (regression check): a catalog where many recipes share a strMeal
+# but not their ingredients. Every match has to carry its own record's id, ingredients
+# and missing list, on every in-memory engine, and the title lookup has to keep all of
+# them apart. Runs against a throwaway catalog in place of data/recipes.json.
+def bench_titles(args) -> None:
+    rng = random.Random(6)
+    vocab = [f"ingredient {i}" for i in range(40)]
+    meals = []
+    for i in range(args.meals):
+        meal = {"idMeal": str(60000 + i), "strMeal": f"Stew {i % args.titles}", "strMealThumb": "", "strInstructions": ""}
+        for j, ing in enumerate(rng.sample(vocab, rng.randint(3, 8)), start=1):
+            meal[f"strIngredient{j}"] = ing
+            meal[f"strMeasure{j}"] = "1 cup"
+        meals.append(meal)
+    by_id = {m["idMeal"]: m for m in meals}
+    pantry = {k: True for k in vocab[:25]}
+
+    def names_of(meal):
+        return [meal[f"strIngredient{j}"] for j in range(1, 21) if meal.get(f"strIngredient{j}")]
+
+    saved = (recipe_sources.CATALOG, catalog_snapshot.ENABLED)
+    recipe_sources.CATALOG = recipe_sources.RecipeCatalog([], reader=lambda: meals)
+    catalog_snapshot.ENABLED = False   # don't replace the real catalog's snapshot
+    MATCH_CACHE.clear()
+    try:
+        for engine in ("scan", "index", "bitset"):
+            t0 = time.perf_counter()
+            matches = get_recipe_matches(pantry, max_missing=3, top=None, engine=engine)
+            results = matches["cookable"] + matches["near"]
+            for m in results:
+                meal = by_id[m["id"]]
+                names = names_of(meal)
+                assert m["title"] == meal["strMeal"], f"{engine}: title of {m['id']}"
+                assert [i["name"] for i in m["ingredients"]] == names, f"{engine}: ingredients of {m['id']}"
+                assert m["missing"] == [n for n in names if not pantry.get(n)], f"{engine}: missing list of {m['id']}"
+            print(f"[ok] {engine:>6}: {len(results)} matches, each with its own record "
+                  f"({(time.perf_counter() - t0) * 1000:.1f} ms)")
+        lookup = get_recipe_lookup()
+        grouped = [r for group in lookup.by_title.values() for r in group]
+        assert sorted(r.id for r in grouped) == sorted(by_id), "title lookup lost or repeated a recipe"
+        for title, group in lookup.by_title.items():
+            for r in group:
+                assert r.title.lower() == title and list(r.names) == names_of(by_id[r.id])
+        print(f"[ok] title lookup keeps {args.meals} recipes under {len(lookup.by_title)} shared titles apart")
+    finally:
+        recipe_sources.CATALOG, catalog_snapshot.ENABLED = saved
+        MATCH_CACHE.clear()
+
+
+def bench_session(args) -> None:
+    # Random add/remove edits: after every edit the session must agree with a full
+    # recompute, for every max_missing up to (and past) what it tracks
+    vocab = make_vocab(args.vocab)
+    recipes = make_recipes(args.recipes, vocab)
+    index = build_ingredient_index(recipes)
+    rng = random.Random(args.seed)
+    pantry = make_pantry(vocab, args.pantry, seed=args.seed)
+    session = MatcherSession(index, pantry)
+
+    edit_ms = 0.0
+    full_ms = 0.0
+    for step in range(args.edits):
+        key = rng.choice(vocab[:200]) if rng.random() < 0.8 else rng.choice(vocab)
+        have_it = not pantry.get(key, False)
+        pantry[key] = have_it
+
+        t0 = time.perf_counter()
+        session.set_have(key, have_it)
+        edit_ms += (time.perf_counter() - t0) * 1000
+
+        max_missing = rng.randint(0, session.max_tracked + 2)
+        t0 = time.perf_counter()
+        expected = sorted(scan_candidates(recipes, pantry, max_missing))
+        full_ms += (time.perf_counter() - t0) * 1000
+        got = sorted(session.candidates(max_missing))
+        assert got == expected, f"session disagrees with full recompute at edit {step} ({key})"
+
+    print(f"recipes={len(recipes)}, edits={args.edits}: session matches full recompute")
+    print(f"avg per edit: incremental {edit_ms / args.edits:.3f} ms, full recompute {full_ms / args.edits:.3f} ms")
+
+
+# Stand-in for TheMealDB
+# Serves filter.php / lookup.php for `meals` fake meals, with a fixed delay per request
+# and a 503 on the first lookup of every `fail_every`-th meal, so retries get exercised.
+class FakeMealDB:
+    def __init__(self, meals: int, latency: float = 0.0, fail_every: int = 0):
+        self.ids = [str(60000 + i) for i in range(meals)]
+        self.latency = latency
+        self.fail_every = fail_every
+        self.requests = 0
+        self.failed = 0
+        self.not_modified = 0
+        self.connections = set()
+        self._seen_failures = set()
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api/json/v1/1"
+
+    def meal(self, mid: str) -> dict:
+        n = int(mid) - 60000
+        out = {"idMeal": mid, "strMeal": f"Fake Meal {n}", "strInstructions": "Cook."}
+        for i in range(1, 21):
+            out[f"strIngredient{i}"] = f"ingredient {(n + i) % 50}" if i <= 8 else ""
+            out[f"strMeasure{i}"] = "1 cup" if i <= 8 else ""
+        return out
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is visible
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, payload: dict) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if status == 200 and self.headers.get("If-None-Match") == etag:
+                    with fake._lock:
+                        fake.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if status == 200:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                with fake._lock:
+                    fake.requests += 1
+                    fake.connections.add(self.client_address)
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if url.path.endswith("/filter.php"):
+                    self._send(200, {"meals": [{"idMeal": mid, "strMeal": fake.meal(mid)["strMeal"]} for mid in fake.ids]})
+                elif url.path.endswith("/lookup.php"):
+                    mid = query.get("i", "")
+                    if mid not in fake.ids:
+                        self._send(200, {"meals": None})
+                        return
+                    with fake._lock:
+                        fail = (fake.fail_every and (int(mid) - 60000) % fake.fail_every == 0
+                                and mid not in fake._seen_failures)
+                        if fail:
+                            fake._seen_failures.add(mid)
+                            fake.failed += 1
+                    if fail:
+                        self._send(503, {"error": "try again"})
+                    else:
+                        self._send(200, {"meals": [fake.meal(mid)]})
+                else:
+                    self._send(404, {"error": "not found"})
+
+        return Handler
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def bench_import(args) -> None:
+    print(f"meals={args.meals}, latency={args.latency * 1000:.0f} ms/request, 503 on every {args.fail_every}th meal once")
+    print(f"{'workers':>8} {'seconds':>8} {'meals':>6} {'requests':>9} {'connections':>12}")
+    for workers in args.workers:
+        with FakeMealDB(args.meals, args.latency, args.fail_every) as fake:
+            client = MealDBClient(fake.base_url, workers=workers, retries=3, backoff=0.01, rate=args.rate)
+            t0 = time.perf_counter()
+            ids = client.fetch_ids_from_filter("ingredient", "anything")
+            meals = client.fetch_full_meals(ids)
+            elapsed = time.perf_counter() - t0
+            client.close()
+            assert [m["idMeal"] for m in meals] == fake.ids, "missing or out-of-order meals"
+            print(f"{workers:>8} {elapsed:>8.2f} {len(meals):>6} {fake.requests:>9} {len(fake.connections):>12}")
+
+    # Re-imports through the on-disk cache: fresh entries cost nothing, stale ones a 304
+    with FakeMealDB(args.meals, args.latency) as fake, tempfile.TemporaryDirectory() as tmp:
+        def run(ttl):
+            cache = HttpCache(Path(tmp), ttl=ttl)
+            client = MealDBClient(fake.base_url, workers=8, cache=cache)
+            before = fake.requests
+            t0 = time.perf_counter()
+            meals = client.fetch_full_meals(client.fetch_ids_from_filter("ingredient", "anything"))
+            elapsed = time.perf_counter() - t0
+            client.close()
+            assert len(meals) == args.meals
+            return elapsed, fake.requests - before, cache.stats()
+
+        print("\nHTTP cache (8 workers):")
+        for label, ttl in (("cold", 3600), ("fresh", 3600), ("stale/304", 0)):
+            elapsed, reqs, st = run(ttl)
+            print(f"{label:>10} {elapsed:>6.2f}s  requests={reqs:<5} {st}")
+
+
+def make_mealdb_json(n: int, seed: int = 0) -> str:
+    # recipes.json text for n TheMealDB-shaped meals (all 20 ingredient/measure slots,
+    # the usual empty strings, a few paragraphs of instructions)
+    rng = random.Random(seed)
+    vocab = ["Chicken", "Onion", "Garlic", "Salt", "Pepper", "Olive Oil", "Tomatoes", "Butter",
+             "Flour", "Eggs", "Milk", "Sugar", "Rice", "Cumin", "Ginger", "Lemon"] + [f"Spice {i}" for i in range(300)]
+    measures = ["1 tsp", "2 tbsp", "500g", "1 cup", "3 cloves", "1/2 cup", "200ml", "To taste"]
+    meals = []
+    for i in range(n):
+        k = rng.randint(5, 15)
+        ings = rng.sample(vocab, k)
+        meal = {
+            "idMeal": str(52000 + i), "strMeal": f"Recipe number {i}", "strDrinkAlternate": None,
+            "strCategory": rng.choice(["Chicken", "Beef", "Dessert", "Vegetarian"]),
+            "strArea": rng.choice(["Indian", "Italian", "British", "Mexican"]),
+            "strInstructions": " ".join(f"Step {j}: stir the pot and cook for {rng.randint(2, 30)} minutes." for j in range(12)),
+            "strMealThumb": f"https://www.themealdb.com/images/media/meals/{i:06d}.jpg",
+            "strTags": "Dinner,Spicy", "strYoutube": f"https://www.youtube.com/watch?v={i:011d}",
+            "strSource": "", "strImageSource": None, "strCreativeCommonsConfirmed": None, "dateModified": None,
+        }
+        for j in range(1, 21):
+            meal[f"strIngredient{j}"] = ings[j - 1] if j <= k else ""
+            meal[f"strMeasure{j}"] = rng.choice(measures) if j <= k else " "
+        meals.append(meal)
+    return json.dumps({"meals": meals})
+
+
+def allocated_bytes(build: Callable[[], object]):
+    # (object, bytes still allocated by building it)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, after - before
+
+
+def bench_memory(args) -> None:
+    text = make_mealdb_json(args.recipes)
+    meals, raw_bytes = allocated_bytes(lambda: json.loads(text)["meals"])
+    # build the compact records, then let the raw dicts go (what the catalog does now)
+    compact, compact_bytes = allocated_bytes(lambda: prepare_meals(json.loads(text)["meals"]))
+    n = len(meals)
+    print(f"recipes={n}")
+    print(f"{'representation':>28} {'total MB':>9} {'bytes/recipe':>13}")
+    print(f"{'raw TheMealDB dicts':>28} {raw_bytes / 1e6:>9.1f} {raw_bytes / n:>13.0f}")
+    print(f"{'compact Recipe records':>28} {compact_bytes / 1e6:>9.1f} {compact_bytes / n:>13.0f}")
+    print(f"{'saved':>28} {'':>9} {(raw_bytes - compact_bytes) / n:>13.0f} ({raw_bytes / compact_bytes:.1f}x smaller)")
+    assert compact[5].instructions == meals[5]["strInstructions"]
+
+
+# Per-worker memory: every worker building its own index vs all of them mapping one file.
+# RssAnon is the worker's private memory; the mapped file shows up in RssFile and is
+# shared through the page cache.
+def _rss() -> Dict[str, int]:
+    out = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(("RssAnon:", "RssFile:")):
+                    name, kb = line.split()[:2]
+                    out[name.rstrip(":")] = int(kb) * 1024
+    except OSError:
+        pass  # not Linux
+    return out
+
+def _worker(mode: str, path: str, n: int, vocab_size: int, pantry: int, queries: int, results) -> None:
+    before = _rss()
+    vocab = make_vocab(vocab_size)
+    if mode == "private":
+        recipes = make_recipes(n, vocab)
+        index, ranks = build_ingredient_index(recipes), title_ranks(recipes)
+        shown = recipes
+    else:
+        index = SharedIndex(path)
+        ranks, shown = index.ranks, index.recipes
+    for q in range(queries):
+        inv = make_pantry(vocab, pantry, seed=q)
+        cookable, near, _ = top_buckets(indexed_candidates(index, inv, 2), ranks, 15)
+        [shown[rid].title for rid, _ in cookable + near]
+    after = _rss()
+    results.put({k: after.get(k, 0) - before.get(k, 0) for k in after})
+
+def bench_shared(args) -> None:
+    vocab = make_vocab(args.vocab)
+    recipes = make_recipes(args.recipes, vocab)
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "catalog.shared"
+        write_shared(recipes, title_ranks(recipes), path, tag="benchmark")
+        del recipes
+        print(f"recipes={args.recipes}, workers={args.workers}, file={os.path.getsize(path) / 1e6:.1f} MB")
+        print(f"{'mode':>8} {'private MB/worker':>18} {'file-backed MB/worker':>22}")
+        for mode in ("private", "shared"):
+            results = ctx.Queue()
+            procs = [ctx.Process(target=_worker, args=(mode, str(path), args.recipes, args.vocab,
+                                                      args.pantry, args.queries, results))
+                     for _ in range(args.workers)]
+            for p in procs:
+                p.start()
+            rows = [results.get() for _ in procs]
+            for p in procs:
+                p.join()
+            anon = sum(r.get("RssAnon", 0) for r in rows) / len(rows)
+            file_backed = sum(r.get("RssFile", 0) for r in rows) / len(rows)
+            print(f"{mode:>8} {anon / 1e6:>18.1f} {file_backed / 1e6:>22.1f}")
+
+
+# Inventory store under concurrent writers. Every writer does read-modify-write on one
+# shared counter item (the lost-update case) and sets items of its own; at the end the
+# counter has to equal the number of increments, in memory, on disk and after a reload.
+def _bump(store: InventoryStore, tag: str, ops: int) -> None:
+    for i in range(ops):
+        with store.transaction() as txn:
+            counter = txn.get("counter") or {"quantity": 0}
+            txn.set("counter", {"quantity": counter["quantity"] + 1, "unit": ""})
+            txn.set(f"{tag} item {i % 10}", {"quantity": i, "unit": "g"})
+
+def _inventory_process(path: str, threads: int, ops: int, tag: str) -> None:
+    store = InventoryStore(Path(path), compact_every=50, durable=False)
+    workers = [threading.Thread(target=_bump, args=(store, f"{tag}-{t}", ops)) for t in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+def bench_inventory(args) -> None:
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "inventory.json"
+        path.write_text("{}", encoding="utf-8")
+        t0 = time.perf_counter()
+        procs = [ctx.Process(target=_inventory_process, args=(str(path), args.threads, args.ops, f"p{p}"))
+                 for p in range(args.processes)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - t0
+        expected = args.processes * args.threads * args.ops
+        reloaded = InventoryStore(path).items()
+        on_disk = read_inventory(path)
+        print(f"writers={args.processes} process(es) x {args.threads} thread(s), {args.ops} txn each")
+        print(f"counter: expected {expected}, store {reloaded['counter']['quantity']:.0f}, files {on_disk['counter']['quantity']:.0f}")
+        assert reloaded["counter"]["quantity"] == expected, "lost updates"
+        assert on_disk == reloaded
+        assert len(reloaded) == 1 + args.processes * args.threads * min(10, args.ops)
+        print(f"[ok] no lost updates ({expected / elapsed:.0f} txn/s overall)")
+
+    # latency of one edit: journal append vs rewriting the whole pantry file
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "inventory.json"
+        pantry = {f"item {i}": {"quantity": 1.0, "unit": "g"} for i in range(args.pantry)}
+        path.write_text(json.dumps(pantry, indent=2), encoding="utf-8")
+        store = InventoryStore(path, durable=False)
+
+        def rewrite():
+            inv = json.loads(path.read_text(encoding="utf-8"))
+            inv["item 0"] = {"quantity": 2.0, "unit": "g"}
+            path.write_text(json.dumps(inv, indent=2), encoding="utf-8")
+
+        old = time_it(rewrite, args.repeat)
+        new = time_it(lambda: store.set("item 0", {"quantity": 2.0, "unit": "g"}), args.repeat)
+        print(f"pantry={args.pantry}: full rewrite {old:.3f} ms/edit, journal {new:.3f} ms/edit")
+
+
+# Quantity-aware matching costs one vectorized compare over every parsed measure on
+# top of the boolean match; this checks it stays in the same ballpark.
+def bench_quantities(args) -> None:
+    vocab = make_vocab(args.vocab)
+    rng = random.Random(1)
+    measures = ["1 cup", "200g", "2 tbsp", "1/2 tsp", "3", "1 kg", "to taste", "250 ml"]
+    recipes = [Recipe(r.rid, r.id, r.title, r.image, "", r.names, r.keys,
+                      [(k, rng.choice(measures)) for k in r.keys])
+               for r in make_recipes(args.recipes, vocab)]
+    index = build_ingredient_index(recipes)
+    ranks = title_ranks(recipes)
+    t0 = time.perf_counter()
+    qindex = build_quantity_index(recipes)
+    build_ms = (time.perf_counter() - t0) * 1000
+    units = ["g", "kg", "cup", "ml", "pcs"]
+    pantries = []
+    for s in range(32):
+        flags = make_pantry(vocab, args.pantry, seed=s)
+        inv = {k: {"quantity": rng.choice([1, 2, 100, 500]), "unit": rng.choice(units)} for k in flags}
+        pantries.append((flags, build_inventory_amounts(inv)))
+
+    def boolean(flags, amounts):
+        return top_buckets(indexed_candidates(index, flags, args.max_missing), ranks, 15)
+
+    def quantities(flags, amounts):
+        short = quantity_shortfalls(qindex, amounts)
+        return top_buckets(with_shortfalls(indexed_candidates(index, flags, args.max_missing), short, args.max_missing), ranks, 15)
+
+    print(f"recipes={len(recipes)}, measured entries={len(qindex.slots)}, "
+          f"quantity index built in {build_ms:.0f} ms ({'numpy' if qindex.np_slot_rids is not None else 'pure Python'})")
+    print(f"{'mode':>12} {'queries/s':>10}")
+    for name, run in (("boolean", boolean), ("quantities", quantities)):
+        state = {"i": 0}
+        def one_query():
+            state["i"] += 1
+            run(*pantries[state["i"] % len(pantries)])
+        print(f"{name:>12} {queries_per_second(one_query, args.seconds):>10.1f}")
+
+
+# Ingredient keys: the old per-call path (two regexes + synonym lookup, no plurals)
+# vs the memoized ingredient_key, over a realistic mix of spellings.
+def _legacy_key(name: str) -> str:
+    s = name.lower().strip()
+    s = re.sub(r"[^a-z0-9\s]", " ", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    return SYNONYMS.get(s, s)
+
+def bench_canonicalize(args) -> None:
+    rng = random.Random(0)
+    base = [f"ingredient {i}" for i in range(args.distinct // 4)] + list(SYNONYMS)
+    names = []
+    for b in base:
+        names += [b, b.title(), b + "s", f"  {b.upper()}, chopped"]
+    calls = [rng.choice(names) for _ in range(args.calls)]
+
+    def run(fn):
+        t0 = time.perf_counter()
+        for n in calls:
+            fn(n)
+        return time.perf_counter() - t0
+
+    ingredient_key.cache_clear()
+    t_cold = run(ingredient_key)
+    t_legacy = run(_legacy_key)
+    t_warm = run(ingredient_key)
+    print(f"calls={args.calls}, distinct names={len(set(calls))}")
+    print(f"{'':>28} {'calls/s':>12} {'ns/call':>8}")
+    for label, t in (("two regexes per call", t_legacy), ("memoized (first pass)", t_cold), ("memoized (warm)", t_warm)):
+        print(f"{label:>28} {args.calls / t:>12,.0f} {t / args.calls * 1e9:>8.0f}")
+    info = ingredient_key.cache_info()
+    print(f"cache: {info.currsize} entries, {info.hits} hits, {info.misses} misses")
+
+
+# Fuzzy pantry expansion: indexed + memoized lookups vs comparing every pantry key
+# with every vocabulary key on each query (same scoring, checks the results agree).
+def bench_fuzzy(args) -> None:
+    rng = random.Random(0)
+    letters = "abcdefghijklmnoprstuvw"
+    bases = sorted({"".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(args.vocab // 10)})
+    mods = ["red", "green", "fresh", "smoked", "baby", "wild", "dried", "sweet", "stock", "powder"]
+    vocab = set(bases)
+    while len(vocab) < args.vocab:
+        b = rng.choice(bases)
+        vocab.add(f"{rng.choice(mods)} {b}" if rng.random() < 0.5 else f"{b} {rng.choice(mods)}")
+    vocab = sorted(vocab)
+    pantry = rng.sample(bases, args.pantry)
+
+    t0 = time.perf_counter()
+    index = FuzzyIndex(vocab)
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    def naive(key):
+        words, grams = tuple(key.split()), trigrams(key)
+        out = [(index.keys[pos], round(index._score(key, words, grams, pos), 3)) for pos in range(len(index.keys))]
+        return sorted((t for t in out if t[1] >= args.threshold), key=lambda t: (-t[1], t[0]))
+
+    t0 = time.perf_counter()
+    cold = [index.similar(k, args.threshold) for k in pantry]
+    cold_ms = (time.perf_counter() - t0) * 1000
+    warm_ms = time_it(lambda: [index.similar(k, args.threshold) for k in pantry], 20)
+    naive_ms = time_it(lambda: [naive(k) for k in pantry], 3)
+    assert cold == [naive(k) for k in pantry], "indexed lookup disagrees with the full comparison"
+    found = sum(len(c) for c in cold)
+    print(f"vocab={len(vocab)}, pantry={len(pantry)}, threshold={args.threshold}, index built in {build_ms:.0f} ms")
+    print(f"{'':>24} {'ms/query':>9}")
+    print(f"{'pantry x vocabulary':>24} {naive_ms:>9.2f}")
+    print(f"{'indexed (first time)':>24} {cold_ms:>9.2f}")
+    print(f"{'indexed (memoized)':>24} {warm_ms:>9.3f}")
+    print(f"[ok] same {found} neighbour(s) either way")
+
+
+# Search + match: the old way (match every recipe, then filter titles) vs asking the
+# full-text index first and matching only what it found
+def bench_search(args) -> None:
+    meals = json.loads(make_mealdb_json(args.recipes))["meals"]
+    recipes = prepare_meals(meals)
+    index = build_ingredient_index(recipes)
+    ranks = title_ranks(recipes)
+    t0 = time.perf_counter()
+    queries = ["chicken", "lemon ginger", "spice 12", "dessert", "indian ric", "spicy dinner"]
+    search = build_search_index(recipes)
+    build_ms = (time.perf_counter() - t0) * 1000
+    if search.use_numpy:
+        pure = copy.copy(search)
+        pure.use_numpy = False
+        for q in queries:
+            a, b = search.scores(q), pure.scores(q)
+            assert a.keys() == b.keys() and all(abs(a[r] - b[r]) < 1e-6 for r in a), "numpy and pure Python scores disagree"
+            among = range(0, len(recipes), 3)
+            for scores in (search.scores(q, among), pure.scores(q, among)):
+                assert scores.keys() == {r for r in among if r in a} and all(abs(a[r] - scores[r]) < 1e-6 for r in scores), \
+                    "scores among some recipes disagree with the full scores"
+    pantry = {k: True for k in ["chicken", "onion", "garlic", "salt", "pepper", "oil", "rice", "butter"]}
+
+    def filter_after(q):
+        cookable, near, _ = top_buckets(indexed_candidates(index, pantry, args.max_missing), ranks, None)
+        words = q.lower()
+        return [rid for rid, _ in cookable + near if words in recipes[rid].title.lower()]
+
+    def search_first(q):
+        # same choice match_catalog makes: check the hits, or score only the engine's output
+        if search.estimate(q) * SEARCH_SCAN_RATIO > len(recipes):
+            found = list(indexed_candidates(index, pantry, args.max_missing))
+            scores = search.scores(q, among=[rid for rid, _ in found])
+            subset = [t for t in found if t[0] in scores]
+        else:
+            scores = search.scores(q)
+            subset = list(scan_candidates((recipes[rid] for rid in scores), pantry, args.max_missing))
+        return top_buckets(subset, relevance_ranks(scores, (rid for rid, _ in subset), len(recipes)), 50)
+
+    print(f"recipes={len(recipes)}, {search.stats()['terms']} terms, search index built in {build_ms:.0f} ms")
+    print(f"{'query':>14} {'hits':>6} {'search ms':>10} {'search+match ms':>16} {'match+filter ms':>16}")
+    for q in queries:
+        hits = len(search.scores(q))
+        t_search = time_it(lambda: search.scores(q), args.repeat)
+        t_first = time_it(lambda: search_first(q), args.repeat)
+        t_after = time_it(lambda: filter_after(q), args.repeat)
+        print(f"{q:>14} {hits:>6} {t_search:>10.2f} {t_first:>16.2f} {t_after:>16.2f}")
+
+
+# Facet filters: masks intersected before matching vs checking each match's meal
+# afterwards, plus the cost of facet counts for the whole result
+def bench_facets(args) -> None:
+    meals = json.loads(make_mealdb_json(args.recipes))["meals"]
+    recipes = prepare_meals(meals)
+    index = build_ingredient_index(recipes)
+    ranks = title_ranks(recipes)
+    t0 = time.perf_counter()
+    facets = FacetIndex(recipes)
+    build_ms = (time.perf_counter() - t0) * 1000
+    pantry = {k: True for k in ["chicken", "onion", "garlic", "salt", "pepper", "oil", "rice", "butter"]}
+    spice = index.postings.get("spice 1", ())
+    queries = {
+        "area=Indian": [("area", ["indian"])],
+        "Indian Dessert": [("area", ["indian"]), ("category", ["dessert"])],
+        "-spice 1": [("exclude", None)],
+    }
+
+    def allowed(flt):
+        mask = facets.all
+        for name, values in flt:
+            mask = mask & ~rid_mask(spice, facets.n) if name == "exclude" else mask & facets.mask(name, values)
+        return set(mask_rids(mask, facets.n))
+
+    def mask_first(flt):
+        # same choice match_catalog makes: check the allowed recipes, or filter the engine's output
+        rids = allowed(flt)
+        if len(rids) * SEARCH_SCAN_RATIO > len(recipes):
+            return top_buckets(((rid, c) for rid, c in indexed_candidates(index, pantry, args.max_missing) if rid in rids), ranks, 50)
+        return top_buckets(scan_candidates((recipes[rid] for rid in rids), pantry, args.max_missing), ranks, 50)
+
+    def filter_after(flt):
+        def ok(rid):
+            mf = recipe_facets(recipes[rid])
+            for name, values in flt:
+                if name == "exclude":
+                    if "spice 1" in recipes[rid].keys:
+                        return False
+                elif not {v.lower() for v in mf[name]} & set(values):
+                    return False
+            return True
+        return top_buckets(((rid, c) for rid, c in indexed_candidates(index, pantry, args.max_missing) if ok(rid)), ranks, 50)
+
+    print(f"recipes={len(recipes)}, facet index built in {build_ms:.0f} ms")
+    print(f"{'filters':>16} {'allowed':>8} {'mask first ms':>14} {'filter after ms':>16} {'facet counts ms':>16}")
+    for label, flt in queries.items():
+        a, b = mask_first(flt), filter_after(flt)
+        assert a[2] == b[2] and a[0] == b[0], "mask filter disagrees with checking every match"
+        found = [rid for rid, _ in indexed_candidates(index, pantry, args.max_missing)]
+        t_mask = time_it(lambda: mask_first(flt), args.repeat)
+        t_after = time_it(lambda: filter_after(flt), args.repeat)
+        t_counts = time_it(lambda: facets.counts(rid_mask(found, facets.n)), args.repeat)
+        print(f"{label:>16} {len(allowed(flt)):>8} {t_mask:>14.2f} {t_after:>16.2f} {t_counts:>16.2f}")
+
+
+# What to buy: incremental greedy vs re-matching the catalog once per candidate
+# ingredient per pick (same picks, same tie-breaking)
+def bench_buy(args) -> None:
+    vocab = make_vocab(args.vocab)
+    recipes = make_recipes(args.recipes, vocab)
+    index = build_ingredient_index(recipes)
+    pantry = make_pantry(vocab, args.pantry)
+
+    def naive():
+        near = {rid for rid, c in indexed_candidates(index, pantry, args.max_missing) if c}
+        needed_by: Dict[str, int] = {}
+        for rid in near:
+            for k in recipes[rid].keys:
+                if not pantry.get(k):
+                    needed_by[k] = needed_by.get(k, 0) + 1
+        have = dict(pantry)
+        done = set()
+        picks = []
+        for _ in range(args.n):
+            best = None
+            for k in needed_by:
+                if have.get(k):
+                    continue
+                have[k] = True
+                got = {rid for rid, _ in indexed_candidates(index, have, 0) if rid in near} - done
+                del have[k]
+                cand = (-len(got), -needed_by[k], k)
+                if best is None or cand < best[0]:
+                    best = (cand, k, got)
+            if best is None:
+                break
+            have[best[1]] = True
+            done |= best[2]
+            picks.append((best[1], sorted(best[2])))
+        return picks
+
+    t0 = time.perf_counter()
+    fast = plan_purchases(index, pantry, args.n, args.max_missing)
+    fast_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    slow = naive()
+    naive_ms = (time.perf_counter() - t0) * 1000
+    assert [(k, sorted(r)) for k, r in fast] == slow, "incremental greedy disagrees with re-matching"
+    print(f"recipes={len(recipes)}, vocab={len(vocab)}, pantry={len(pantry)}, max_missing={args.max_missing}, n={args.n}")
+    print(f"{'re-match per ingredient':>26} {naive_ms:>10.1f} ms")
+    print(f"{'incremental greedy':>26} {fast_ms:>10.1f} ms")
+    for k, rids in fast:
+        print(f"  {k:<20} +{len(rids)}")
+
+
+# Meal plans: how many ingredients the plan needs bought for each time budget, next to
+# the plain "n recipes missing the least". First checks the search against trying every
+# n-recipe combination on a small catalog.
+def bench_plan(args) -> None:
+    def candidates_of(recipes, pantry, max_missing):
+        bit_of: Dict[str, int] = {}
+        out = []
+        for rid, _ in sorted(indexed_candidates(build_ingredient_index(recipes), pantry, max_missing), key=lambda t: (t[1], t[0])):
+            mask = 0
+            for k in recipes[rid].keys:
+                if not pantry.get(k):
+                    mask |= 1 << bit_of.setdefault(k, len(bit_of))
+            out.append((rid, mask))
+        return out
+
+    def union(masks):
+        out = 0
+        for m in masks:
+            out |= m
+        return out
+
+    vocab = make_vocab(60)
+    for seed in range(20):
+        small = candidates_of(make_recipes(200, vocab, seed), make_pantry(vocab, 25, seed), 2)[:18]
+        n = min(4, len(small))
+        rids, bought, proven = plan_meals(small, n, budget=10)
+        exact = min(union(m for _, m in combo).bit_count() for combo in itertools.combinations(small, n))
+        assert proven and bought.bit_count() == exact, f"seed {seed}: {bought.bit_count()} bought, best is {exact}"
+    print("[ok] matches exhaustive search on 20 small catalogs")
+
+    vocab = make_vocab(args.vocab)
+    recipes = make_recipes(args.recipes, vocab)
+    candidates = candidates_of(recipes, make_pantry(vocab, args.pantry), args.max_missing)
+    print(f"recipes={len(recipes)}, vocab={len(vocab)}, pantry={args.pantry}, max_missing={args.max_missing}, "
+          f"n={args.n}, candidates={len(candidates)}")
+    least = union(m for _, m in candidates[:args.n]).bit_count()
+    print(f"{'n missing the least':>22} {least:>4} to buy")
+    for budget in args.budgets:
+        t0 = time.perf_counter()
+        rids, bought, proven = plan_meals(candidates, args.n, budget)
+        took = time.perf_counter() - t0
+        print(f"{f'budget {budget:g}s':>22} {bought.bit_count():>4} to buy   {took:6.2f}s   {'best possible' if proven else 'best found'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Matcher benchmarks on synthetic data.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("matching", help="linear scan vs inverted index")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    p.add_argument("--vocab", type=int, default=2000, help="number of distinct ingredients")
+    p.add_argument("--pantry", type=int, default=10, help="items in the pantry")
+    p.add_argument("--max-missing", type=int, default=2)
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=bench_matching)
+
+    p = sub.add_parser("engines", help="queries/second for each matching engine")
+    p.add_argument("--recipes", type=int, default=50000)
+    p.add_argument("--vocab", type=int, default=2000)
+    p.add_argument("--pantry", type=int, default=20)
+    p.add_argument("--max-missing", type=int, default=2)
+    p.add_argument("--seconds", type=float, default=2.0, help="time spent per engine")
+    p.set_defaults(func=bench_engines)
+
+    p = sub.add_parser("titles", help="regression check: recipes sharing a title keep their own ingredients")
+    p.add_argument("--meals", type=int, default=2000)
+    p.add_argument("--titles", type=int, default=50, help="distinct titles the meals share")
+    p.set_defaults(func=bench_titles)
+
+    p = sub.add_parser("session", help="incremental re-matching vs full recompute (checks equivalence)")
+    p.add_argument("--recipes", type=int, default=20000)
+    p.add_argument("--vocab", type=int, default=2000)
+    p.add_argument("--pantry", type=int, default=20)
+    p.add_argument("--edits", type=int, default=300)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_session)
+
+    p = sub.add_parser("import", help="bulk_import fetch pipeline against a local stand-in server")
+    p.add_argument("--meals", type=int, default=200)
+    p.add_argument("--latency", type=float, default=0.05, help="seconds per request")
+    p.add_argument("--fail-every", type=int, default=10, help="503 once on every Nth meal (0 = never)")
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 8, 16])
+    p.add_argument("--rate", type=float, default=0, help="client rate limit, requests/second")
+    p.set_defaults(func=bench_import)
+
+    p = sub.add_parser("memory", help="bytes per recipe: raw meal dicts vs compact Recipe records")
+    p.add_argument("--recipes", type=int, default=50000)
+    p.set_defaults(func=bench_memory)
+
+    p = sub.add_parser("shared", help="memory per worker: private index vs one memory-mapped file")
+    p.add_argument("--recipes", type=int, default=100000)
+    p.add_argument("--vocab", type=int, default=2000)
+    p.add_argument("--pantry", type=int, default=20)
+    p.add_argument("--queries", type=int, default=50)
+    p.add_argument("--workers", type=int, default=4)
+    p.set_defaults(func=bench_shared)
+
+    p = sub.add_parser("inventory", help="concurrent inventory writers (checks for lost updates) + edit latency")
+    p.add_argument("--processes", type=int, default=4)
+    p.add_argument("--threads", type=int, default=8)
+    p.add_argument("--ops", type=int, default=100, help="transactions per thread")
+    p.add_argument("--pantry", type=int, default=500, help="pantry size for the latency check")
+    p.add_argument("--repeat", type=int, default=200)
+    p.set_defaults(func=bench_inventory)
+
+    p = sub.add_parser("quantities", help="boolean vs quantity-aware matching, queries/second")
+    p.add_argument("--recipes", type=int, default=50000)
+    p.add_argument("--vocab", type=int, default=2000)
+    p.add_argument("--pantry", type=int, default=20)
+    p.add_argument("--max-missing", type=int, default=2)
+    p.add_argument("--seconds", type=float, default=2.0)
+    p.set_defaults(func=bench_quantities)
+
+    p = sub.add_parser("canonicalize", help="ingredient_key calls/second: regex per call vs memoized")
+    p.add_argument("--calls", type=int, default=2000000)
+    p.add_argument("--distinct", type=int, default=20000, help="roughly how many different spellings")
+    p.set_defaults(func=bench_canonicalize)
+
+    p = sub.add_parser("fuzzy", help="fuzzy pantry expansion: n-gram index vs pantry x vocabulary")
+    p.add_argument("--vocab", type=int, default=20000)
+    p.add_argument("--pantry", type=int, default=30)
+    p.add_argument("--threshold", type=float, default=0.7)
+    p.set_defaults(func=bench_fuzzy)
+
+    p = sub.add_parser("search", help="full-text search before matching vs title filter after matching")
+    p.add_argument("--recipes", type=int, default=50000)
+    p.add_argument("--max-missing", type=int, default=3)
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=bench_search)
+
+    p = sub.add_parser("facets", help="facet / ingredient filters as masks before matching vs filtering matches")
+    p.add_argument("--recipes", type=int, default=50000)
+    p.add_argument("--max-missing", type=int, default=5)
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=bench_facets)
+
+    p = sub.add_parser("plan", help="meal plans: ingredients to buy per time budget")
+    p.add_argument("--recipes", type=int, default=50000)
+    p.add_argument("--vocab", type=int, default=2000)
+    p.add_argument("--pantry", type=int, default=30)
+    p.add_argument("--max-missing", type=int, default=3)
+    p.add_argument("--n", type=int, default=14)
+    p.add_argument("--budgets", type=float, nargs="+", default=[0.1, 1.0, 5.0])
+    p.set_defaults(func=bench_plan)
+
+    p = sub.add_parser("buy", help="what-to-buy suggestions: incremental greedy vs re-matching per ingredient")
+    p.add_argument("--recipes", type=int, default=50000)
+    p.add_argument("--vocab", type=int, default=2000)
+    p.add_argument("--pantry", type=int, default=20)
+    p.add_argument("--max-missing", type=int, default=2)
+    p.add_argument("--n", type=int, default=5)
+    p.set_defaults(func=bench_buy)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,152 @@
 # Bulk-import recipes from TheMealDB by ingredient, category (meal type), or cuisine (area), then merge them into backend/data/recipes.json
+#
+# HOW TO RUN:
+    # python backend/bulk_import.py --ingredient chicken
+    # python backend/bulk_import.py --ingredient chicken --ingredient beef --cuisine Indian
+    # python backend/bulk_import.py --filters-file my_filters.txt     <- one "ingredient=chicken" per line
+    # python backend/bulk_import.py --resume                          <- continue an interrupted run
 # ------------------------------------------------------------
 from __future__ import annotations
 import json
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import requests
+from requests.adapters import HTTPAdapter
 import argparse
+from recipe_sources import get_catalog, use_sqlite, get_store
+from http_cache import HttpCache, DEFAULT_TTL
+from atomic_write import atomic_write_text
+from shared_catalog import SHARED_PATH, publish
 
 
-FILTER_BY_ING = "https://www.themealdb.com/api/json/v1/1/filter.php?i="
-FILTER_BY_CAT = "https://www.themealdb.com/api/json/v1/1/filter.php?c="
-FILTER_BY_AREA = "https://www.themealdb.com/api/json/v1/1/filter.php?a="
-LOOKUP_BY_ID = "https://www.themealdb.com/api/json/v1/1/lookup.php?i="
+API_BASE = "https://www.themealdb.com/api/json/v1/1"
 
 OUT_PATH = Path(__file__).resolve().parent / "data" / "recipes.json"
+# progress of a batch run, so an interrupted import can pick up where it stopped
+CHECKPOINT_PATH = Path(__file__).resolve().parent / "data" / "import_checkpoint.json"
+
+FILTER_MODES = ("ingredient", "category", "cuisine")
+
+# status codes worth retrying (rate limited / server hiccup)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class RateLimiter:
+    # At most `rate` requests per second across all threads (0 = no limit)
+    def __init__(self, rate: float = 0):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+class MealDBClient:
+    # One pooled requests.Session shared by all worker threads, so connections
+    # to TheMealDB are reused instead of opening a new one per meal
+    def __init__(self, base_url: str = API_BASE, workers: int = 8, retries: int = 3,
+                 backoff: float = 0.5, rate: float = 0, timeout: float = 20,
+                 cache: HttpCache | None = None):
+        self.base_url = base_url.rstrip("/")
+        self.cache = cache
+        self.workers = max(1, workers)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _get(self, url: str, headers: dict | None = None) -> requests.Response:
+        # GET with retries and exponential backoff; returns the final response
+        attempt = 0
+        while True:
+            self.limiter.wait()
+            try:
+                resp = self.session.get(url, headers=headers, timeout=self.timeout)
+                if resp.status_code in RETRY_STATUSES and attempt < self.retries:
+                    raise requests.HTTPError(f"{resp.status_code} for {url}", response=resp)
+                if resp.status_code != 304:
+                    resp.raise_for_status()
+                return resp
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                if attempt >= self.retries or (status is not None and status not in RETRY_STATUSES):
+                    raise
+                time.sleep(self.backoff * (2 ** attempt))
+                attempt += 1
+
+    def get_json(self, url: str) -> dict:
+        #GET a URL and return JSON (from the on-disk cache when we have it)
+        if self.cache is not None:
+            return self.cache.get_json(url, lambda headers: self._get(url, headers))
+        return self._get(url).json() or {}
+
+    def fetch_ids_from_filter(self, mode: str, value: str) -> list[str]:
+        # Ask TheMealDB for a list of meal IDs matching the filter
+        params = {"ingredient": "i", "category": "c", "cuisine": "a"}
+        if mode not in params:
+            return []
+        data = self.get_json(f"{self.base_url}/filter.php?{params[mode]}={value}")
+        meals = data.get("meals") or []
+        ids = []
+        for m in meals:
+            mid = (m.get("idMeal") or "").strip()
+            if mid:
+                ids.append(mid)
+        return ids
+
+    def fetch_full_meal(self, mid: str) -> dict | None:
+        #Fetch the full meal object for a given idMeal
+        data = self.get_json(f"{self.base_url}/lookup.php?i={mid}")
+        meals = data.get("meals") or []
+        return meals[0] if meals else None
+
+    def fetch_full_meals(self, ids: list[str]) -> list[dict]:
+        # Fetch many meals at once, `workers` at a time. Results keep the order of ids;
+        # a meal that still fails after all retries is reported and skipped.
+        def one(mid):
+            try:
+                return self.fetch_full_meal(mid)
+            except requests.RequestException as e:
+                print(f"[warn] Could not fetch meal {mid}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(one, ids))
+        return [m for m in results if m]
+
+    def close(self) -> None:
+        self.session.close()
+
+# Default client for the plain functions below
+_client: MealDBClient | None = None
+
+def _default_client() -> MealDBClient:
+    global _client
+    if _client is None:
+        _client = MealDBClient()
+    return _client
 
 def get_json(url: str) -> dict:
     #GET a URL and return JSON
-    resp = requests.get(url, timeout=20)
-    resp.raise_for_status()
-    data = resp.json() or {}
-    return data
+    return _default_client().get_json(url)
 
 def ensure_store() -> dict:
+    if use_sqlite():
+        # the database is the store; ids are all we need for skipping
+        return {"meals": [{"idMeal": mid} for mid in get_store().existing_ids()]}
     #Read existing recipes.json
     if OUT_PATH.exists():
         try:
@@ -43,33 +167,19 @@ def index_by_id(meals: list[dict]) -> dict[str, dict]:
 
 def fetch_ids_from_filter(mode: str, value: str) -> list[str]:
     # Ask TheMealDB for a list of meal IDs matching the filter
-
-    if mode == "ingredient":
-        url = FILTER_BY_ING + value
-    elif mode == "category":
-        url = FILTER_BY_CAT + value
-    elif mode == "cuisine":
-        url = FILTER_BY_AREA + value
-    else:
-        return []
-
-    data = get_json(url)
-    meals = data.get("meals") or []
-    ids = []
-    for m in meals:
-        mid = (m.get("idMeal") or "").strip()
-        if mid:
-            ids.append(mid)
-    return ids
+    return _default_client().fetch_ids_from_filter(mode, value)
 
 def fetch_full_meal(mid: str) -> dict | None:
     #Fetch the full meal object for a given idMeal
-    data = get_json(LOOKUP_BY_ID + mid)
-    meals = data.get("meals") or []
-    return meals[0] if meals else None
+    return _default_client().fetch_full_meal(mid)
 
 def merge_and_save(existing: dict, new_meals: list[dict]) -> None:
-    
+    if use_sqlite():
+        # only the new/changed rows are written, recipes.json isn't touched
+        get_store().upsert_meals(new_meals)
+        get_catalog().invalidate()
+        return
+
     #Merge new meals, store by idMeal
     index = index_by_id(existing.get("meals") or [])
     for m in new_meals:
@@ -79,45 +189,154 @@ def merge_and_save(existing: dict, new_meals: list[dict]) -> None:
 
     merged_list = list(index.values())
     merged = {"meals": merged_list}
-    OUT_PATH.write_text(
-        json.dumps(merged, indent=2, ensure_ascii=False),
-        encoding="utf-8",
-    )
+    existing["meals"] = merged_list  # keep the caller's copy current for the next chunk
+    # temp file + rename: a crash mid-write can't leave a truncated recipes.json
+    atomic_write_text(OUT_PATH, json.dumps(merged, indent=2, ensure_ascii=False))
+    # let the running process pick up the new meals right away
+    get_catalog().invalidate()
+
+def read_filters_file(path: Path) -> list[tuple[str, str]]:
+    # One filter per line: "ingredient=chicken", "category: Seafood" ... (# starts a comment)
+    filters = []
+    for lineno, line in enumerate(path.read_text(encoding="utf-8").splitlines(), start=1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        sep = "=" if "=" in line else ":"
+        mode, _, value = line.partition(sep)
+        mode, value = mode.strip().lower(), value.strip()
+        if mode not in FILTER_MODES or not value:
+            print(f"[warn] {path}:{lineno}: expected '<ingredient|category|cuisine>=<value>', skipping")
+            continue
+        filters.append((mode, value))
+    return filters
+
+def load_checkpoint() -> dict | None:
+    if not CHECKPOINT_PATH.exists():
+        return None
+    try:
+        return json.loads(CHECKPOINT_PATH.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+def save_checkpoint(filters: list[tuple[str, str]], ids: list[str], done: set[str]) -> None:
+    data = {"filters": [list(f) for f in filters], "ids": ids, "done": sorted(done)}
+    atomic_write_text(CHECKPOINT_PATH, json.dumps(data, indent=2))
+
+def collect_ids(client: MealDBClient, filters: list[tuple[str, str]]) -> list[str]:
+    # All ids across the filters, each id once, in first-seen order
+    seen: dict[str, None] = {}
+    for mode, value in filters:
+        print(f"[info] Fetching list for {mode}='{value}' ...")
+        try:
+            ids = client.fetch_ids_from_filter(mode, value)
+        except requests.RequestException as e:
+            print(f"[warn] Filter {mode}='{value}' failed: {e}")
+            continue
+        print(f"[info]   {len(ids)} meal(s)")
+        for mid in ids:
+            seen.setdefault(mid, None)
+    return list(seen)
 
 def main():
     parser = argparse.ArgumentParser(description="Bulk import recipes by ingredient/category/cuisine.")
-    group = parser.add_mutually_exclusive_group(required=True)
 
-    group.add_argument("--ingredient", help="Filter by main ingredient")
-    group.add_argument("--category",   help="Filter by meal category")
-    group.add_argument("--cuisine",    help="Filter by area/cuisine")
+    parser.add_argument("--ingredient", action="append", default=[], help="Filter by main ingredient (repeatable)")
+    parser.add_argument("--category",   action="append", default=[], help="Filter by meal category (repeatable)")
+    parser.add_argument("--cuisine",    action="append", default=[], help="Filter by area/cuisine (repeatable)")
+    parser.add_argument("--filters-file", type=Path, help="File with one '<mode>=<value>' filter per line")
+    parser.add_argument("--resume", action="store_true", help="Continue the last interrupted batch import")
+    parser.add_argument("--chunk-size", type=int, default=50, help="Meals fetched before each save to recipes.json (default 50)")
+    parser.add_argument("--workers", type=int, default=8, help="Meals fetched in parallel (default 8)")
+    parser.add_argument("--retries", type=int, default=3, help="Retries per request on network errors/5xx/429 (default 3)")
+    parser.add_argument("--backoff", type=float, default=0.5, help="First retry delay in seconds, doubled each retry (default 0.5)")
+    parser.add_argument("--rate", type=float, default=10, help="Max requests per second, 0 = unlimited (default 10)")
+    parser.add_argument("--base-url", default=API_BASE, help="API base URL (for a local stand-in server)")
+    parser.add_argument("--refresh", action="store_true", help="Re-fetch meals already in recipes.json")
+    parser.add_argument("--no-cache", action="store_true", help="Don't use the on-disk HTTP cache")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL, help="Seconds before a cached response is revalidated")
 
     args = parser.parse_args()
-    if args.ingredient:
-        mode, value = "ingredient", args.ingredient.strip()
-    elif args.category:
-        mode, value = "category", args.category.strip()
-    else:
-        mode, value = "cuisine", args.cuisine.strip()
 
-    print(f"[info] Fetching list for {mode}='{value}' ...")
+    cache = None if args.no_cache else HttpCache(ttl=args.cache_ttl)
+    client = MealDBClient(args.base_url, workers=args.workers, retries=args.retries,
+                          backoff=args.backoff, rate=args.rate, cache=cache)
+
+    if args.resume:
+        checkpoint = load_checkpoint()
+        if not checkpoint:
+            print(f"[warn] No checkpoint at {CHECKPOINT_PATH}. Nothing to resume.")
+            sys.exit(0)
+        filters = [tuple(f) for f in checkpoint.get("filters") or []]
+        ids = [str(x) for x in checkpoint.get("ids") or []]
+        done = {str(x) for x in checkpoint.get("done") or []}
+        print(f"[info] Resuming: {len(done)} of {len(ids)} meal(s) already done")
+    else:
+        filters = [("ingredient", v.strip()) for v in args.ingredient]
+        filters += [("category", v.strip()) for v in args.category]
+        filters += [("cuisine", v.strip()) for v in args.cuisine]
+        if args.filters_file:
+            filters += read_filters_file(args.filters_file)
+        filters = list(dict.fromkeys(f for f in filters if f[1]))
+        if not filters:
+            parser.error("give at least one --ingredient/--category/--cuisine, a --filters-file, or --resume")
+        ids = collect_ids(client, filters)
+        done = set()
 
-    ids = fetch_ids_from_filter(mode, value)
     if not ids:
         print("[warn] No results from filter. Nothing to import.")
         sys.exit(0)
 
-    new_meals = []
-    for mid in ids:
-        meal = fetch_full_meal(mid)
-        if meal:
-            new_meals.append(meal)
-
     store = ensure_store()
-    merge_and_save(store, new_meals)
+    pending = [mid for mid in ids if mid not in done]
+    if not args.refresh:
+        # meals we already have don't need another lookup.php call
+        have = index_by_id(store.get("meals") or [])
+        skipped = [mid for mid in pending if mid in have]
+        pending = [mid for mid in pending if mid not in have]
+        done.update(skipped)
+        if skipped:
+            print(f"[info] Skipping {len(skipped)} meal(s) already in {OUT_PATH.name} (use --refresh to re-fetch)")
+    save_checkpoint(filters, ids, done)
+
+    print(f"[info] Fetching {len(pending)} meal(s) with {client.workers} worker(s) ...")
+    imported = 0
+    chunk_size = max(1, args.chunk_size)
+    try:
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            new_meals = client.fetch_full_meals(chunk)
+            if new_meals:
+                merge_and_save(store, new_meals)
+            imported += len(new_meals)
+            # only ids we actually stored count as done; failures stay pending for --resume
+            done.update((m.get("idMeal") or "").strip() for m in new_meals)
+            save_checkpoint(filters, ids, done)
+            print(f"[info]   saved {imported} meal(s) so far")
+    except KeyboardInterrupt:
+        print(f"\n[warn] Interrupted. {imported} meal(s) saved; run with --resume to continue.")
+        sys.exit(1)
+    finally:
+        client.close()
+
+    # workers matching from the shared mapped file pick the new version up on their next request
+    if imported and SHARED_PATH.exists():
+        n = publish()
+        print(f"[info] Published shared catalog ({n} recipe(s)) to {SHARED_PATH.name}")
+
+    if cache is not None:
+        st = cache.stats()
+        print(f"[info] HTTP cache: {st['hits']} hit(s), {st['revalidated']} revalidated, {st['misses']} fetched")
+
+    left = [mid for mid in ids if mid not in done]
+    if left:
+        print(f"[warn] {len(left)} meal(s) could not be fetched; run with --resume to retry them.")
+    else:
+        CHECKPOINT_PATH.unlink(missing_ok=True)
 
-    print(f"[ok] Imported {len(new_meals)} meal(s) for {mode}='{value}'.")
-    print(f"[ok] Written to {OUT_PATH}")
+    names = ", ".join(f"{mode}='{value}'" for mode, value in filters)
+    print(f"[ok] Imported {imported} meal(s) for {names}.")
+    print(f"[ok] Written to {get_store().path if use_sqlite() else OUT_PATH}")
 
 if __name__ == "__main__":
     main()
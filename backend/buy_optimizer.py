@@ -0,0 +1,116 @@
+# What should I buy?
+# Recommends the N ingredients that would make the most recipes cookable, and which
+# recipes each one unlocks. Only recipes already within max_missing of the pantry
+# count (the same "nearly cookable" set the matcher shows).
+#
+# Greedy: buy the ingredient that unlocks the most recipes right now, then the next
+# best given that one, and so on. Trying every ingredient with a full re-match each
+# time would be vocabulary x catalog work per pick; instead we keep, per recipe, how
+# many ingredients it still misses, and per ingredient, how many recipes miss only it.
+# Buying something only walks the nearly cookable recipes waiting for that ingredient
+# and updates those counts.
+# The counts of ingredients not bought yet can only go up, so a heap with stale
+# entries skipped on pop ("lazy greedy") always gives the true best next pick.
+# Ties (and picks that unlock nothing on their own yet) go to the ingredient the most
+# nearly cookable recipes need.
+#
+# HOW TO RUN:
+    # python backend/buy_optimizer.py
+    # python backend/buy_optimizer.py --n 10 --max-missing 3 --exclude "saffron"
+# ------------------------------------------------------------
+
+import argparse
+import heapq
+from typing import Dict, Iterable, List, Tuple
+
+from ingredients import ingredient_key
+from match_cache import MATCH_CACHE, inventory_fingerprint
+from recipe_index import IngredientIndex, get_ingredient_index, key_id, key_name
+from recipe_matcher import INVENTORY_PATH, build_inventory_flags, cache_version, indexed_candidates, load_inventory
+
+
+def plan_purchases(index: IngredientIndex, inventory: Dict[str, bool], n: int, max_missing: int,
+                   exclude: Iterable[str] = ()) -> List[Tuple[str, List[int]]]:
+    # [(ingredient key, rids it makes cookable)] in buying order
+    recipes = index.recipes
+    owned = {key_id(k) for k, have_it in inventory.items() if have_it}
+    owned.discard(None)
+    skip = {key_id(k) for k in exclude}
+
+    missing: Dict[int, int] = {}     # rid -> ingredients still missing (nearly cookable only)
+    unlocks: Dict[int, int] = {}     # key id -> recipes missing only that
+    waiting: Dict[int, List[int]] = {}   # key id -> nearly cookable recipes missing it
+    for rid, c in indexed_candidates(index, inventory, max_missing):
+        if c == 0:
+            continue
+        missing[rid] = c
+        lacking = [kid for kid in recipes[rid].key_ids if kid not in owned]
+        for kid in lacking:
+            waiting.setdefault(kid, []).append(rid)
+        if len(lacking) == 1:
+            unlocks[lacking[0]] = unlocks.get(lacking[0], 0) + 1
+
+    heap = [(-unlocks.get(kid, 0), -len(rids), key_name(kid), kid) for kid, rids in waiting.items() if kid not in skip]
+    heapq.heapify(heap)
+    bought = set()
+    picks = []
+    while heap and len(picks) < n:
+        gain, need, name, kid = heapq.heappop(heap)
+        if kid in bought or -gain != unlocks.get(kid, 0):
+            continue  # stale entry, a newer one has the current count
+        bought.add(kid)
+        unlocked = []
+        for rid in waiting[kid]:
+            c = missing[rid] - 1
+            missing[rid] = c
+            if c == 0:
+                unlocked.append(rid)
+            elif c == 1:
+                # one ingredient left: buying that one now unlocks this recipe too
+                last = next(k for k in recipes[rid].key_ids if k not in owned and k not in bought)
+                unlocks[last] = unlocks.get(last, 0) + 1
+                if last not in skip:
+                    heapq.heappush(heap, (-unlocks[last], -len(waiting[last]), key_name(last), last))
+        picks.append((name, unlocked))
+    return picks
+
+
+# Same cache as the matches: cleared whenever the pantry changes, keyed by catalog version and rules
+def get_purchase_suggestions(inventory: dict, n: int = 5, max_missing: int = 2, exclude: Iterable[str] = ()) -> Dict:
+    flags = build_inventory_flags(inventory)
+    exclude = tuple(sorted({ingredient_key(e) for e in exclude} - {""}))
+    version = cache_version()
+    MATCH_CACHE.drop_other_versions(version)
+    key = (version, inventory_fingerprint(flags), "buy", n, max_missing, exclude)
+    return MATCH_CACHE.get_or_compute(key, lambda: _build_suggestions(flags, n, max_missing, exclude))
+
+def _build_suggestions(flags: Dict[str, bool], n: int, max_missing: int, exclude: Tuple[str, ...]) -> Dict:
+    index = get_ingredient_index()
+    cookable = now = sum(1 for _ in indexed_candidates(index, flags, 0))
+    suggestions = []
+    for name, rids in plan_purchases(index, flags, n, max_missing, exclude):
+        cookable += len(rids)
+        suggestions.append({
+            "ingredient": name,
+            "unlocks": [{"id": index.recipes[rid].id, "title": index.recipes[rid].title, "image": index.recipes[rid].image}
+                        for rid in sorted(rids, key=lambda rid: index.sort_titles[rid])],
+            "cookable": cookable,   # cookable recipes after buying this and everything above it
+        })
+    return {"cookable_now": now, "suggestions": suggestions}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Which ingredients to buy to cook the most recipes.")
+    parser.add_argument("--n", type=int, default=5, help="How many ingredients to suggest (default 5)")
+    parser.add_argument("--max-missing", type=int, default=2, help="Only count recipes missing at most this many now (default 2)")
+    parser.add_argument("--exclude", action="append", default=[], help="Never suggest this ingredient (repeatable)")
+    args = parser.parse_args()
+
+    result = get_purchase_suggestions(load_inventory(INVENTORY_PATH), args.n, args.max_missing, args.exclude)
+    print(f"[info] Cookable now: {result['cookable_now']}")
+    for i, s in enumerate(result["suggestions"], start=1):
+        titles = ", ".join(r["title"] for r in s["unlocks"][:5]) + (" ..." if len(s["unlocks"]) > 5 else "")
+        print(f"{i}. {s['ingredient']:<24} +{len(s['unlocks'])} -> {s['cookable']} cookable   {titles}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# Pre-parsed catalog snapshot
+# Cold start (Flask, recipe_matcher.py, favorites_cli.py, inventory_cli --run) used to
+# parse all of recipes.json and normalize every ingredient. The snapshot stores the
+# finished compact Recipe records, the ingredient vocabulary and the title ranks in one
+# binary file, so a new process only has to unpickle it.
+# It is rebuilt automatically whenever the source files or the normalization rules change.
+#
+# HOW TO RUN:
+    # python backend/catalog_snapshot.py --build     <- (re)build now
+    # python backend/catalog_snapshot.py --bench     <- cold-start time: JSON vs snapshot
+    # RECIPE_SNAPSHOT=0 python backend/app.py        <- never read or write the snapshot
+# ------------------------------------------------------------
+
+import argparse
+import os
+import pickle
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from atomic_write import atomic_write_bytes
+from ingredients import rules_fingerprint
+from recipe_index import Recipe, intern_key, prepare_meals, title_ranks, vocabulary
+from recipe_sources import get_catalog
+
+BASE_DIR = Path(__file__).resolve().parent
+SNAPSHOT_PATH = BASE_DIR / "data" / "catalog.snapshot"
+FORMAT_VERSION = 2
+ENABLED = os.environ.get("RECIPE_SNAPSHOT", "1") != "0"
+
+
+def _header() -> Dict[str, Any]:
+    # What the snapshot was built from; any difference means it is stale
+    catalog = get_catalog()
+    return {
+        "format": FORMAT_VERSION,
+        "sources": [str(p) for p in catalog.paths],
+        "signature": list(catalog.source_signature()),
+        "rules": rules_fingerprint(),
+    }
+
+
+def write_snapshot(recipes: List[Recipe], ranks: List[int], path: Path = None) -> None:
+    path = path or SNAPSHOT_PATH
+    payload = {
+        "header": _header(),
+        "vocab": vocabulary(),
+        "recipes": [r.to_state() for r in recipes],
+        "title_ranks": ranks,
+    }
+    atomic_write_bytes(path, pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def read_snapshot(path: Path = None) -> Optional[Dict[str, Any]]:
+    # The snapshot if it is still valid for the current sources, else None.
+    # Only ever reads the file this module wrote into data/.
+    path = path or SNAPSHOT_PATH
+    try:
+        payload = pickle.loads(path.read_bytes())
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+    if not isinstance(payload, dict):
+        return None
+    header = payload.get("header") or {}
+    current = _header()
+    current["signature"] = [list(s) if s else s for s in current["signature"]]
+    stored = dict(header)
+    stored["signature"] = [list(s) if s else s for s in header.get("signature") or []]
+    if stored != current:
+        return None
+    return payload
+
+
+def recipes_from_snapshot(payload: Dict[str, Any]) -> List[Recipe]:
+    # Key ids in the file are the ids of the process that wrote it; map them onto ours
+    vocab = payload["vocab"]
+    remap = [intern_key(k) for k in vocab]
+    if remap == list(range(len(vocab))):
+        remap = None  # cold process: ids already line up
+    return [Recipe.from_state(state, remap) for state in payload["recipes"]]
+
+
+def load_or_build() -> List[Recipe]:
+    # Builder for the catalog's "prepared" entry
+    catalog = get_catalog()
+    if ENABLED:
+        payload = read_snapshot()
+        if payload is not None:
+            recipes = recipes_from_snapshot(payload)
+            catalog.put_derived("title_ranks", payload["title_ranks"])
+            return recipes
+
+    recipes = prepare_meals(catalog.read_meals())
+    if ENABLED:
+        ranks = title_ranks(recipes)
+        catalog.put_derived("title_ranks", ranks)
+        try:
+            write_snapshot(recipes, ranks)
+        except OSError as e:
+            print(f"[warn] Could not write catalog snapshot: {e}")
+    return recipes
+
+
+def build() -> int:
+    catalog = get_catalog()
+    recipes = prepare_meals(catalog.read_meals())
+    write_snapshot(recipes, title_ranks(recipes))
+    return len(recipes)
+
+
+def bench(repeat: int = 3) -> None:
+    # Cold start = what a fresh process pays before the first match
+    import subprocess
+    import sys
+
+    code = (
+        "import time; t=time.perf_counter();"
+        "from recipe_index import get_prepared_recipes, get_title_ranks;"
+        "n=len(get_prepared_recipes()); get_title_ranks();"
+        "print(n, time.perf_counter()-t)"
+    )
+
+    def run(env_extra: Dict[str, str]) -> tuple:
+        env = dict(os.environ, **env_extra)
+        best = None
+        n = 0
+        for _ in range(repeat):
+            out = subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR, env=env,
+                                 capture_output=True, text=True, check=True).stdout.split()
+            n, t = int(out[0]), float(out[1])
+            best = t if best is None else min(best, t)
+        return n, best
+
+    build()
+    n, t_json = run({"RECIPE_SNAPSHOT": "0"})
+    _, t_snap = run({"RECIPE_SNAPSHOT": "1"})
+    size = SNAPSHOT_PATH.stat().st_size if SNAPSHOT_PATH.exists() else 0
+    print(f"recipes={n}, snapshot={size / 1e6:.1f} MB")
+    print(f"cold start from JSON:     {t_json * 1000:8.1f} ms")
+    print(f"cold start from snapshot: {t_snap * 1000:8.1f} ms  ({t_json / t_snap:.1f}x faster)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-parsed catalog snapshot.")
+    parser.add_argument("--build", action="store_true", help="Rebuild the snapshot from the current sources")
+    parser.add_argument("--bench", action="store_true", help="Compare cold start from JSON and from the snapshot")
+    args = parser.parse_args()
+
+    if args.build or not args.bench:
+        t0 = time.perf_counter()
+        n = build()
+        print(f"[ok] Wrote {n} recipe(s) to {SNAPSHOT_PATH} in {(time.perf_counter() - t0) * 1000:.0f} ms")
+    if args.bench:
+        bench()
+
+if __name__ == "__main__":
+    main()
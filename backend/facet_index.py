@@ -0,0 +1,163 @@
+# Facets and ingredient constraints
+# "Cookable Indian vegetarian dinners without peanuts" is a handful of set operations:
+# every category, area and tag value keeps a bitmask of the recipes that have it
+# (bit rid = recipe rid, Python ints so AND / OR / NOT over the whole catalog are
+# single operations), and required / excluded ingredients become masks from the
+# ingredient postings. The combined mask picks the recipes matching looks at.
+#
+# Ingredient constraints also cover the more specific names: excluding "peanut" drops
+# recipes with "peanut butter" or "peanut oil" too, requiring "chicken" is happy with
+# "chicken thigh" - but not with "chicken stock", which is a different product (same
+# rules as fuzzy matching, see fuzzy_match.is_variant).
+#
+# Facet counts for a result (how many matches are Indian, Dessert, ...) are popcounts
+# of each value's mask AND the mask of the matches.
+#
+# HOW TO RUN:
+    # python backend/facet_index.py                      <- every facet value with its recipe count
+    # python backend/facet_index.py --facet area
+# ------------------------------------------------------------
+
+import argparse
+import threading
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from fuzzy_match import is_variant
+from recipe_index import Recipe, get_prepared_recipes, np
+from recipe_sources import get_catalog
+
+# facet name -> position in Recipe.labels (see recipe_index.meal_labels)
+FACETS: Dict[str, int] = {"category": 0, "area": 1, "tags": 2}
+
+
+def recipe_facets(r: Recipe) -> Dict[str, List[str]]:
+    # facet -> values ("Dinner,Spicy" is two tags)
+    return {facet: [v.strip() for v in r.labels[i].split(",") if v.strip()] for facet, i in FACETS.items()}
+
+
+def rid_mask(rids: Iterable[int], n: int) -> int:
+    # Set bits through a bytearray: building a big int one bit at a time is quadratic
+    buf = bytearray((n + 7) // 8)
+    for rid in rids:
+        buf[rid >> 3] |= 1 << (rid & 7)
+    return int.from_bytes(buf, "little")
+
+
+def mask_rids(mask: int, n: int) -> List[int]:
+    # rids whose bit is set, ascending
+    buf = (mask & ((1 << n) - 1)).to_bytes((n + 7) // 8, "little")
+    if np is not None:
+        bits = np.unpackbits(np.frombuffer(buf, dtype=np.uint8), bitorder="little")
+        return np.flatnonzero(bits).tolist()
+    out = []
+    for i, byte in enumerate(buf):
+        while byte:
+            low = byte & -byte
+            out.append(i * 8 + low.bit_length() - 1)
+            byte ^= low
+    return out
+
+
+class FacetIndex:
+    def __init__(self, recipes: List[Recipe]):
+        self.n = len(recipes)
+        self.all = (1 << self.n) - 1
+        # facet -> value.lower() -> mask; labels keep the first spelling seen for display
+        self.masks: Dict[str, Dict[str, int]] = {}
+        self.labels: Dict[str, Dict[str, str]] = {}
+        groups: Dict[str, Dict[str, List[int]]] = {facet: {} for facet in FACETS}
+        for r in recipes:
+            for facet, values in recipe_facets(r).items():
+                for v in values:
+                    key = v.lower()
+                    self.labels.setdefault(facet, {}).setdefault(key, v)
+                    groups[facet].setdefault(key, []).append(r.rid)
+        for facet, by_value in groups.items():
+            self.masks[facet] = {key: rid_mask(rids, self.n) for key, rids in by_value.items()}
+        self._ingredient_masks: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def mask(self, facet: str, values: Iterable[str]) -> int:
+        # recipes with any of the values (unknown values match nothing)
+        by_value = self.masks.get(facet, {})
+        out = 0
+        for v in values:
+            out |= by_value.get(v.strip().lower(), 0)
+        return out
+
+    def ingredient_mask(self, name: str, key: str, variants: Callable[[str], List[str]],
+                        postings: Callable[[str], Iterable[int]]) -> int:
+        # recipes using the key or a more specific name for it; remembered per
+        # (filter name, key) since require and exclude count different names
+        with self._lock:
+            hit = self._ingredient_masks.get((name, key))
+        if hit is not None:
+            return hit
+        rids = set()
+        for k in variants(key):
+            rids.update(postings(k))
+        mask = rid_mask(rids, self.n)
+        with self._lock:
+            self._ingredient_masks[(name, key)] = mask
+        return mask
+
+    def counts(self, mask: int) -> Dict[str, Dict[str, int]]:
+        # facet -> value -> how many recipes in mask have it, most common first
+        out = {}
+        for facet, by_value in self.masks.items():
+            counted = [(self.labels[facet][key], (m & mask).bit_count()) for key, m in by_value.items()]
+            out[facet] = dict(sorted(((v, c) for v, c in counted if c), key=lambda t: (-t[1], t[0])))
+        return out
+
+
+def get_facet_index() -> FacetIndex:
+    # Built from the loaded Recipe records (their labels), so a catalog coming from the
+    # snapshot never has to parse the raw meals just for facets
+    return get_catalog().derived("facet_index", lambda: FacetIndex(get_prepared_recipes()))
+
+
+class IngredientWords:
+    # word -> ingredient keys containing it, to find the more specific names of a key
+    def __init__(self, keys: Iterable[str]):
+        self.by_word: Dict[str, List[Tuple[str, ...]]] = {}
+        for key in set(keys):
+            words = tuple(key.split())
+            for w in set(words):
+                self.by_word.setdefault(w, []).append(words)
+
+    def containing(self, key: str) -> List[str]:
+        # keys with all of key's words in a row: "peanut" -> peanut, peanut butter, roasted peanut
+        words = tuple(key.split())
+        if not words:
+            return []
+        n = len(words)
+        rarest = min((self.by_word.get(w, []) for w in words), key=len)
+        return sorted(" ".join(other) for other in rarest
+                      if any(other[i:i + n] == words for i in range(len(other) - n + 1)))
+
+    def variants(self, key: str) -> List[str]:
+        # the key and its more specific names only: "chicken" -> chicken, chicken thigh,
+        # but not chicken stock (what a required ingredient can be)
+        words = tuple(key.split())
+        return [other for other in self.containing(key) if other == key or is_variant(words, other)]
+
+
+def get_ingredient_words(vocabulary: Callable[[], List[str]]) -> IngredientWords:
+    return get_catalog().derived("ingredient_words", lambda: IngredientWords(vocabulary()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recipe facets (category / area / tags).")
+    parser.add_argument("--facet", choices=list(FACETS), default=None, help="Only show this facet")
+    args = parser.parse_args()
+
+    index = get_facet_index()
+    for facet, values in index.counts(index.all).items():
+        if args.facet and facet != args.facet:
+            continue
+        print(f"\n{facet} ({len(values)}):")
+        for value, count in values.items():
+            print(f"  {count:>6}  {value}")
+
+if __name__ == "__main__":
+    main()
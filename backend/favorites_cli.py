@@ -5,26 +5,39 @@
 #   python backend/favorites_cli.py --find "handi"
 #   python backend/favorites_cli.py --cook "handi"
 #   python backend/favorites_cli.py --cook "handi" --ignore "salt" --ignore "chili powder"
+#   python backend/favorites_cli.py --shop-list "handi"
+#   python backend/favorites_cli.py --shop-favorites
 # ------------------------------------------------------------
 
-import json
 import argparse
 from typing import List
-from pathlib import Path
 from recipe_sources import (
-    load_all_meals,
-    index_meals_by_id,
     load_favorite_ids,
     save_favorite_ids,
 )
-
-BASE_DIR = Path(__file__).resolve().parent
-INVENTORY_PATH = BASE_DIR / "inventory.json"
-
-def find_by_name(meals, query: str) -> List[dict]:
-    q = (query or "").lower()
-    return [m for m in meals
-            if q in (m.get("strMeal") or "").lower()]
+from recipe_index import Recipe, get_prepared_recipes, get_recipe_lookup
+from search_index import get_search_index
+from shopping_list import build_shopping_list, print_shopping_list, recipes_by_ids
+from inventory_store import STORE, read_inventory
+from ingredients import ingredient_key
+
+INVENTORY_PATH = STORE.path
+
+# Title lookup for everything that acts on the first match (--cook, --add-first,
+# --shop-list): exact title first, then titles containing the query. Full-text search
+# would also hit recipes that only mention the word in their instructions.
+def find_by_name(recipes: List[Recipe], query: str) -> List[Recipe]:
+    q = " ".join((query or "").lower().split())
+    if not q:
+        return []
+    exact = get_recipe_lookup().by_title.get(q, [])
+    return exact + [r for r in recipes if q in r.title.lower() and r.title.lower() != q]
+
+# Full-text search over the catalog (search_index.py), best match first; for listing.
+# recipes is the prepared catalog: search results are positions in it.
+def search_by_name(recipes: List[Recipe], query: str) -> List[Recipe]:
+    hits = get_search_index().search(query or "")
+    return [recipes[rid] for rid, _ in hits if rid < len(recipes)]
 
 def main():
     # Define CLI flags
@@ -33,15 +46,16 @@ def main():
     parser.add_argument("--add-id", type=str, help="Favorite by idMeal (e.g., 52795)")
     parser.add_argument("--remove-id", type=str, help="Unfavorite by idMeal")
     parser.add_argument("--find", type=str, help='Search meals by name, e.g., "handi"')
-    parser.add_argument("--add-first", action="store_true", help="With --find, favorite the first match")
+    parser.add_argument("--add-first", action="store_true", help="With --find, favorite the first recipe whose title matches")
     parser.add_argument("--cook", type=str, help="Removes corresponding items from inventory after cooking")
     parser.add_argument("--ignore", action="append", default=[], help="List ingridients to ignore removing from inventory after --cook")
     parser.add_argument("--shop-list", type=str, help="Given a recipe, returns a list of needed ingridients")
+    parser.add_argument("--shop-favorites", action="store_true", help="One shopping list for all favorites, minus the pantry")
 
     args = parser.parse_args()
 
-    meals = load_all_meals()# load API + custom meals
-    by_id = index_meals_by_id(meals)# id -> meal dict
+    recipes = get_prepared_recipes()# load API + custom meals, parsed once
+    by_id = get_recipe_lookup().by_id# id -> recipe
     favs = load_favorite_ids()# set of favorite IDs
 
     # List favorites
@@ -50,7 +64,7 @@ def main():
             print("(no favorites)")
         else:
             for fid in sorted(favs): 
-                name = by_id.get(fid, {}).get("strMeal", "(not found)")
+                name = by_id[fid].title if fid in by_id else "(not found)"
                 print(f"★ {fid} — {name}")
         return 
 
@@ -63,7 +77,7 @@ def main():
             print(f"ID {fid} not found in available meals. Import API or add custom first.")
         else:
             favs.add(fid)
-            print(f"[ok] Favorited {fid} — {by_id[fid].get('strMeal')}")
+            print(f"[ok] Favorited {fid} — {by_id[fid].title}")
             changed = True
 
     # Remove favorite by ID
@@ -78,18 +92,20 @@ def main():
 
     # Find by name 
     if args.find: # if --find provided
-        matches = find_by_name(meals, args.find)
+        matches = search_by_name(recipes, args.find)
         if not matches:
             print("No matches.")
         else:
-            for i, m in enumerate(matches[:10], start=1):
-                print(f"{i}. {m.get('idMeal')} — {m.get('strMeal')}")
-            if args.add_first:
-                fid = str(matches[0].get("idMeal") or "").strip()
-                if fid:
-                    favs.add(fid)
-                    print(f"[ok] Favorited {fid} — {matches[0].get('strMeal')}")
-                    changed = True
+            for i, r in enumerate(matches[:10], start=1):
+                print(f"{i}. {r.id} — {r.title}")
+        if args.add_first:
+            by_title = find_by_name(recipes, args.find)
+            if not by_title:
+                print("No recipe title contains that, nothing favorited.")
+            elif by_title[0].id:
+                favs.add(by_title[0].id)
+                print(f"[ok] Favorited {by_title[0].id} — {by_title[0].title}")
+                changed = True
 
     if changed:  # if we changed favorites
         save_favorite_ids(favs) 
@@ -97,47 +113,34 @@ def main():
 
 
     if args.cook:
-        match = find_by_name(meals, args.cook)
-        print(args)
+        match = find_by_name(recipes, args.cook)
         if not match:
             print("No match.")
         else:
-            with open("inventory.json", "r") as f:
-                inv = json.load(f)
-            for key in match[0].keys():
-                if key.startswith("strIngredient") and match[0][key].lower() not in args.ignore:
-                    if match[0][key].lower() in inv.keys():
-                        inv.pop(match[0][key].lower())
-                        # inv[match[0][key].lower()] = False # use whichever is more convenient, setting false or popping from inventory
-                        
-            
-            with open("inventory.json", "w") as f2:
-                json.dump(inv, f2, indent = 4)
-
-    if args.shop_list: 
-        match = find_by_name(meals, args.shop_list)
-        # print("match: ", match)
+            # One transaction on the shared store: journaled like the app's own edits, so
+            # nothing comes back on the next reload and concurrent changes aren't lost.
+            # Pantry items are compared by canonical key ("Tomatoes" uses up "tomato").
+            used = {ingredient_key(ing) for ing, _ in match[0].ingredients}
+            used -= {ingredient_key(ing) for ing in args.ignore}
+            with STORE.transaction() as txn:
+                removed = [name for name in txn.names() if ingredient_key(name) in used]
+                for name in removed:
+                    txn.delete(name)
+            print(f"[ok] Cooked {match[0].title}: removed {', '.join(removed) or 'nothing'} from the pantry")
+
+    if args.shop_list:
+        match = find_by_name(recipes, args.shop_list)
         if not match:
             print("No match.")
-        else: 
-            shopping_list = {}
-            with open("inventory.json", "r") as f:
-                invList = json.load(f).keys()
-                # print("invList: ", invList)
-            for recipeKey in match[0].keys():
-                
-                if match[0][recipeKey]: 
-                    recipeValue = match[0][recipeKey].lower()
-                else:
-                    continue
-
-                if recipeKey.startswith("strIngredient") and recipeValue not in invList:
-                    shopping_list[recipeValue] = match[0]["strMeasure" + f"{recipeKey[-1]}"]
-                    # print("Key: ", recipeKey, "| Value: ", recipeValue, )
-                
-            print(shopping_list)
-
+        else:
+            print_shopping_list(build_shopping_list(match[:1], read_inventory(INVENTORY_PATH)))
 
+    if args.shop_favorites:
+        fav_recipes = recipes_by_ids(sorted(favs))
+        if not fav_recipes:
+            print("No favorites yet.")
+        else:
+            print_shopping_list(build_shopping_list(fav_recipes, read_inventory(INVENTORY_PATH)))
 
 
 if __name__ == "__main__":
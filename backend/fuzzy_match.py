@@ -0,0 +1,146 @@
+# Fuzzy ingredient matching
+# Recipe ingredients are often more specific than what the pantry says: the pantry
+# has "chicken", the recipe wants "chicken thigh"; the pantry has "mozarella", the
+# recipe spells it "mozzarella". In fuzzy mode every pantry key also "owns" the
+# recipe keys that are close enough to it, then matching runs as usual.
+#
+# Two ways to be close:
+#   - more specific: all of the pantry key's words appear, in order, in the recipe key
+#     ("chicken" -> "chicken thigh", "onion" -> "red onion"). Score goes down with
+#     every extra word. Recipe keys that name a different product made from the
+#     pantry item ("chicken stock", "garlic powder", "peanut butter") never count.
+#   - spelled differently: same number of words and similar letter trigrams
+#     (Dice coefficient), e.g. "mozarella" / "mozzarella".
+#
+# The token and trigram indexes are built once per recipe vocabulary (catalog load),
+# and each pantry key's neighbours are remembered, so a query only touches the
+# pantry's own keys: no pantry x vocabulary comparison per request.
+# ------------------------------------------------------------
+
+import math
+import os
+import threading
+from typing import Callable, Dict, FrozenSet, List, Set, Tuple
+
+from recipe_sources import get_catalog
+
+DEFAULT_THRESHOLD = float(os.environ.get("FUZZY_THRESHOLD") or 0.7)
+
+# Last words that turn an ingredient into something else ("tomato" -> "tomato paste")
+DERIVED_HEADS: FrozenSet[str] = frozenset({
+    "stock", "broth", "powder", "paste", "puree", "sauce", "juice", "vinegar", "seed",
+    "extract", "oil", "flake", "zest", "cube", "essence", "syrup", "jam", "jelly",
+    "ketchup", "salt", "sugar", "flour", "starch", "water", "wine", "liqueur", "gravy",
+})
+# Specific keys that end in a pantry word but are a different thing
+NOT_A_VARIANT: FrozenSet[str] = frozenset({
+    "peanut butter", "almond butter", "coconut milk", "almond milk", "oat milk",
+    "soy milk", "coconut cream", "ice cream", "cream cheese", "sweet potato",
+    "egg noodle", "green bean", "bean sprout", "corn flour",
+})
+
+
+def is_variant(words: Tuple[str, ...], other: str) -> bool:
+    # other is a more specific name for the same thing, not a product made from it:
+    # "chicken" -> "chicken thigh" yes, "chicken stock" / "peanut butter" no
+    head = other.rsplit(" ", 1)[-1]
+    return other not in NOT_A_VARIANT and (head not in DERIVED_HEADS or head in words)
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def dice(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def _contains_words(words: Tuple[str, ...], other: Tuple[str, ...]) -> bool:
+    # words appear in other as one contiguous run
+    n = len(words)
+    return any(other[i:i + n] == words for i in range(len(other) - n + 1))
+
+
+class FuzzyIndex:
+    def __init__(self, keys: List[str]):
+        self.keys = sorted(set(k for k in keys if k))
+        self.words: List[Tuple[str, ...]] = [tuple(k.split()) for k in self.keys]
+        self.grams: List[Set[str]] = [trigrams(k) for k in self.keys]
+        self.by_word: Dict[str, List[int]] = {}     # word -> positions of keys using it
+        self.by_gram: Dict[str, List[int]] = {}     # trigram -> positions
+        for pos, (words, grams) in enumerate(zip(self.words, self.grams)):
+            for w in set(words):
+                self.by_word.setdefault(w, []).append(pos)
+            for g in grams:
+                self.by_gram.setdefault(g, []).append(pos)
+        self._memo: Dict[Tuple[str, float], List[Tuple[str, float]]] = {}
+        self._lock = threading.Lock()
+
+    def _score(self, key: str, words: Tuple[str, ...], grams: Set[str], pos: int) -> float:
+        other, other_words = self.keys[pos], self.words[pos]
+        if other == key:
+            return 1.0
+        if len(words) < len(other_words) and _contains_words(words, other_words):
+            if not is_variant(words, other):
+                return 0.0
+            return 0.6 + 0.4 * len(words) / len(other_words)
+        if len(words) == len(other_words):
+            return dice(grams, self.grams[pos])
+        return 0.0
+
+    def similar(self, key: str, threshold: float = None) -> List[Tuple[str, float]]:
+        # Recipe keys close to this pantry key, best first, as (key, score)
+        threshold = DEFAULT_THRESHOLD if threshold is None else threshold
+        memo_key = (key, threshold)
+        with self._lock:
+            hit = self._memo.get(memo_key)
+        if hit is not None:
+            return hit
+
+        words = tuple(key.split())
+        grams = trigrams(key)
+        candidates: Set[int] = set()
+        if words:
+            # keys that contain every word (smallest posting list first)
+            lists = sorted((self.by_word.get(w, []) for w in set(words)), key=len)
+            candidates.update(lists[0])
+            for other in lists[1:]:
+                candidates.intersection_update(other)
+        # A key that reaches the threshold by trigrams shares at least min_overlap of
+        # ours, so it shows up in the postings of our rarest len(grams) - min_overlap + 1
+        # trigrams; the common ones ("  b", "er ") never have to be walked.
+        min_overlap = max(1, math.ceil(threshold * len(grams) / (2 - threshold) - 1e-9)) if threshold > 0 else 1
+        rarest = sorted(grams, key=lambda g: len(self.by_gram.get(g, ())))
+        n_words = len(words)
+        for g in rarest[:max(1, len(grams) - min_overlap + 1)]:
+            for pos in self.by_gram.get(g, ()):
+                if len(self.words[pos]) == n_words:
+                    candidates.add(pos)
+
+        out = []
+        for pos in candidates:
+            score = self._score(key, words, grams, pos)
+            if score >= threshold:
+                out.append((self.keys[pos], round(score, 3)))
+        out.sort(key=lambda t: (-t[1], t[0]))
+        with self._lock:
+            self._memo[memo_key] = out
+        return out
+
+    def expand(self, flags: Dict[str, bool], threshold: float = None) -> Dict[str, bool]:
+        # Pantry flags plus every recipe key close to something owned
+        out = dict(flags)
+        for key, have_it in flags.items():
+            if not have_it:
+                continue
+            for other, _ in self.similar(key, threshold):
+                out[other] = True
+        return out
+
+
+def get_fuzzy_index(vocabulary: Callable[[], List[str]]) -> FuzzyIndex:
+    # One index per catalog version; vocabulary() returns the recipe ingredient keys
+    return get_catalog().derived("fuzzy_index", lambda: FuzzyIndex(vocabulary()))
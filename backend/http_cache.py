@@ -0,0 +1,88 @@
+# On-disk HTTP response cache for TheMealDB imports
+# Each URL is stored as one small JSON file (body + ETag/Last-Modified + when we got it).
+# Fresh entries (younger than the TTL) are used without touching the network; stale
+# ones are revalidated with If-None-Match / If-Modified-Since when the server gave
+# us validators, and a 304 just renews the entry.
+# Used by bulk_import.py and simple_recipe_import.py.
+# ------------------------------------------------------------
+
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+from atomic_write import atomic_write_text
+
+CACHE_DIR = Path(__file__).resolve().parent / "data" / "http_cache"
+DEFAULT_TTL = 7 * 24 * 3600  # a week; meals on TheMealDB rarely change
+
+
+class HttpCache:
+    def __init__(self, directory: Path = CACHE_DIR, ttl: float = DEFAULT_TTL):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        # get_json runs on the import's worker threads; += on an attribute isn't atomic
+        self._lock = threading.Lock()
+
+    def _path(self, url: str) -> Path:
+        return self.directory / (hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def load(self, url: str) -> Optional[Dict[str, Any]]:
+        path = self._path(url)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("url") == url else None
+
+    def save(self, url: str, body: Any, etag: str = "", last_modified: str = "") -> None:
+        entry = {
+            "url": url,
+            "fetched_at": time.time(),
+            "etag": etag or "",
+            "last_modified": last_modified or "",
+            "body": body,
+        }
+        # temp file + rename, so a crash never leaves half an entry
+        atomic_write_text(self._path(url), json.dumps(entry, ensure_ascii=False), durable=False)
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - float(entry.get("fetched_at", 0)) < self.ttl
+
+    def get_json(self, url: str, fetch: Callable[[Dict[str, str]], Any]) -> Any:
+        # fetch(headers) must perform the GET and return the requests.Response;
+        # it is only called when the cache can't answer on its own
+        entry = self.load(url)
+        if entry is not None and self.is_fresh(entry):
+            with self._lock:
+                self.hits += 1
+            return entry["body"]
+
+        headers: Dict[str, str] = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        resp = fetch(headers)
+        if resp.status_code == 304 and entry is not None:
+            with self._lock:
+                self.revalidated += 1
+            self.save(url, entry["body"], entry.get("etag", ""), entry.get("last_modified", ""))
+            return entry["body"]
+
+        with self._lock:
+            self.misses += 1
+        resp.raise_for_status()
+        body = resp.json() or {}
+        self.save(url, body, resp.headers.get("ETag", ""), resp.headers.get("Last-Modified", ""))
+        return body
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses}
@@ -1,38 +1,131 @@
 from __future__ import annotations
 
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
 from typing import Dict
 
+# Canonical ingredient names
+# Recipes and the pantry spell the same thing many ways ("Tomatoes", "tomato",
+# "Spring Onions", "scallion"). Everything that compares ingredients goes through
+# ingredient_key(), which
+#   1. normalizes (lowercase, accents dropped, punctuation -> spaces, single spaces)
+#   2. maps whole-name synonyms from data/synonyms.json
+#   3. folds plurals on the last word ("cherry tomatoes" -> "cherry tomato")
+#   4. maps synonyms again, so the data file only needs the singular form
+# Recipes are keyed once per catalog load (recipe_index.py); the results are memoized,
+# so the pantry side costs a dict lookup per item after the first time.
+# ------------------------------------------------------------
 
-# SYNONYMS maps variant -> canonical name.
-# Ex: both "bell pepper" and "bell peppers" become "pepper"
-SYNONYMS: Dict[str, str] = {
-    # peppers
-    "bell pepper": "pepper",
-    "bell peppers": "pepper",
-    "red pepper": "pepper",
-    "green pepper": "pepper",
-    # other
-    "yoghurt": "yogurt",
-    # chilli/chili variants
-    "green chilli": "chilli",
-    "green chili": "chilli",
-    "chilli powder": "chili powder",
-    # oils
-    "vegetable oil": "oil",
-    "olive oil": "oil",
-    # stock/broth
-    "chicken stock": "chicken broth",
-    "stock": "broth",
-    # onion
-    "spring onion": "green onion",
-    "spring onions": "green onion",
-    "tomatoes": "tomato",
-    "potatoes": "potato",
-    "onions": "onion",
-    "peppers": "pepper",
-    # we can add more
+BASE_DIR = Path(__file__).resolve().parent
+SYNONYMS_PATH = Path(os.environ.get("INGREDIENT_SYNONYMS_PATH") or BASE_DIR / "data" / "synonyms.json")
+_CACHE_SIZE = 1 << 16
+
+
+def load_synonyms(path: Path = None) -> Dict[str, str]:
+    # variant -> canonical name; keys starting with "_" are comments
+    path = Path(path or SYNONYMS_PATH)
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        print(f"[warn] {path} not found, no ingredient synonyms loaded")
+        return {}
+    return {_normalize(k): _normalize(v) for k, v in raw.items() if not k.startswith("_")}
+
+
+# Using one regex to filter, then split/join collapses the spaces
+_NOT_WORD = re.compile(r"[^a-z0-9\s]")
+
+def _normalize(name: str) -> str:
+    if not name:
+        return ""
+    s = name.lower()
+    if not s.isascii():
+        # "jalapeño" -> "jalapeno" rather than "jalape o"
+        s = unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("ascii")
+    return " ".join(_NOT_WORD.sub(" ", s).split())
+
+
+# Plurals
+# Only the last word is folded ("brussels sprouts" -> "brussels sprout"). Words that
+# only look plural stay as they are.
+_NOT_PLURAL = {
+    "asparagus", "couscous", "hummus", "citrus", "molasses", "swiss", "grits",
+    "bass", "lemongrass", "series", "jus", "anise", "christmas", "harissa",
+}
+_IRREGULAR = {
+    "leaves": "leaf", "loaves": "loaf", "halves": "half", "knives": "knife",
+    "geese": "goose", "mice": "mouse", "teeth": "tooth",
 }
 
+def singularize(word: str) -> str:
+    if len(word) <= 3 or word in _NOT_PLURAL or not word.endswith("s"):
+        return word
+    if word in _IRREGULAR:
+        return _IRREGULAR[word]
+    if word.endswith(("ss", "us", "is")):
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"                 # berries -> berry
+    if word.endswith("oes"):
+        return word[:-2]                       # tomatoes -> tomato
+    if word.endswith(("ches", "shes", "xes", "zes", "sses")):
+        return word[:-2]                       # peaches -> peach
+    return word[:-1]                           # onions -> onion, cloves -> clove
+
+
+SYNONYMS: Dict[str, str] = load_synonyms()
+
 
+@lru_cache(maxsize=_CACHE_SIZE)
 def to_canonical(name: str) -> str:
+    # name must already be normalized
+    name = SYNONYMS.get(name, name)
+    head, _, last = name.rpartition(" ")
+    single = singularize(last)
+    if single != last:
+        name = f"{head} {single}" if head else single
     return SYNONYMS.get(name, name)
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def normalize_name(name: str) -> str:
+    return _normalize(name)
+
+
+def normalize_text(text: str) -> str:
+    # Same rules for long text (instructions...), without filling the memo with it
+    return _normalize(text)
+
+
+# normalize + synonyms + plurals in one step, used for both recipes and the pantry
+@lru_cache(maxsize=_CACHE_SIZE)
+def ingredient_key(name: str) -> str:
+    return to_canonical(_normalize(name))
+
+
+def reload_synonyms(path: Path = None) -> None:
+    # Re-read the data file (e.g. after editing it) and forget memoized keys. The
+    # catalog's recipe records were keyed with the old rules, so it reloads too;
+    # cached matches are keyed by rules_fingerprint() and simply stop being hit.
+    global SYNONYMS
+    SYNONYMS = load_synonyms(path)
+    for fn in (to_canonical, normalize_name, ingredient_key, rules_fingerprint):
+        fn.cache_clear()
+    from recipe_sources import get_catalog  # recipe_sources doesn't need this module otherwise
+    get_catalog().invalidate()
+
+
+# Changes whenever the normalization rules change, so anything built from normalized
+# names (like the catalog snapshot) knows it has to be rebuilt
+NORMALIZE_VERSION = 2
+
+@lru_cache(maxsize=1)
+def rules_fingerprint() -> str:
+    data = json.dumps({"v": NORMALIZE_VERSION, "synonyms": SYNONYMS,
+                       "not_plural": sorted(_NOT_PLURAL), "irregular": _IRREGULAR}, sort_keys=True)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
@@ -1,12 +1,14 @@
 # backend/inventory_cli.py
+# Edits go through the same store as the app (inventory_store.py): one journaled
+# transaction per run, so they don't overwrite changes made in the app meanwhile.
 import json
 from pathlib import Path
 import argparse
 import re
 import subprocess
-from typing import Dict, List
+from typing import List
 
-INVENTORY_PATH = Path(__file__).resolve().parent / "/api/inventory.json"
+from inventory_store import STORE, InventoryTxn
 
 def normalize(name: str) -> str:
     s = (name or "").lower().strip()
@@ -14,34 +16,23 @@ def normalize(name: str) -> str:
     s = re.sub(r"\s+", " ", s).strip()
     return s
 
-def load_inventory() -> Dict[str, bool]:
-    if not INVENTORY_PATH.exists():
-        return {}
-    try:
-        return json.loads(INVENTORY_PATH.read_text(encoding="utf-8"))
-    except Exception:
-        return {}
-
-def save_inventory(inv: Dict[str, bool]) -> None:
-    INVENTORY_PATH.write_text(json.dumps(inv, indent=2, ensure_ascii=False), encoding="utf-8")
-
-def add_have(inv: Dict[str, bool], items: List[str]) -> None:
+def add_have(txn: InventoryTxn, items: List[str]) -> None:
     for raw in items:
         n = normalize(raw)
-        if n:
-            inv[n] = True
+        if n and not (txn.get(n) or {}).get("quantity"):
+            txn.set(n, True)  # keeps the amount of something we already have
 
-def add_missing(inv: Dict[str, bool], items: List[str]) -> None:
+def add_missing(txn: InventoryTxn, items: List[str]) -> None:
     for raw in items:
         n = normalize(raw)
         if n:
-            inv[n] = False
+            txn.set(n, False)
 
-def remove(inv: Dict[str, bool], items: List[str]) -> None:
+def remove(txn: InventoryTxn, items: List[str]) -> None:
     for raw in items:
         n = normalize(raw)
-        if n in inv:
-            del inv[n]
+        if n:
+            txn.delete(n)
 
 def parse_csv(s: str | None) -> List[str]:
     if not s:
@@ -49,7 +40,7 @@ def parse_csv(s: str | None) -> List[str]:
     return [p.strip() for p in s.split(",") if p.strip()]
 
 def main():
-    parser = argparse.ArgumentParser(description="Manage backend/inventory.json")
+    parser = argparse.ArgumentParser(description="Manage the pantry (backend/inventory.json)")
     parser.add_argument("--have", type=str, help='Comma-separated items you HAVE, e.g., "chicken,onion"')
     parser.add_argument("--missing", type=str, help='Comma-separated items you do NOT have, e.g., "tomato"')
     parser.add_argument("--remove", type=str, help='Comma-separated items to delete from pantry')
@@ -59,30 +50,21 @@ def main():
     parser.add_argument("--max-missing", type=int, default=2, help="Threshold for 'nearly cookable' when using --run")
     args = parser.parse_args()
 
-    inv = load_inventory()
-
-    if args.reset:
-        inv = {}
-
     have_items = parse_csv(args.have)
-    if have_items:
-        add_have(inv, have_items)
-
     missing_items = parse_csv(args.missing)
-    if missing_items:
-        add_missing(inv, missing_items)
-
     remove_items = parse_csv(args.remove)
-    if remove_items:
-        remove(inv, remove_items)
-
-    if args.list and not (args.reset or have_items or missing_items or remove_items):
-        print(json.dumps(inv, indent=2, ensure_ascii=False))
-        return
 
     if args.reset or have_items or missing_items or remove_items:
-        save_inventory(inv)
-        print(f"[ok] Saved {INVENTORY_PATH}")
+        with STORE.transaction() as txn:
+            if args.reset:
+                txn.reset()
+            add_have(txn, have_items)
+            add_missing(txn, missing_items)
+            remove(txn, remove_items)
+        print(f"[ok] Saved {STORE.path} (version {txn.version})")
+    elif args.list:
+        print(json.dumps(STORE.items(), indent=2, ensure_ascii=False))
+        return
 
     if args.run:
         cmd = ["python", str(Path(__file__).resolve().parent / "recipe_matcher.py"),
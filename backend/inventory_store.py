@@ -0,0 +1,354 @@
+# Inventory store
+# The pantry used to be read from inventory.json and rewritten in full on every
+# request, with nothing stopping two requests from overwriting each other's changes.
+# Now it lives in memory behind a lock. Every change is appended as one line to a
+# journal (inventory.journal.jsonl) and once the journal gets long it is folded back
+# into inventory.json (atomic rename), so the JSON file stays the readable copy the
+# CLI scripts use.
+#
+# Journal records hold the resulting items, never deltas, so replaying a record twice
+# (e.g. after a crash between writing inventory.json and clearing the journal) is harmless:
+#   {"v": 12, "set": {"salt": {"quantity": 1.0, "unit": "tsp"}}, "del": ["eggs"]}
+#   {"v": 13, "reset": true, "set": {}}
+#   {"v": 40, "base": true}        <- first line after a compaction
+#
+# Several processes (gunicorn workers, scripts) can share the files: writes take an
+# flock on inventory.lock and every process catches up with the journal first.
+#
+# HOW TO RUN:
+    # python backend/inventory_store.py --stats
+    # python backend/inventory_store.py --compact
+# ------------------------------------------------------------
+
+import argparse
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from atomic_write import atomic_write_text
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock
+    fcntl = None
+
+BASE_DIR = Path(__file__).resolve().parent
+INVENTORY_PATH = BASE_DIR / "inventory.json"
+# fold the journal into inventory.json after this many records
+COMPACT_EVERY = int(os.environ.get("INVENTORY_COMPACT_EVERY") or 100)
+# fsync every journal append (turn off for speed when losing the last edit is fine)
+DURABLE = os.environ.get("INVENTORY_FSYNC", "1") != "0"
+
+DEFAULT_ITEMS = {
+    "salt": {"quantity": 1.0, "unit": "tsp"},
+    "pepper": {"quantity": 1.0, "unit": "tsp"},
+}
+
+
+def journal_path_for(path: Path) -> Path:
+    return path.with_name(path.stem + ".journal.jsonl")
+
+
+def _clean_item(item: Any) -> Dict[str, Any]:
+    # Same shape save_inventory always wrote: {"quantity": float, "unit": str}
+    if isinstance(item, dict):
+        out = dict(item)
+        out["quantity"] = float(item.get("quantity", 0) or 0)
+        out["unit"] = (item.get("unit") or "").strip()
+        return out
+    return {"quantity": 1.0 if item else 0.0, "unit": ""}
+
+
+def _file_sig(path: Path) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _read_snapshot(path: Path) -> Dict[str, Dict[str, Any]]:
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"[warn] Could not parse inventory JSON: {e}")
+        return {}
+    return {k: _clean_item(v) for k, v in (raw or {}).items()}
+
+
+def _apply_record(items: Dict[str, Dict[str, Any]], rec: Dict[str, Any]) -> None:
+    if rec.get("reset"):
+        items.clear()
+    for name in rec.get("del", ()):
+        items.pop(name, None)
+    for name, item in (rec.get("set") or {}).items():
+        items[name] = item
+
+
+def _read_journal(path: Path, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+    # Complete records from offset on, and the offset just past the last good one.
+    # A half-written last line (crash mid-append) is left out.
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return [], 0
+    records = []
+    good = 0
+    for line in data.splitlines(keepends=True):
+        if not line.endswith(b"\n"):
+            break
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            break
+        good += len(line)
+    return records, offset + good
+
+
+def read_inventory(path: Path = None) -> Dict[str, Dict[str, Any]]:
+    # Read-only view for scripts: inventory.json plus whatever the journal adds
+    path = Path(path or INVENTORY_PATH)
+    items = _read_snapshot(path)
+    for rec in _read_journal(journal_path_for(path))[0]:
+        _apply_record(items, rec)
+    return items
+
+
+class InventoryTxn:
+    # Changes made inside InventoryStore.transaction(); reads see them immediately
+    def __init__(self, items: Dict[str, Dict[str, Any]]):
+        self._items = items
+        self.cleared = False
+        self.sets: Dict[str, Dict[str, Any]] = {}
+        self.deletes: set = set()
+        self.version: Optional[int] = None   # store version after the transaction
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        if name in self.sets:
+            return self.sets[name]
+        if self.cleared or name in self.deletes:
+            return None
+        return self._items.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def names(self) -> List[str]:
+        # item names as they stand inside the transaction
+        names = set() if self.cleared else set(self._items) - self.deletes
+        return sorted(names | set(self.sets))
+
+    def items(self) -> Dict[str, Dict[str, Any]]:
+        # the pantry as it will be once the transaction commits
+        return {name: self.get(name) for name in self.names()}
+
+    def set(self, name: str, item: Any) -> Dict[str, Any]:
+        item = _clean_item(item)
+        self.sets[name] = item
+        self.deletes.discard(name)
+        return item
+
+    def delete(self, name: str) -> Optional[Dict[str, Any]]:
+        removed = self.get(name)
+        if removed is not None:
+            self.sets.pop(name, None)
+            self.deletes.add(name)
+        return removed
+
+    def reset(self) -> None:
+        self.cleared = True
+        self.sets.clear()
+        self.deletes.clear()
+
+    @property
+    def changed(self) -> bool:
+        return self.cleared or bool(self.sets) or bool(self.deletes)
+
+    def record(self, version: int) -> Dict[str, Any]:
+        rec: Dict[str, Any] = {"v": version}
+        if self.cleared:
+            rec["reset"] = True
+        if self.deletes:
+            rec["del"] = sorted(self.deletes)
+        rec["set"] = self.sets
+        return rec
+
+
+class InventoryStore:
+    def __init__(self, path: Path = None, compact_every: int = None, durable: bool = None):
+        self.path = Path(path or INVENTORY_PATH)
+        self.journal_path = journal_path_for(self.path)
+        self.lock_path = self.path.with_name(self.path.stem + ".lock")
+        self.compact_every = COMPACT_EVERY if compact_every is None else compact_every
+        self.durable = DURABLE if durable is None else durable
+        self._lock = threading.RLock()
+        self._items: Optional[Dict[str, Dict[str, Any]]] = None
+        self.version = 0
+        self._snapshot_sig = None
+        self._journal_sig = None   # (inode, offset we have read up to)
+        self._journal_records = 0
+        self.writes = 0
+        self.compactions = 0
+
+    # ---- locking / catching up ---- #
+
+    @contextmanager
+    def _locked(self, exclusive: bool = True) -> Iterator[None]:
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.lock_path, "a") as lf:
+                fcntl.flock(lf, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lf, fcntl.LOCK_UN)
+
+    def _reload(self) -> None:
+        if not self.path.exists() and not self.journal_path.exists():
+            # first run: same starter pantry the app always created
+            atomic_write_text(self.path, json.dumps(DEFAULT_ITEMS, indent=2))
+        self._items = _read_snapshot(self.path)
+        self._snapshot_sig = _file_sig(self.path)
+        records, offset = _read_journal(self.journal_path)
+        self.version = 0
+        for rec in records:
+            _apply_record(self._items, rec)
+            self.version = max(self.version, int(rec.get("v", 0)))
+        self._journal_records = sum(1 for r in records if not r.get("base"))
+        sig = _file_sig(self.journal_path)
+        self._journal_sig = (sig[0], offset) if sig else None
+
+    def _refresh(self) -> None:
+        # Catch up with what other processes wrote since we last looked
+        if self._items is None or _file_sig(self.path) != self._snapshot_sig:
+            self._reload()
+            return
+        sig = _file_sig(self.journal_path)
+        if sig is None:
+            if self._journal_sig is not None:
+                self._reload()
+            return
+        if self._journal_sig is None or sig[0] != self._journal_sig[0] or sig[2] < self._journal_sig[1]:
+            self._reload()  # journal was compacted / replaced by someone else
+            return
+        if sig[2] > self._journal_sig[1]:
+            records, offset = _read_journal(self.journal_path, self._journal_sig[1])
+            for rec in records:
+                _apply_record(self._items, rec)
+                self.version = max(self.version, int(rec.get("v", 0)))
+                self._journal_records += 0 if rec.get("base") else 1
+            self._journal_sig = (sig[0], offset)
+
+    # ---- reading ---- #
+
+    def snapshot(self) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+        # (version, copy of the pantry)
+        with self._locked(exclusive=False):
+            self._refresh()
+            return self.version, {k: dict(v) for k, v in self._items.items()}
+
+    def items(self) -> Dict[str, Dict[str, Any]]:
+        return self.snapshot()[1]
+
+    # ---- writing ---- #
+
+    @contextmanager
+    def transaction(self) -> Iterator[InventoryTxn]:
+        # Everything done on the txn is applied together with one journal append.
+        # Raising inside the block discards the changes.
+        with self._locked():
+            self._refresh()
+            txn = InventoryTxn(self._items)
+            yield txn
+            if txn.changed:
+                self._commit(txn)
+            txn.version = self.version
+
+    def _commit(self, txn: InventoryTxn) -> None:
+        rec = txn.record(self.version + 1)
+        line = (json.dumps(rec, separators=(",", ":")) + "\n").encode("utf-8")
+        offset = self._journal_sig[1] if self._journal_sig else 0
+        with open(self.journal_path, "ab") as f:
+            if f.tell() != offset:
+                f.truncate(offset)  # drop a torn record left by a crash
+            f.write(line)
+            f.flush()
+            if self.durable:
+                os.fsync(f.fileno())
+        _apply_record(self._items, rec)
+        self.version = rec["v"]
+        self.writes += 1
+        self._journal_records += 1
+        self._journal_sig = (_file_sig(self.journal_path)[0], offset + len(line))
+        if self.compact_every and self._journal_records >= self.compact_every:
+            self._compact()
+
+    def set(self, name: str, item: Any) -> Dict[str, Any]:
+        with self.transaction() as txn:
+            return txn.set(name, item)
+
+    def delete(self, name: str) -> Optional[Dict[str, Any]]:
+        with self.transaction() as txn:
+            return txn.delete(name)
+
+    def reset(self) -> None:
+        with self.transaction() as txn:
+            txn.reset()
+
+    # ---- compaction ---- #
+
+    def _compact(self) -> None:
+        # inventory.json first, then the journal restarts from a base record. A crash in
+        # between only means the old records get replayed onto the new file again.
+        atomic_write_text(self.path, json.dumps(self._items, indent=2), durable=self.durable)
+        base = json.dumps({"v": self.version, "base": True}, separators=(",", ":")) + "\n"
+        atomic_write_text(self.journal_path, base, durable=self.durable)
+        self._snapshot_sig = _file_sig(self.path)
+        self._journal_sig = (_file_sig(self.journal_path)[0], len(base.encode("utf-8")))
+        self._journal_records = 0
+        self.compactions += 1
+
+    def compact(self) -> None:
+        with self._locked():
+            self._refresh()
+            self._compact()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._locked(exclusive=False):
+            self._refresh()
+            return {
+                "version": self.version,
+                "items": len(self._items),
+                "journal_records": self._journal_records,
+                "compact_every": self.compact_every,
+                "writes": self.writes,
+                "compactions": self.compactions,
+            }
+
+
+STORE = InventoryStore()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inventory journal maintenance.")
+    parser.add_argument("--compact", action="store_true", help="Fold the journal into inventory.json now")
+    parser.add_argument("--stats", action="store_true", help="Show version / journal size")
+    args = parser.parse_args()
+
+    if args.compact:
+        STORE.compact()
+        print(f"[ok] Compacted journal into {STORE.path}")
+    print(json.dumps(STORE.stats(), indent=2))
+
+if __name__ == "__main__":
+    main()
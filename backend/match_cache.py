@@ -0,0 +1,82 @@
+# Match result cache
+# The match page asks for recipes on every search, but the pantry and the catalog
+# rarely change in between. MatchCache remembers the last few results (LRU) keyed by
+# catalog version + a fingerprint of the pantry + the query options.
+# ------------------------------------------------------------
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+# Same pantry (in any order, any spelling that normalizes the same) -> same fingerprint.
+# amounts (quantity-aware matching) are part of it when given.
+def inventory_fingerprint(flags: Dict[str, bool], amounts: Optional[Dict[int, float]] = None) -> str:
+    owned = sorted(k for k, have_it in flags.items() if have_it)
+    if amounts:
+        owned.append("amounts:" + ",".join(f"{slot}={amount!r}" for slot, amount in sorted(amounts.items())))
+    return hashlib.sha1("\n".join(owned).encode("utf-8")).hexdigest()
+
+
+class MatchCache:
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any],
+                       keep: Optional[Callable[[Any], bool]] = None) -> Any:
+        # keep: only values it accepts are stored (e.g. results that depend on timing)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        value = compute()
+        if keep is not None and not keep(value):
+            return value
+        with self._lock:
+            if self.maxsize > 0:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def drop_other_versions(self, version: Hashable) -> None:
+        # Keys start with the catalog version; old versions can never be hit again
+        with self._lock:
+            stale = [k for k in self._entries if k[0] != version]
+            for k in stale:
+                del self._entries[k]
+
+    def clear(self) -> None:
+        # Called whenever the pantry is written
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+# One cache per process; MATCH_CACHE_SIZE=0 turns it off
+MATCH_CACHE = MatchCache(int(os.environ.get("MATCH_CACHE_SIZE", "128")))
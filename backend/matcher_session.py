@@ -0,0 +1,97 @@
+# Incremental matching
+# Editing one pantry item only changes the missing count of recipes that use that
+# ingredient. MatcherSession keeps a missing count per recipe plus buckets of recipes
+# by missing count, and on each edit only walks that ingredient's posting list.
+# ------------------------------------------------------------
+
+import threading
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from recipe_index import IngredientIndex
+
+# Recipes missing more than this many ingredients are not kept in a bucket; asking for
+# a bigger max_missing still works, it just falls back to a scan of the counts.
+MAX_TRACKED_MISSING = 10
+
+
+class MatcherSession:
+    def __init__(self, index: IngredientIndex, inventory: Dict[str, bool], max_tracked: int = MAX_TRACKED_MISSING):
+        self.index = index
+        self.max_tracked = max_tracked
+        self._lock = threading.Lock()
+        self.owned: Set[str] = set()
+        self.missing: List[int] = list(index.sizes)
+        for key, have_it in inventory.items():
+            if have_it and key not in self.owned:
+                self.owned.add(key)
+                for rid in index.postings.get(key, ()):
+                    self.missing[rid] -= 1
+        # buckets[c] = recipes missing exactly c ingredients (0 = cookable)
+        self.buckets: List[Set[int]] = [set() for _ in range(max_tracked + 1)]
+        for rid, c in enumerate(self.missing):
+            if c <= max_tracked:
+                self.buckets[c].add(rid)
+
+    def _shift(self, key: str, delta: int) -> int:
+        # Move every recipe using `key` by delta (-1 = we now have it, +1 = we lost it)
+        buckets = self.buckets
+        top = self.max_tracked
+        moved = 0
+        for rid in self.index.postings.get(key, ()):
+            old = self.missing[rid]
+            new = old + delta
+            self.missing[rid] = new
+            if old <= top:
+                buckets[old].discard(rid)
+            if new <= top:
+                buckets[new].add(rid)
+            moved += 1
+        return moved
+
+    def add(self, key: str) -> int:
+        with self._lock:
+            if key in self.owned:
+                return 0
+            self.owned.add(key)
+            return self._shift(key, -1)
+
+    def remove(self, key: str) -> int:
+        with self._lock:
+            if key not in self.owned:
+                return 0
+            self.owned.discard(key)
+            return self._shift(key, +1)
+
+    def set_have(self, key: str, have_it: bool) -> int:
+        return self.add(key) if have_it else self.remove(key)
+
+    def sync(self, inventory: Dict[str, bool]) -> int:
+        # Apply whatever differs between the session and this pantry.
+        # After a single-item edit that is at most one key.
+        wanted = {k for k, have_it in inventory.items() if have_it}
+        moved = 0
+        for key in list(self.owned - wanted):
+            moved += self.remove(key)
+        for key in wanted - self.owned:
+            moved += self.add(key)
+        return moved
+
+    def _found(self, max_missing: int) -> List[Tuple[int, int]]:
+        # lock held
+        if max_missing <= self.max_tracked:
+            return [(rid, c) for c in range(max_missing + 1) for rid in self.buckets[c]]
+        return [(rid, c) for rid, c in enumerate(self.missing) if c <= max_missing]
+
+    def candidates(self, max_missing: int) -> Iterator[Tuple[int, int]]:
+        # Same contract as the engines in recipe_matcher: (rid, missing_count)
+        with self._lock:
+            return iter(self._found(max_missing))
+
+    def candidates_if_owns(self, inventory: Dict[str, bool], max_missing: int) -> Optional[Iterator[Tuple[int, int]]]:
+        # candidates() if the session is at exactly this pantry, else None. Checked and
+        # read under one lock, so an edit landing in between can't mix two pantries.
+        wanted = {k for k, have_it in inventory.items() if have_it}
+        with self._lock:
+            if self.owned != wanted:
+                return None
+            return iter(self._found(max_missing))
@@ -0,0 +1,298 @@
+# Weekly meal plan
+# Picks N recipes (say 7 dinners) that together need the fewest ingredients bought:
+# three recipes that all miss coriander cost one purchase, not three.
+#
+# The candidates are the matches get_recipe_matches would list for the pantry (same
+# engine, max_missing, search and filters), in the same order. Each one becomes a
+# bitmask of the ingredients it misses, and recipes missing exactly the same things
+# are grouped, so "what to buy" is a union of group masks and a recipe is in reach
+# when its mask is inside that union. The cheapest plan is the smallest union that
+# puts N recipes in reach.
+#
+# That's a set cover style problem, so the search is bounded by a time budget:
+#   1. greedy: keep buying the group with the fewest new ingredients per recipe it
+#      brings in reach (the fallback, if even that runs out of time, is simply the
+#      n candidates missing the least)
+#   2. beam search: the BEAM_WIDTH best partial unions per step, ranked the same way
+#   3. branch and bound over the groups (fewest missing first), pruning a branch when
+#      what it buys plus a lower bound for the rest can't beat the best plan so far.
+#      Bound: buying d more ingredients only reaches recipes missing at most d of the
+#      ones not bought yet, so d has to be large enough for those to add up to N.
+# If branch and bound finishes inside the budget the plan is the cheapest possible
+# ("best": true), otherwise it is the best one found in time.
+# Cookable recipes are free; if there are N of them that is the plan.
+#
+# HOW TO RUN:
+    # python backend/meal_planner.py
+    # python backend/meal_planner.py --n 7 --max-missing 3 --tags Dinner --budget 2
+# ------------------------------------------------------------
+
+import argparse
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from match_cache import MATCH_CACHE, inventory_fingerprint
+from recipe_index import key_id, key_name
+from recipe_matcher import (
+    DEFAULT_ENGINE,
+    FILTERS,
+    INVENTORY_PATH,
+    build_inventory_amounts,
+    build_inventory_flags,
+    cache_version,
+    filter_rids,
+    load_inventory,
+    match_catalog,
+    normalize_filters,
+)
+from shopping_list import build_shopping_list, print_shopping_list
+
+DEFAULT_BUDGET = 1.0   # seconds
+BEAM_WIDTH = 32
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+def _bits(mask: int):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class _Groups:
+    # candidates grouped by the mask of what they miss, fewest missing first
+    def __init__(self, candidates: List[Tuple[int, int]]):
+        groups: Dict[int, int] = {}
+        for _, mask in candidates:
+            groups[mask] = groups.get(mask, 0) + 1
+        self.masks = sorted(groups, key=int.bit_count)   # ties stay in the candidates' order
+        self.sizes = [groups[m] for m in self.masks]
+
+    def waiting(self, bought: int) -> Dict[int, int]:
+        # what is still missing -> recipes missing just that, for recipes not in reach yet
+        out: Dict[int, int] = {}
+        for mask, size in zip(self.masks, self.sizes):
+            rest = mask & ~bought
+            if rest:
+                out[rest] = out.get(rest, 0) + size
+        return out
+
+
+def _gain(waiting: Dict[int, int], new: int) -> int:
+    # recipes buying `new` (bits not bought yet) brings in reach: the ones whose rest is
+    # a submask of it. A candidate misses at most max_missing things, so that is at
+    # most 2^max_missing lookups however big the catalog is.
+    out = 0
+    sub = new
+    while sub:
+        out += waiting.get(sub, 0)
+        sub = (sub - 1) & new
+    return out
+
+
+def _min_extra(waiting: Dict[int, int], need: int) -> int:
+    # lower bound on how many more ingredients put `need` more recipes in reach:
+    # buying d more only reaches recipes with at most d things still missing
+    by_extra: Dict[int, int] = {}
+    for rest, size in waiting.items():
+        extra = rest.bit_count()
+        by_extra[extra] = by_extra.get(extra, 0) + size
+    total = 0
+    for extra in sorted(by_extra):
+        total += by_extra[extra]
+        if total >= need:
+            return extra
+    return max(by_extra, default=0)   # not reached: plan_meals only searches with more than n candidates
+
+
+def _rank(cost: int, reached: int) -> Tuple[float, int]:
+    # partial plans: fewest ingredients per recipe in reach first
+    return (cost / (reached + 1), cost)
+
+
+def _greedy(groups: _Groups, reached: int, n: int, deadline: float) -> Optional[int]:
+    bought = 0
+    waiting = groups.waiting(0)
+    while reached < n:
+        if time.perf_counter() > deadline:
+            return None
+        best = min(waiting, key=lambda rest: (rest.bit_count() / _gain(waiting, rest), rest.bit_count(), rest))
+        reached += _gain(waiting, best)
+        bought |= best
+        waiting = groups.waiting(bought)
+    return bought
+
+
+def _beam(groups: _Groups, reached0: int, n: int, width: int, best: int, deadline: float) -> int:
+    beam = [(0, reached0)]
+    seen = {0}
+    limit = best.bit_count()
+    while beam:
+        children: Dict[int, int] = {}
+        for bought, reached in beam:
+            if time.perf_counter() > deadline:
+                return best
+            waiting = groups.waiting(bought)
+            for rest in waiting:
+                new = bought | rest
+                if new in seen or new.bit_count() >= limit:
+                    continue
+                seen.add(new)
+                got = reached + _gain(waiting, rest)
+                if got >= n:
+                    best, limit = new, new.bit_count()
+                else:
+                    children[new] = got
+        ranked = sorted((_rank(m.bit_count(), r), m, r) for m, r in children.items() if m.bit_count() < limit)
+        beam = [(m, r) for _, m, r in ranked[:width]]
+    return best
+
+
+def _branch_and_bound(groups: _Groups, reached0: int, n: int, best: int, deadline: float) -> Tuple[int, bool]:
+    # Groups are added in index order (a group already in reach is skipped), so every
+    # union is tried at most once
+    state = {"best": best, "cost": best.bit_count()}
+
+    def visit(bought: int, reached: int, start: int) -> None:
+        if time.perf_counter() > deadline:
+            raise _OutOfTime
+        waiting = groups.waiting(bought)
+        if bought.bit_count() + _min_extra(waiting, n - reached) >= state["cost"]:
+            return
+        for g in range(start, len(groups.masks)):
+            rest = groups.masks[g] & ~bought
+            if not rest:
+                continue
+            new = bought | rest
+            if new.bit_count() >= state["cost"]:
+                continue
+            got = reached + _gain(waiting, rest)
+            if got >= n:
+                state["best"], state["cost"] = new, new.bit_count()
+            else:
+                visit(new, got, g + 1)
+
+    try:
+        visit(0, reached0, 0)
+    except _OutOfTime:
+        return state["best"], False
+    return state["best"], True
+
+
+def plan_meals(candidates: List[Tuple[int, int]], n: int, budget: float = DEFAULT_BUDGET,
+               beam_width: int = BEAM_WIDTH) -> Tuple[List[int], int, bool]:
+    # candidates: (rid, mask of the ingredients it misses), in the order to prefer them
+    # -> (up to n rids, mask of what to buy, whether no cheaper plan exists)
+    deadline = time.perf_counter() + budget
+    if len(candidates) <= n:
+        bought = 0
+        for _, mask in candidates:
+            bought |= mask
+        return [rid for rid, _ in candidates], bought, True
+
+    groups = _Groups(candidates)
+    reached = len(candidates) - sum(groups.waiting(0).values())   # cookable now
+    if reached >= n:
+        best, proven = 0, True
+    else:
+        # first plan: the n candidates missing the least; then greedy, beam, branch and bound
+        best = 0
+        for mask in sorted((mask for _, mask in candidates), key=int.bit_count)[:n]:
+            best |= mask
+        greedy = _greedy(groups, reached, n, deadline)
+        if greedy is not None and greedy.bit_count() < best.bit_count():
+            best = greedy
+        best = _beam(groups, reached, n, beam_width, best, deadline)
+        best, proven = _branch_and_bound(groups, reached, n, best, deadline)
+
+    # The plan: recipes in reach, those using the most of what gets bought first
+    order = {rid: i for i, (rid, _) in enumerate(candidates)}
+    in_reach = sorted(((rid, mask) for rid, mask in candidates if not mask & ~best),
+                      key=lambda t: (-t[1].bit_count(), order[t[0]]))[:n]
+    bought = 0
+    for _, mask in in_reach:
+        bought |= mask
+    return [rid for rid, _ in in_reach], bought, proven
+
+
+# Same cache as the matches: cleared whenever the pantry changes, keyed by catalog version
+# and rules. Only plans proven cheapest are kept: one cut short by the budget depends on
+# how fast this request ran, and the next request may well find a better one.
+def get_meal_plan(inventory: dict, n: int = 7, max_missing: int = 2, budget: float = DEFAULT_BUDGET,
+                  search: Optional[str] = None, filters: Optional[Dict[str, Iterable[str]]] = None,
+                  engine: Optional[str] = None) -> Dict:
+    flags = build_inventory_flags(inventory)
+    amounts = build_inventory_amounts(inventory)   # the shopping list subtracts them
+    engine = engine or DEFAULT_ENGINE
+    if engine == "sql":
+        engine = "index"  # plans are rids into the in-memory catalog
+    search = " ".join((search or "").lower().split())
+    filters = normalize_filters(filters)
+    version = cache_version()
+    MATCH_CACHE.drop_other_versions(version)
+    key = (version, inventory_fingerprint(flags, amounts), "plan", n, max_missing, budget, engine, search, filters)
+    return MATCH_CACHE.get_or_compute(
+        key, lambda: _build_plan(inventory, flags, n, max_missing, budget, engine, search, filters),
+        keep=lambda plan: plan["best"],
+    )
+
+
+def _build_plan(inventory: dict, flags: Dict[str, bool], n: int, max_missing: int, budget: float,
+                engine: str, search: str, filters: tuple) -> Dict:
+    t0 = time.perf_counter()
+    allowed = filter_rids(filters, engine) if filters else None
+    cookable, near, _ = match_catalog(flags, max_missing, None, 0, engine, search=search, allowed=allowed)
+    owned = {key_id(k) for k, have_it in flags.items() if have_it}
+    bit_of: Dict[int, int] = {}   # key id -> bit, only for ingredients some candidate misses
+    by_rid = {}
+    candidates = []
+    for r, _, missing in cookable + near:
+        mask = 0
+        for kid in r.key_ids:
+            if kid not in owned:
+                mask |= 1 << bit_of.setdefault(kid, len(bit_of))
+        by_rid[r.rid] = (r, missing)
+        candidates.append((r.rid, mask))
+
+    rids, bought, proven = plan_meals(candidates, n, max(budget - (time.perf_counter() - t0), 0.0))
+    kid_of = {b: kid for kid, b in bit_of.items()}
+    recipes = [by_rid[rid][0] for rid in rids]
+    return {
+        "plan": [{"id": r.id, "title": r.title, "image": r.image, "missing": by_rid[r.rid][1]} for r in recipes],
+        "buy": sorted(key_name(kid_of[b]) for b in _bits(bought)),
+        "best": proven,           # false: the budget ran out before a cheaper plan was ruled out
+        "candidates": len(candidates),
+        "seconds": round(time.perf_counter() - t0, 3),
+        "shopping_list": build_shopping_list(recipes, inventory),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan N meals that need the fewest ingredients bought.")
+    parser.add_argument("--n", type=int, default=7, help="How many recipes (default 7)")
+    parser.add_argument("--max-missing", type=int, default=2, help="Only recipes missing at most this many now (default 2)")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="Seconds to search for a cheaper plan")
+    parser.add_argument("--search", type=str, default=None, help='Only recipes matching these words, e.g. "curry"')
+    for name in FILTERS:
+        parser.add_argument(f"--{name}", action="append", default=[], help=f"Filter: {name} (repeatable)")
+    args = parser.parse_args()
+
+    filters = {name: getattr(args, name) for name in FILTERS}
+    result = get_meal_plan(load_inventory(INVENTORY_PATH), args.n, args.max_missing, args.budget, args.search, filters)
+    if not result["plan"]:
+        print("No recipes within reach. Try a higher --max-missing.")
+        return
+    how = "cheapest possible" if result["best"] else "best found in time"
+    print(f"[info] {len(result['plan'])} recipe(s) from {result['candidates']} candidates, "
+          f"{len(result['buy'])} ingredient(s) to buy ({how}, {result['seconds']}s)")
+    for i, meal in enumerate(result["plan"], start=1):
+        missing = f"   (needs {', '.join(meal['missing'])})" if meal["missing"] else ""
+        print(f"{i}. {meal['title']}{missing}")
+    print_shopping_list(result["shopping_list"])
+
+
+if __name__ == "__main__":
+    main()
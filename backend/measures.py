@@ -0,0 +1,84 @@
+# Measures
+# Turns TheMealDB measure strings ("1 1/2 cups", "200g", "½ tsp", "2 large") and the
+# units the inventory page offers (pcs, cup, tbsp, tsp, g, kg, ml, L, oz, lbs, cloves,
+# slices) into one number in a base unit per dimension:
+#   count  -> pieces
+#   mass   -> grams
+#   volume -> millilitres
+# Anything we can't read ("to taste", "a pinch", "2 cans") is None: the matcher then
+# only checks that you have the ingredient at all, like before.
+# ------------------------------------------------------------
+
+import re
+from typing import Dict, Optional, Tuple
+
+DIMENSIONS = ("count", "mass", "volume")
+COUNT, MASS, VOLUME = range(len(DIMENSIONS))
+BASE_UNITS = ("pcs", "g", "ml")
+
+# unit spelling -> (dimension, how many base units one of it is)
+UNITS: Dict[str, Tuple[int, float]] = {}
+
+def _add(dim: int, factor: float, *names: str) -> None:
+    for n in names:
+        UNITS[n] = (dim, factor)
+
+_add(COUNT, 1, "", "pc", "pcs", "piece", "pieces", "whole", "large", "medium", "small",
+     "clove", "cloves", "slice", "slices")
+_add(MASS, 1, "g", "gr", "gram", "grams", "gramme", "grammes")
+_add(MASS, 1000, "kg", "kgs", "kilo", "kilos", "kilogram", "kilograms")
+_add(MASS, 28.3495, "oz", "ounce", "ounces")
+_add(MASS, 453.592, "lb", "lbs", "pound", "pounds")
+_add(VOLUME, 1, "ml", "mls", "millilitre", "millilitres", "milliliter", "milliliters")
+_add(VOLUME, 10, "cl")
+_add(VOLUME, 100, "dl")
+_add(VOLUME, 1000, "l", "litre", "litres", "liter", "liters")
+_add(VOLUME, 240, "cup", "cups")
+_add(VOLUME, 15, "tbsp", "tbs", "tbls", "tblsp", "tablespoon", "tablespoons")
+_add(VOLUME, 5, "tsp", "tsps", "teaspoon", "teaspoons")
+_add(VOLUME, 473.176, "pint", "pints")
+
+_FRACTIONS = {"½": " 1/2", "¼": " 1/4", "¾": " 3/4", "⅓": " 1/3", "⅔": " 2/3", "⅛": " 1/8"}
+# "1 1/2", "1/2", "1.5", "2" -- then an optional unit word right after (space optional)
+_AMOUNT = re.compile(r"^\s*(?:(\d+(?:[.,]\d+)?)\s+(\d+)/(\d+)|(\d+)/(\d+)|(\d+(?:[.,]\d+)?))\s*(?:-\s*[\d./]+\s*)?([a-z]*)\.?")
+
+
+def unit_to_base(quantity: float, unit: str) -> Optional[Tuple[int, float]]:
+    # Pantry side: quantity + one of the inventory units -> (dimension, base amount)
+    spec = UNITS.get((unit or "").strip().lower())
+    if spec is None:
+        return None
+    dim, factor = spec
+    return dim, float(quantity) * factor
+
+
+def parse_measure(text: str) -> Optional[Tuple[int, float]]:
+    # Recipe side: "1 1/2 cups" -> (VOLUME, 360.0); None if there is no amount we understand
+    s = (text or "").lower()
+    for ch, repl in _FRACTIONS.items():
+        s = s.replace(ch, repl)
+    m = _AMOUNT.match(s)
+    if not m:
+        return None
+    whole, num, den, fnum, fden, plain, unit = m.groups()
+    try:
+        if whole is not None:
+            amount = float(whole.replace(",", ".")) + int(num) / int(den)
+        elif fnum is not None:
+            amount = int(fnum) / int(fden)
+        else:
+            amount = float(plain.replace(",", "."))
+    except ZeroDivisionError:
+        return None
+    if amount <= 0:
+        return None
+    return unit_to_base(amount, unit)
+
+
+def format_amount(dim: int, amount: float) -> str:
+    # For messages like "need 500 g, have 5 g"
+    if dim == MASS and amount >= 1000:
+        return f"{round(amount / 1000, 2):g} kg"
+    if dim == VOLUME and amount >= 1000:
+        return f"{round(amount / 1000, 2):g} L"
+    return f"{round(amount, 1):g} {BASE_UNITS[dim]}"
@@ -0,0 +1,446 @@
+# Precomputed recipe data
+# Normalizing ingredient names (two regexes per ingredient) for every meal on every
+# request is the slow part of matching. Here we do it once per catalog load and keep
+# a small, ready-to-use record for each recipe.
+# ------------------------------------------------------------
+
+import sys
+import threading
+import zlib
+from array import array
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from ingredients import normalize_name, to_canonical
+from measures import DIMENSIONS, parse_measure
+from recipe_sources import get_catalog
+
+try:  # numpy is optional, the bitset engine falls back to Python ints without it
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Ingredient vocabulary
+# Every canonical ingredient key gets a small integer id, once per process. Recipes
+# store those ids in an array('I') (4 bytes each) instead of a tuple of strings.
+_KEY_IDS: Dict[str, int] = {}
+_KEYS: List[str] = []
+_vocab_lock = threading.Lock()
+
+
+def intern_key(key: str) -> int:
+    kid = _KEY_IDS.get(key)
+    if kid is None:
+        with _vocab_lock:
+            kid = _KEY_IDS.get(key)
+            if kid is None:
+                kid = len(_KEYS)
+                _KEYS.append(sys.intern(key))
+                _KEY_IDS[key] = kid
+    return kid
+
+
+def key_id(key: str) -> Optional[int]:
+    # id of a key we've seen in some recipe, or None
+    return _KEY_IDS.get(key)
+
+
+def key_name(kid: int) -> str:
+    return _KEYS[kid]
+
+
+def vocabulary() -> List[str]:
+    # all interned keys, position = id
+    return list(_KEYS)
+
+
+# Instructions are the biggest field and only needed when a recipe is shown, so long
+# ones are kept zlib-compressed and decoded on access
+_COMPRESS_OVER = 200
+
+
+class Recipe:
+    __slots__ = ("rid", "id", "title", "image", "key_ids", "_names", "_display", "_measures", "_instructions", "labels")
+
+    def __init__(self, rid: int, id: str, title: str, image: str, instructions: str,
+                 names, keys, ingredients, labels=("", "", "")):
+        self.rid = rid                                  # position in the catalog
+        self.id = id                                    # idMeal ("" for custom recipes without one)
+        self.title = title
+        self.image = image
+        self.key_ids = array("I", [intern_key(k) for k in keys])  # canonical keys, no duplicates
+        names = tuple(names)
+        # normalized names, one per key; usually identical to the keys, then not stored
+        self._names = None if names == tuple(keys) else tuple(sys.intern(n) for n in names)
+        # (name, measure) as shown in the UI, kept as two flat tuples of interned
+        # strings (measures like "1 tsp" repeat a lot)
+        self._display = tuple(sys.intern(n) for n, _ in ingredients)
+        self._measures = tuple(sys.intern(m) for _, m in ingredients)
+        # (category, area, tags) as in the source, e.g. ("Chicken", "Indian", "Curry,Spicy")
+        self.labels = tuple(sys.intern(str(v or "")) for v in labels)
+        instructions = instructions or ""
+        if len(instructions) > _COMPRESS_OVER:
+            self._instructions = zlib.compress(instructions.encode("utf-8"))
+        else:
+            self._instructions = instructions
+
+    @property
+    def keys(self) -> Tuple[str, ...]:
+        return tuple(_KEYS[i] for i in self.key_ids)
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        return self._names if self._names is not None else self.keys
+
+    @property
+    def ingredients(self) -> Tuple[Tuple[str, str], ...]:
+        return tuple(zip(self._display, self._measures))
+
+    @property
+    def instructions(self) -> str:
+        value = self._instructions
+        if isinstance(value, bytes):
+            return zlib.decompress(value).decode("utf-8")
+        return value
+
+    def _fields(self) -> tuple:
+        return (self.rid, self.id, self.title, self.image, self.instructions,
+                self.names, self.keys, self.ingredients, self.labels)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Recipe):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    __hash__ = None  # mutable slots, compare by value only
+
+    def __repr__(self) -> str:
+        return f"Recipe(rid={self.rid}, id={self.id!r}, title={self.title!r}, keys={self.keys!r})"
+
+    # ---- snapshots (see catalog_snapshot.py) ---- #
+
+    def to_state(self) -> tuple:
+        # Everything as stored, instructions stay compressed
+        return (self.rid, self.id, self.title, self.image, self.key_ids.tobytes(),
+                self._names, self._display, self._measures, self._instructions, self.labels)
+
+    @classmethod
+    def from_state(cls, state: tuple, remap: Optional[List[int]] = None) -> "Recipe":
+        # remap: snapshot key id -> this process's key id (None when they already agree)
+        r = cls.__new__(cls)
+        (r.rid, r.id, r.title, r.image, key_bytes,
+         r._names, r._display, r._measures, r._instructions, r.labels) = state
+        ids = array("I")
+        ids.frombytes(key_bytes)
+        if remap is not None:
+            ids = array("I", [remap[i] for i in ids])
+        r.key_ids = ids
+        return r
+
+    # ---- converters ---- #
+
+    @classmethod
+    def from_mealdb(cls, meal: Dict[str, Any], rid: int) -> "Recipe":
+        # TheMealDB shape: strMeal, strIngredient1..20 / strMeasure1..20, ...
+        pairs = _raw_ingredients(meal)
+        names, keys = _canonical_names([name for name, _ in pairs])
+        return cls(
+            rid=rid,
+            id=str(meal.get("idMeal") or "").strip(),
+            title=meal.get("strMeal") or meal.get("title") or "(unnamed)",
+            image=meal.get("image") or meal.get("strMealThumb") or "",
+            instructions=meal.get("strInstructions", "") or "",
+            names=names,
+            keys=keys,
+            ingredients=pairs,
+            labels=meal_labels(meal),
+        )
+
+    @classmethod
+    def from_custom(cls, meal: Dict[str, Any], rid: int) -> "Recipe":
+        # custom_recipes.json shape: title, ingredients (names or {"name", "measure"}), ...
+        pairs = []
+        for item in meal.get("ingredients") or []:
+            if isinstance(item, dict):
+                name, measure = str(item.get("name") or ""), str(item.get("measure") or "")
+            else:
+                name, measure = str(item), ""
+            if name.strip():
+                pairs.append((name.strip(), measure.strip()))
+        names, keys = _canonical_names([name for name, _ in pairs])
+        return cls(
+            rid=rid,
+            id=str(meal.get("idMeal") or meal.get("id") or "").strip(),
+            title=meal.get("title") or meal.get("strMeal") or "(unnamed)",
+            image=meal.get("image") or meal.get("strMealThumb") or "",
+            instructions=meal.get("instructions") or meal.get("strInstructions") or "",
+            names=names,
+            keys=keys,
+            ingredients=pairs,
+            labels=meal_labels(meal),
+        )
+
+
+def meal_labels(meal: Dict[str, Any]) -> Tuple[str, str, str]:
+    # (category, area, tags) of a meal in either shape; custom recipes may list their
+    # tags, TheMealDB has "Curry,Spicy"
+    tags = meal.get("tags") or meal.get("strTags")
+    if isinstance(tags, (list, tuple)):
+        tags = ",".join(str(v) for v in tags)
+    return (str(meal.get("category") or meal.get("strCategory") or ""),
+            str(meal.get("area") or meal.get("strArea") or ""),
+            str(tags or ""))
+
+
+def _raw_ingredients(meal: Dict[str, Any]) -> List[Tuple[str, str]]:
+    # TheMealDB stores ingredients in strIngredient1..20 and measures in strMeasure1..20
+    pairs = []
+    for i in range(1, 21):
+        ing = meal.get(f"strIngredient{i}")
+        measure = meal.get(f"strMeasure{i}")
+        if ing and ing.strip():
+            pairs.append((ing.strip(), measure.strip() if measure else ""))
+    return pairs
+
+
+def _canonical_names(raw_names: List[str]) -> Tuple[List[str], List[str]]:
+    names: List[str] = []
+    keys: List[str] = []
+    seen = set()
+    for raw in raw_names:
+        name = normalize_name(raw)
+        if not name:
+            continue
+        key = to_canonical(name)
+        if key in seen:  # "olive oil" + "vegetable oil" is still one thing to have
+            continue
+        seen.add(key)
+        names.append(name)
+        keys.append(key)
+    return names, keys
+
+
+def prepare_meal(meal: Dict[str, Any], rid: int) -> Recipe:
+    if "ingredients" in meal:  # custom recipe shape
+        return Recipe.from_custom(meal, rid)
+    return Recipe.from_mealdb(meal, rid)
+
+
+def prepare_meals(meals: List[Dict[str, Any]]) -> List[Recipe]:
+    return [prepare_meal(m, rid) for rid, m in enumerate(meals)]
+
+
+def get_prepared_recipes() -> List[Recipe]:
+    # Built once per catalog load, shared by every caller after that. The raw meal
+    # dicts are only needed while building and can be dropped afterwards.
+    # With a fresh snapshot on disk (catalog_snapshot.py) nothing is parsed at all.
+    from catalog_snapshot import load_or_build  # imported here: it imports this module
+
+    return get_catalog().derived("prepared", load_or_build)
+
+
+# Position of every recipe in (title.lower(), rid) order, so sorting results by
+# title is an integer comparison
+def title_ranks(recipes: List[Recipe]) -> List[int]:
+    order = sorted(range(len(recipes)), key=lambda rid: (recipes[rid].title.lower(), rid))
+    ranks = [0] * len(recipes)
+    for pos, rid in enumerate(order):
+        ranks[rid] = pos
+    return ranks
+
+
+def get_title_ranks() -> List[int]:
+    return get_catalog().derived("title_ranks", lambda: title_ranks(get_prepared_recipes()))
+
+
+# Inverted index
+# ingredient key -> list of recipe ids that use it. Matching only has to walk the
+# lists for what's in the pantry; everything else is missing by definition.
+class IngredientIndex(NamedTuple):
+    recipes: List[Recipe]
+    postings: Dict[str, List[int]]    # key -> rids (ascending)
+    sizes: List[int]                  # rid -> number of keys
+    by_size: Dict[int, List[int]]     # number of keys -> rids, for recipes the pantry doesn't touch
+    sort_titles: List[str]            # rid -> title.lower(), used for ordering
+
+
+def build_ingredient_index(recipes: List[Recipe]) -> IngredientIndex:
+    postings: Dict[str, List[int]] = {}
+    by_size: Dict[int, List[int]] = {}
+    sizes: List[int] = []
+    for r in recipes:
+        for key in r.keys:
+            postings.setdefault(key, []).append(r.rid)
+        sizes.append(len(r.keys))
+        by_size.setdefault(len(r.keys), []).append(r.rid)
+    return IngredientIndex(
+        recipes=recipes,
+        postings=postings,
+        sizes=sizes,
+        by_size=by_size,
+        sort_titles=[r.title.lower() for r in recipes],
+    )
+
+
+def get_ingredient_index() -> IngredientIndex:
+    return get_catalog().derived(
+        "ingredient_index", lambda: build_ingredient_index(get_prepared_recipes())
+    )
+
+
+# Bitset index
+# Every ingredient key gets a small integer id and every recipe becomes a bitmask of
+# its ingredient ids. A pantry query is then "recipe AND NOT pantry" + popcount over
+# the whole catalog. With numpy the masks live in one uint64 matrix (one row per
+# recipe) so that is a single vectorized operation; without it we use Python ints.
+class BitsetIndex(NamedTuple):
+    recipes: List[Recipe]
+    key_ids: Dict[str, int]           # key -> bit position
+    masks: List[int]                  # rid -> bitmask as a Python int
+    matrix: Optional[Any]             # numpy uint64 array (recipes x words), or None
+    sort_titles: List[str]
+
+
+def build_bitset_index(recipes: List[Recipe], use_numpy: Optional[bool] = None) -> BitsetIndex:
+    if use_numpy is None:
+        use_numpy = np is not None
+    key_ids: Dict[str, int] = {}
+    masks: List[int] = []
+    for r in recipes:
+        mask = 0
+        for key in r.keys:
+            bit = key_ids.setdefault(key, len(key_ids))
+            mask |= 1 << bit
+        masks.append(mask)
+
+    matrix = None
+    if use_numpy and np is not None:
+        words = max(1, (len(key_ids) + 63) // 64)
+        matrix = np.zeros((len(recipes), words), dtype=np.uint64)
+        for r in recipes:
+            for key in r.keys:
+                bit = key_ids[key]
+                matrix[r.rid, bit >> 6] |= np.uint64(1 << (bit & 63))
+
+    return BitsetIndex(
+        recipes=recipes,
+        key_ids=key_ids,
+        masks=masks,
+        matrix=matrix,
+        sort_titles=[r.title.lower() for r in recipes],
+    )
+
+
+def get_bitset_index() -> BitsetIndex:
+    return get_catalog().derived(
+        "bitset_index", lambda: build_bitset_index(get_prepared_recipes())
+    )
+
+
+# Quantities
+# Every (recipe, ingredient) whose measure we can read, converted to a base unit
+# (see measures.py). A slot is key_id * len(DIMENSIONS) + dimension. Stored twice as
+# flat arrays:
+#   by recipe: offsets[rid]..offsets[rid + 1] -> slots / amounts (to list what's short)
+#   by slot:   slot_offsets[slot]..slot_offsets[slot + 1] -> slot_rids / slot_amounts
+# Matching only reads the slots the pantry has, and compares each slice in one go
+# (numpy views of the same arrays when numpy is installed).
+class QuantityIndex(NamedTuple):
+    offsets: array                    # array('I'), len = recipes + 1
+    slots: array                      # array('I')
+    amounts: array                    # array('d')
+    slot_offsets: array               # array('I'), len = n_slots + 1
+    slot_rids: array                  # array('I')
+    slot_amounts: array               # array('d')
+    np_slot_rids: Optional[Any]       # numpy views of the two above, or None
+    np_slot_amounts: Optional[Any]
+
+    @property
+    def n_slots(self) -> int:
+        return len(self.slot_offsets) - 1
+
+
+def build_quantity_index(recipes: List[Recipe], use_numpy: Optional[bool] = None) -> QuantityIndex:
+    if use_numpy is None:
+        use_numpy = np is not None
+    n_dims = len(DIMENSIONS)
+    offsets = array("I", [0])
+    slots = array("I")
+    amounts = array("d")
+    rids = array("I")
+    parsed: Dict[str, Any] = {}   # measure strings repeat a lot ("1 tsp")
+    kids: Dict[str, Optional[int]] = {}
+    for r in recipes:
+        need: Dict[int, float] = {}
+        for name, measure in r.ingredients:
+            if name not in kids:
+                key = to_canonical(normalize_name(name))
+                kids[name] = intern_key(key) if key else None
+            if measure not in parsed:
+                parsed[measure] = parse_measure(measure)
+            kid, q = kids[name], parsed[measure]
+            if kid is None or q is None:
+                continue
+            slot = kid * n_dims + q[0]
+            need[slot] = need.get(slot, 0.0) + q[1]  # "olive oil" + "vegetable oil" add up
+        for slot, amount in need.items():
+            slots.append(slot)
+            amounts.append(amount)
+            rids.append(r.rid)
+        offsets.append(len(slots))
+
+    # regroup by slot (counting sort, entries stay in rid order within a slot)
+    n_slots = (max(slots) + 1) if slots else 0
+    slot_offsets = array("I", [0] * (n_slots + 1))
+    for slot in slots:
+        slot_offsets[slot + 1] += 1
+    for i in range(n_slots):
+        slot_offsets[i + 1] += slot_offsets[i]
+    fill = array("I", slot_offsets[:-1])
+    slot_rids = array("I", bytes(4 * len(slots)))
+    slot_amounts = array("d", bytes(8 * len(slots)))
+    for rid, slot, amount in zip(rids, slots, amounts):
+        pos = fill[slot]
+        slot_rids[pos] = rid
+        slot_amounts[pos] = amount
+        fill[slot] = pos + 1
+
+    use_np = use_numpy and np is not None
+    return QuantityIndex(
+        offsets=offsets,
+        slots=slots,
+        amounts=amounts,
+        slot_offsets=slot_offsets,
+        slot_rids=slot_rids,
+        slot_amounts=slot_amounts,
+        np_slot_rids=np.frombuffer(slot_rids, dtype=np.uint32) if use_np else None,
+        np_slot_amounts=np.frombuffer(slot_amounts, dtype=np.float64) if use_np else None,
+    )
+
+
+def get_quantity_index() -> QuantityIndex:
+    return get_catalog().derived(
+        "quantity_index", lambda: build_quantity_index(get_prepared_recipes())
+    )
+
+
+# Direct lookups by idMeal and by title. Titles are not unique (two "Chicken Curry"
+# recipes is normal), so by_title keeps every recipe with that title in catalog order.
+class RecipeLookup(NamedTuple):
+    by_id: Dict[str, Recipe]
+    by_title: Dict[str, List[Recipe]]   # title.lower() -> recipes
+
+
+def build_recipe_lookup(recipes: List[Recipe]) -> RecipeLookup:
+    by_id: Dict[str, Recipe] = {}
+    by_title: Dict[str, List[Recipe]] = {}
+    for r in recipes:
+        if r.id:
+            by_id[r.id] = r  # same rule as index_meals_by_id: the last one wins
+        by_title.setdefault(r.title.lower(), []).append(r)
+    return RecipeLookup(by_id=by_id, by_title=by_title)
+
+
+def get_recipe_lookup() -> RecipeLookup:
+    return get_catalog().derived(
+        "recipe_lookup", lambda: build_recipe_lookup(get_prepared_recipes())
+    )
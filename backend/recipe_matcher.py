@@ -10,28 +10,53 @@
 # ------------------------------------------------------------
 
 import json
+import heapq
+import os
 from pathlib import Path
 import argparse# lets us read command-line
-import re
-from typing import Dict, List, Tuple
-from recipe_sources import load_all_meals  #New -> loads favorites + custom + API recipes
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from ingredients import normalize_name, ingredient_key, rules_fingerprint
+from recipe_sources import get_catalog, use_sqlite, get_store
+from match_cache import MATCH_CACHE, inventory_fingerprint
+from shared_catalog import get_shared_index
+from inventory_store import read_inventory
+from measures import DIMENSIONS, format_amount, unit_to_base
+from fuzzy_match import get_fuzzy_index
+from search_index import get_search_index, relevance_ranks
+from facet_index import FACETS, get_facet_index, get_ingredient_words, mask_rids, rid_mask
+from recipe_index import (
+    Recipe,
+    IngredientIndex,
+    BitsetIndex,
+    prepare_meals,
+    get_prepared_recipes,
+    get_ingredient_index,
+    get_bitset_index,
+    get_title_ranks,
+    get_quantity_index,
+    QuantityIndex,
+    key_id,
+    key_name,
+    np,
+)
 
 # Build the paths relative to THIS file, so it works no matter where you run it
 BASE_DIR = Path(__file__).resolve().parent
 RECIPES_PATH = BASE_DIR / "data" / "recipes.json"
 INVENTORY_PATH = BASE_DIR / "inventory.json"
 
+# Which matching backend get_recipe_matches uses unless told otherwise:
+#   scan   - check every recipe (simplest, slowest)
+#   index  - inverted ingredient -> recipe index
+#   bitset - one AND + popcount over the whole catalog (numpy if installed)
+#   sql    - GROUP BY query against the SQLite store (RECIPE_STORE=sqlite), nothing loaded in memory
+#   shared - the inverted index from the memory-mapped file all workers share (shared_catalog.py)
+ENGINES = ("scan", "index", "bitset", "sql", "shared")
+DEFAULT_ENGINE = os.environ.get("RECIPE_MATCH_ENGINE", "sql" if use_sqlite() else "index")
+# A search that finds fewer than 1/SEARCH_SCAN_RATIO of the catalog checks just those
+# recipes; a broader one runs the engine and keeps the hits
+SEARCH_SCAN_RATIO = 8
 
-# Using regular expressions to filter
-def normalize_name(name: str) -> str:
-    if not name:
-        return ""
-    s = name.lower().strip()
-    # Remove punctuation characters using regex (keep letters, digits, spaces)
-    s = re.sub(r"[^a-z0-9\s]", " ", s)
-    # Collapse multiple spaces to one
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
 
 # TheMealDB parsing
 #TheMealDB stores ingredient names in fields strIngredient1..strIngredient20.
@@ -70,12 +95,8 @@ def load_inventory(path: Path) -> dict:
         }
         path.write_text(json.dumps(default, indent=2), encoding="utf-8")
         print(f"[info] Created starter inventory at {path}. Edit it to match your pantry.")
-    try:
-        raw = json.loads(path.read_text(encoding="utf-8"))
-    except Exception as e:
-        print(f"[warn] Could not parse inventory JSON: {e}")
-        return {}
-    return raw  # raw is a dict with "quantity"/"unit"
+    # edits made through the app may still be in the journal next to it (inventory_store.py)
+    return read_inventory(path)  # a dict with "quantity"/"unit"
 
 # Matching
 # Compare a recipe's ingredient list against the inventory.
@@ -88,25 +109,303 @@ def score_recipe(ingredient_names: List[str], inventory: Dict[str, bool]):
             missing.append(ing)
     return len(missing), missing
 
-#Split the list of recipes into two groups: cookable or near
-def partition_recipes(meals: List[Dict], inventory: Dict[str, bool], max_missing: int):
+# Turn any inventory shape ({"name": {"quantity": ..}} or {"name": bool}) into
+# {canonical ingredient key: have it?}
+def build_inventory_flags(inventory: dict) -> Dict[str, bool]:
+    flags: Dict[str, bool] = {}
+    for k, v in (inventory or {}).items():
+        key = ingredient_key(k)
+        if not key:
+            continue
+        if isinstance(v, dict):
+            qty = float(v.get("quantity", 0) or 0)
+            have_it = qty > 0
+        else:
+            have_it = bool(v)
+        # "olive oil" and "vegetable oil" are both "oil": having either is enough
+        flags[key] = flags.get(key, False) or have_it
+    return flags
+
+def _missing_names(r: Recipe, inventory: Dict[str, bool]) -> List[str]:
+    return [name for name, key in zip(r.names, r.keys) if not inventory.get(key, False)]
+
+# Quantities
+# Pantry amounts by slot (key id * len(DIMENSIONS) + dimension, same as QuantityIndex),
+# for every item whose unit we understand. Items without a usable unit only count as
+# "have it" / "don't", exactly like boolean matching.
+def build_inventory_amounts(inventory: dict) -> Dict[int, float]:
+    amounts: Dict[int, float] = {}
+    for k, v in (inventory or {}).items():
+        if not isinstance(v, dict):
+            continue
+        kid = key_id(ingredient_key(k))
+        q = unit_to_base(float(v.get("quantity", 0) or 0), v.get("unit") or "")
+        if kid is None or q is None or q[1] <= 0:
+            continue  # no recipe uses it / unknown unit / don't have any
+        slot = kid * len(DIMENSIONS) + q[0]
+        amounts[slot] = amounts.get(slot, 0.0) + q[1]
+    return amounts
+
+def _is_short(have: float, need: float) -> bool:
+    return have < need * (1 - 1e-9)  # float noise from unit factors isn't a shortfall
+
+# For every recipe (by rid): how many ingredients the pantry has, but not enough of.
+# Only the pantry's slots are read. Ingredients measured in a different dimension
+# than the pantry's (2 pcs vs 500 g) can't be compared and count as enough.
+def quantity_shortfalls(qindex: QuantityIndex, amounts: Dict[int, float]) -> List[int]:
+    n = len(qindex.offsets) - 1
+    parts = []
+    for slot, have in amounts.items():
+        if slot >= qindex.n_slots:
+            continue
+        lo, hi = qindex.slot_offsets[slot], qindex.slot_offsets[slot + 1]
+        if qindex.np_slot_rids is not None:
+            need = qindex.np_slot_amounts[lo:hi]
+            parts.append(qindex.np_slot_rids[lo:hi][have < need * (1 - 1e-9)])
+        else:
+            parts.append([rid for rid, need in zip(qindex.slot_rids[lo:hi], qindex.slot_amounts[lo:hi])
+                          if _is_short(have, need)])
+    if qindex.np_slot_rids is not None:
+        if not parts:
+            return [0] * n
+        return np.bincount(np.concatenate(parts), minlength=n).tolist()
+    counts = [0] * n
+    for short in parts:
+        for rid in short:
+            counts[rid] += 1
+    return counts
+
+# (name, need, have) for one recipe, for showing what to top up
+def recipe_shortages(qindex: QuantityIndex, r: Recipe, amounts: Dict[int, float]) -> List[Tuple[str, str, str]]:
+    out = []
+    names = dict(zip(r.key_ids, r.names))
+    n_dims = len(DIMENSIONS)
+    for i in range(qindex.offsets[r.rid], qindex.offsets[r.rid + 1]):
+        slot = qindex.slots[i]
+        have = amounts.get(slot)
+        if have is not None and _is_short(have, qindex.amounts[i]):
+            kid, dim = divmod(slot, n_dims)
+            out.append((names.get(kid, key_name(kid)),
+                        format_amount(dim, qindex.amounts[i]), format_amount(dim, have)))
+    return out
+
+def with_shortfalls(candidates, shortfalls, max_missing: int):
+    # Engine candidates with quantity shortfalls added to the missing count
+    for rid, c in candidates:
+        c += shortfalls[rid]
+        if c <= max_missing:
+            yield rid, c
+
+# Candidates
+# Every engine yields (rid, missing_count) for each recipe missing at most max_missing
+# ingredients, in no particular order. Sorting / picking the top ones happens after.
+
+#Check every recipe. No string normalization happens here, the recipes already carry canonical keys
+def scan_candidates(recipes: List[Recipe], inventory: Dict[str, bool], max_missing: int):
+    # compare interned ids, not strings
+    owned = {key_id(k) for k, have_it in inventory.items() if have_it}
+    owned.discard(None)
+    for r in recipes:
+        missing_count = 0
+        for kid in r.key_ids:
+            if kid not in owned:
+                missing_count += 1
+        if missing_count <= max_missing:
+            yield r.rid, missing_count
+
+#Inverted index: count pantry hits per recipe by walking only the postings of ingredients
+#we have, then missing = number of ingredients - hits. Recipes the pantry doesn't touch
+#at all can only qualify if they are small enough, so those come from by_size.
+def indexed_candidates(index: IngredientIndex, inventory: Dict[str, bool], max_missing: int):
+    hits: Dict[int, int] = {}
+    for key, have_it in inventory.items():
+        if not have_it:
+            continue
+        for rid in index.postings.get(key, ()):
+            hits[rid] = hits.get(rid, 0) + 1
+
+    sizes = index.sizes
+    for rid, h in hits.items():
+        if sizes[rid] - h <= max_missing:
+            yield rid, sizes[rid] - h
+    for size in range(0, max_missing + 1):
+        for rid in index.by_size.get(size, ()):
+            if rid not in hits:
+                yield rid, size
+
+# popcount for every byte value, for numpy versions without bitwise_count
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8) if np is not None else None
+
+def _bitset_missing_counts(index: BitsetIndex, pantry_mask: int):
+    # Number of recipe ingredients not in the pantry, for every recipe at once
+    if index.matrix is not None:
+        words = index.matrix.shape[1]
+        pantry = np.array([(pantry_mask >> (64 * w)) & 0xFFFFFFFFFFFFFFFF for w in range(words)], dtype=np.uint64)
+        lacking = index.matrix & ~pantry
+        if hasattr(np, "bitwise_count"):
+            return np.bitwise_count(lacking).sum(axis=1)
+        return _POPCOUNT8[lacking.view(np.uint8)].sum(axis=1, dtype=np.int64)
+    return [(m & ~pantry_mask).bit_count() for m in index.masks]
+
+#Bitset index: one AND NOT + popcount over the whole catalog
+def bitset_candidates(index: BitsetIndex, inventory: Dict[str, bool], max_missing: int):
+    pantry_mask = 0
+    for key, have_it in inventory.items():
+        bit = index.key_ids.get(key)
+        if have_it and bit is not None:
+            pantry_mask |= 1 << bit
+
+    counts = _bitset_missing_counts(index, pantry_mask)
+    if index.matrix is not None:
+        rids = np.flatnonzero(counts <= max_missing)
+        return zip(rids.tolist(), counts[rids].tolist())
+    return ((rid, c) for rid, c in enumerate(counts) if c <= max_missing)
+
+# Full, sorted buckets of (title, missing_count, missing_list)
+# Simple sort to make output stable: fewest missing first, then name (ties keep catalog order)
+def _sorted_buckets(recipes: List[Recipe], candidates, inventory: Dict[str, bool]):
     cookable = []
     near = []
-    for meal in meals:
-        name = meal.get("strMeal") or "(unnamed)"
-        # extract normalized ingredient names for this meal
-        ing_names = extract_ingredients_from_meal(meal)
+    for rid, missing_count in candidates:
+        r = recipes[rid]
+        if missing_count == 0:
+            cookable.append((rid, r.title, 0, []))
+        else:
+            near.append((rid, r.title, missing_count, _missing_names(r, inventory)))
+    cookable.sort(key=lambda t: (t[1].lower(), t[0]))
+    near.sort(key=lambda t: (t[2], t[1].lower(), t[0]))
+    return [t[1:] for t in cookable], [t[1:] for t in near]
+
+#Split the prepared recipes into two groups: cookable or near
+def partition_prepared(recipes: List[Recipe], inventory: Dict[str, bool], max_missing: int):
+    return _sorted_buckets(recipes, scan_candidates(recipes, inventory, max_missing), inventory)
+
+#Same buckets as partition_prepared, using the inverted index
+def partition_indexed(index: IngredientIndex, inventory: Dict[str, bool], max_missing: int):
+    return _sorted_buckets(index.recipes, indexed_candidates(index, inventory, max_missing), inventory)
+
+#Same buckets as partition_prepared, computed from the bitset index
+def partition_bitset(index: BitsetIndex, inventory: Dict[str, bool], max_missing: int):
+    return _sorted_buckets(index.recipes, bitset_candidates(index, inventory, max_missing), inventory)
+
+# Run the chosen engine over the current catalog
+def catalog_candidates(inventory: Dict[str, bool], max_missing: int, engine: str = None):
+    engine = engine or DEFAULT_ENGINE
+    if engine == "scan":
+        return scan_candidates(get_prepared_recipes(), inventory, max_missing)
+    if engine == "index":
+        return indexed_candidates(get_ingredient_index(), inventory, max_missing)
+    if engine == "bitset":
+        return bitset_candidates(get_bitset_index(), inventory, max_missing)
+    if engine == "shared":
+        return indexed_candidates(get_shared_index(), inventory, max_missing)
+    if engine == "sql":
+        raise ValueError("the sql engine returns finished matches, use match_catalog()")
+    raise ValueError(f"unknown matching engine {engine!r} (choose from {', '.join(ENGINES)})")
+
+# Every ingredient key some recipe uses, from wherever the engine keeps them
+def recipe_vocabulary(engine: str = None) -> List[str]:
+    engine = engine or DEFAULT_ENGINE
+    if engine == "sql":
+        return get_store().ingredient_keys()
+    if engine == "shared":
+        return list(get_shared_index().key_slots)
+    return list(get_ingredient_index().postings)
+
+# Filters
+# {"category": [...], "area": [...], "tags": [...], "require": [...], "exclude": [...]}
+# Values of one facet are alternatives (Indian or Thai), different facets all have to
+# hold, every required ingredient has to be used and no excluded one may be.
+FILTERS = tuple(FACETS) + ("require", "exclude")
+
+def normalize_filters(filters: Optional[Dict[str, Iterable[str]]]) -> tuple:
+    # Hashable, order-independent form (part of the match cache key); empty ones dropped
+    unknown = set(filters or {}) - set(FILTERS)
+    if unknown:
+        raise ValueError(f"unknown filter(s) {', '.join(sorted(unknown))} (choose from {', '.join(FILTERS)})")
+    out = []
+    for name in FILTERS:
+        values = (filters or {}).get(name) or ()
+        if isinstance(values, str):
+            values = [values]
+        if name in ("require", "exclude"):
+            keys = {ingredient_key(v) for v in values}
+        else:
+            keys = {v.strip().lower() for v in values}
+        keys.discard("")
+        if keys:
+            out.append((name, tuple(sorted(keys))))
+    return tuple(out)
+
+def _ingredient_postings(engine: str):
+    if engine == "shared":
+        return get_shared_index().postings.get
+    return get_ingredient_index().postings.get  # sql matches in memory when filtering
+
+# rids allowed by normalized filters, from the facet / ingredient masks
+def filter_rids(filters: tuple, engine: str = None) -> Set[int]:
+    engine = engine or DEFAULT_ENGINE
+    facets = get_facet_index()
+    mask = facets.all
+    for name, values in filters:
+        if name in FACETS:
+            mask &= facets.mask(name, values)
+            continue
+        words = get_ingredient_words(lambda: recipe_vocabulary(engine))
+        postings = _ingredient_postings(engine)
+        # excluding "chicken" also drops chicken stock, requiring it isn't met by it
+        variants = words.variants if name == "require" else words.containing
+        for key in values:
+            used = facets.ingredient_mask(name, key, variants, lambda k: postings(k, ()))
+            mask = mask & used if name == "require" else mask & ~used
+    return set(mask_rids(mask, facets.n))
+
+# Top-K
+# Most of the time we only show 15-50 recipes, so instead of sorting every match we
+# keep a bounded heap per bucket. Keys are plain ints: title_ranks gives each recipe
+# its position in (title.lower(), rid) order, so the result order is exactly the
+# one the full sort produces.
+def _push_bounded(heap: list, k: int, key: int, rid: int) -> None:
+    # max-heap of the k smallest keys (stored negated)
+    if len(heap) < k:
+        heapq.heappush(heap, (-key, rid))
+    elif heap and key < -heap[0][0]:
+        heapq.heapreplace(heap, (-key, rid))
+
+def top_buckets(candidates, ranks: List[int], top: Optional[int], offset: int = 0):
+    # Returns (cookable, near, counts); the buckets are lists of (rid, missing_count)
+    # for positions offset..offset+top of each bucket. top=None means no limit.
+    n = len(ranks)
+    if top is None:
+        cookable, near = [], []
+        for rid, c in candidates:
+            (near if c else cookable).append((rid, c))
+        cookable.sort(key=lambda t: ranks[t[0]])
+        near.sort(key=lambda t: t[1] * n + ranks[t[0]])
+        counts = {"cookable": len(cookable), "near": len(near)}
+        return cookable[offset:], near[offset:], counts
+
+    k = offset + top
+    cookable_heap: list = []
+    near_heap: list = []
+    total_cookable = 0
+    total_near = 0
+    for rid, c in candidates:
+        if c == 0:
+            total_cookable += 1
+            _push_bounded(cookable_heap, k, ranks[rid], rid)
+        else:
+            total_near += 1
+            _push_bounded(near_heap, k, c * n + ranks[rid], rid)
 
-        missing_count, missing_list = score_recipe(ing_names, inventory)
+    cookable = [(rid, 0) for _, rid in sorted(cookable_heap, reverse=True)]
+    near = [(rid, (-key) // n) for key, rid in sorted(near_heap, reverse=True)]
+    counts = {"cookable": total_cookable, "near": total_near}
+    return cookable[offset:k], near[offset:k], counts
 
-        if missing_count == 0:
-            cookable.append((name, missing_count, missing_list))
-        elif 0 < missing_count <= max_missing:
-            near.append((name, missing_count, missing_list))
-    # Simple sort to make output stable: fewest missing first, then name
-    cookable.sort(key=lambda t: t[0].lower())
-    near.sort(key=lambda t: (t[1], t[0].lower()))
-    return cookable, near
+#Split the list of recipes into two groups: cookable or near
+def partition_recipes(meals: List[Dict], inventory: Dict[str, bool], max_missing: int):
+    return partition_prepared(prepare_meals(meals), inventory, max_missing)
 
 
 # Command-line interface entry point: missing ingredients
@@ -117,85 +416,180 @@ def main():
     args = parser.parse_args()
 
     # Load data files (recipes + inventory)
-    meals = load_all_meals()   # new <-- now includes API + favorites + custom in one list
-    if not meals:
+    recipes = get_prepared_recipes()   # new <-- now includes API + favorites + custom in one list
+    if not recipes:
         print("No recipes loaded. Generate API data or add custom/favorites.")
         return
-    inventory = load_inventory(INVENTORY_PATH)
-
-    # If there are no recipes, run script to get TheMealDB
-    if not meals:
-        print("[warn] No recipes loaded. Run: python backend/simple_recipe_import.py \"chicken\"")
-        return
+    inventory = build_inventory_flags(load_inventory(INVENTORY_PATH))
 
-    # Partition recipes by availability
-    cookable, near = partition_recipes(meals, inventory, args.max_missing)
+    # Partition recipes by availability (only the top ones per bucket get sorted)
+    cookable, near, counts = match_catalog(inventory, args.max_missing, args.top)
 
-    print("\n================ COOKABLE RECIPES ================\n")
+    print(f"\n================ COOKABLE RECIPES ({counts['cookable']}) ================\n")
     if not cookable:
         print("(none)")
     else:
-        for name, _, _ in cookable[:args.top]:
-            print(f" {name}")
+        for r, _, _ in cookable:
+            print(f" {r.title}")
 
-    print("\n============= NEARLY COOKABLE (missing ≤", args.max_missing, ") =============\n", sep="")
+    print("\n============= NEARLY COOKABLE (missing ≤", args.max_missing, f", {counts['near']} total) =============\n", sep="")
     if not near:
         print("(none)")
     else:
-        for name, miss_cnt, miss_list in near[:args.top]:
+        for r, miss_cnt, miss_list in near:
             # join missing items as a comma-separated string
             missing_str = ", ".join(miss_list) if miss_list else "-"
-            print(f"!!! {name}   — missing {miss_cnt}: {missing_str}")
+            print(f"!!! {r.title}   — missing {miss_cnt}: {missing_str}")
 
     print("\n[ok] Matching complete.")
 
-def get_recipe_matches(inventory: dict, max_missing=5, top=15):
-    meals = load_all_meals()
-
-    inventory_flags = {}
-    for k, v in inventory.items():
-        name = normalize_name(k)
-        if isinstance(v, dict):
-            qty = float(v.get("quantity", 0) or 0)
-            have_it = qty > 0
+# Top matches over the current catalog: (cookable, near, counts) where the buckets hold
+# (recipe, missing_count, missing_list) for positions offset..offset+top and counts has
+# the total size of each bucket. The recipe itself is carried through, so nothing has
+# to be looked up again by title afterwards.
+# amounts: pantry amounts from build_inventory_amounts for quantity-aware matching
+# (having too little of something counts as missing it)
+# search: query for search_index.py; only the recipes it finds are matched, most
+# relevant first (instead of by title) within each bucket / missing count
+# allowed: rids the filters let through (filter_rids); only those are matched
+# facets: also count the matches per category / area / tag, returned as counts["facets"]
+def match_catalog(inventory: Dict[str, bool], max_missing: int, top: Optional[int] = 15, offset: int = 0, engine: str = None, candidates=None, amounts=None, search="", allowed=None, facets=False):
+    engine = engine or DEFAULT_ENGINE
+    if amounts and engine in ("sql", "shared"):
+        engine = "index"  # quantities are checked against the in-memory QuantityIndex
+    if engine == "sql" and (search or allowed is not None or facets):
+        engine = "index"  # search / facet results are rids into the in-memory catalog
+    if engine == "sql" and candidates is None:
+        # the database does the counting, sorting and paging
+        return get_store().match({k for k, v in inventory.items() if v}, max_missing, top, offset)
+
+    if engine == "shared":
+        # records and ranks straight from the mapped file; only the shown ones get decoded
+        shared = get_shared_index()
+        recipes, ranks = shared.recipes, shared.ranks
+    else:
+        recipes, ranks = get_prepared_recipes(), get_title_ranks()
+    search_scores = None
+    subset = allowed
+    if search:
+        search_index = get_search_index()
+        if candidates is None and engine != "shared" and search_index.estimate(search) * SEARCH_SCAN_RATIO <= len(recipes):
+            search_scores = search_index.scores(search)
+            subset = search_scores if allowed is None else [rid for rid in search_scores if rid in allowed]
         else:
-            have_it = bool(v)
-        inventory_flags[name] = have_it
-
-    cookable, near = partition_recipes(meals, inventory_flags, max_missing)
+            # a broad search hits most of the catalog: match first and score only the
+            # matches instead of scoring (and then filtering) every hit
+            found = candidates if candidates is not None else catalog_candidates(inventory, max_missing, engine)
+            found = [(rid, c) for rid, c in found if allowed is None or rid in allowed]
+            search_scores = search_index.scores(search, among=[rid for rid, _ in found])
+            candidates = [(rid, c) for rid, c in found if rid in search_scores]
+            subset = None
+    if subset is not None:
+        if candidates is not None or engine == "shared" or len(subset) * SEARCH_SCAN_RATIO > len(recipes):
+            # the filters let most of the catalog through: the engine is cheaper than
+            # checking each recipe (and shared records would all have to be decoded)
+            found = candidates if candidates is not None else catalog_candidates(inventory, max_missing, engine)
+            candidates = [(rid, c) for rid, c in found if rid in subset]
+        else:
+            candidates = list(scan_candidates((recipes[rid] for rid in subset), inventory, max_missing))
+    if search_scores is not None:
+        ranks = relevance_ranks(search_scores, (rid for rid, _ in candidates), len(recipes))
+    if candidates is None:
+        candidates = catalog_candidates(inventory, max_missing, engine)
+    if amounts:
+        qindex = get_quantity_index()
+        candidates = with_shortfalls(candidates, quantity_shortfalls(qindex, amounts), max_missing)
+    if facets:
+        candidates = list(candidates)
+        facet_index = get_facet_index()
+        facet_counts = facet_index.counts(rid_mask((rid for rid, _ in candidates), facet_index.n))
+    cookable, near, counts = top_buckets(candidates, ranks, top, offset)
+    if facets:
+        counts["facets"] = facet_counts
+
+    def with_missing(rid, missing_count):
+        r = recipes[rid]
+        missing = _missing_names(r, inventory) if missing_count else []
+        if amounts and missing_count:
+            missing += [name for name, _, _ in recipe_shortages(qindex, r, amounts)]
+        return (r, missing_count, missing)
+
+    return ([with_missing(*t) for t in cookable],
+            [with_missing(*t) for t in near],
+            counts)
+
+# Catalog part of every MATCH_CACHE key (matches, purchase suggestions, meal plans):
+# the source files' signature, so the check never loads the catalog, and the
+# normalization rules the recipe and pantry keys were made with
+def cache_version() -> tuple:
+    return (get_catalog().source_signature(), rules_fingerprint())
+
+# session: an optional MatcherSession (see matcher_session.py) that already knows the
+# missing counts for this pantry; used instead of the engine when it is up to date
+# quantities: compare amounts too (inventory must then have "quantity"/"unit" items)
+# fuzzy: also count recipe ingredients close to a pantry item as owned (fuzzy_match.py)
+# search: only match recipes found by the full-text index, most relevant first
+# filters: category / area / tags / require / exclude constraints (see FILTERS)
+# facets: add "facets" with per category / area / tag counts of all the matches
+def get_recipe_matches(inventory: dict, max_missing=5, top=15, engine=None, offset=0, session=None, quantities=False, fuzzy=False, search=None, filters=None, facets=False):
+    inventory_flags = build_inventory_flags(inventory)
+    amounts = build_inventory_amounts(inventory) if quantities else None
+    engine = engine or DEFAULT_ENGINE
+    if fuzzy:
+        inventory_flags = get_fuzzy_index(lambda: recipe_vocabulary(engine)).expand(inventory_flags)
+
+    # Same catalog + same rules + same pantry + same options -> reuse the last answer.
+    version = cache_version()
+    MATCH_CACHE.drop_other_versions(version)
+    search = " ".join((search or "").lower().split())
+    filters = normalize_filters(filters)
+    key = (version, inventory_fingerprint(inventory_flags, amounts), max_missing, top, offset, engine, search, filters, facets)
+    return MATCH_CACHE.get_or_compute(
+        key, lambda: _build_matches(inventory_flags, max_missing, top, offset, engine, session, amounts, search, filters, facets)
+    )
+
+def _build_matches(inventory_flags: Dict[str, bool], max_missing, top, offset, engine, session=None, amounts=None, search="", filters=(), facets=False):
+    candidates = None
+    if session is not None and session.index is get_ingredient_index():
+        candidates = session.candidates_if_owns(inventory_flags, max_missing)
+    allowed = filter_rids(filters, engine) if filters else None
+    cookable, near, counts = match_catalog(inventory_flags, max_missing, top, offset, engine, candidates, amounts, search, allowed, facets)
+    facet_counts = counts.pop("facets", None)
 
     # Convert output format
-    def meal_dict(recipe_tuple):
-        name, _, missing = recipe_tuple
-        meal = next((m for m in meals if m.get("title") == name or m.get("strMeal") == name), {})
-
-        # Build ingredients list
-        ingredients = []
-        for i in range(1, 21):
-            ing = meal.get(f"strIngredient{i}")
-            measure = meal.get(f"strMeasure{i}")
-            if ing and ing.strip():
-                ingredients.append({"name": ing.strip(), "measure": measure.strip() if measure else ""})
-
-        instructions = meal.get("strInstructions", "")
-
-        image = meal.get("image") or meal.get("strMealThumb") or ""
-
-        return {"title": name, "image": image, "missing": missing, "ingredients": ingredients, "instructions": instructions}
-
-
-    return {
-        "cookable": [meal_dict(r) for r in cookable[:top]],
-        "near": [meal_dict(r) for r in near[:top]],
+    def meal_dict(match):
+        r, _, missing = match
+        ingredients = [{"name": ing, "measure": measure} for ing, measure in r.ingredients]
+        out = {"id": r.id, "title": r.title, "image": r.image, "missing": missing, "ingredients": ingredients, "instructions": r.instructions}
+        if amounts:
+            out["short"] = [{"name": name, "need": need, "have": have}
+                            for name, need, have in recipe_shortages(get_quantity_index(), r, amounts)]
+        return out
+
+
+    out = {
+        "cookable": [meal_dict(m) for m in cookable],
+        "near": [meal_dict(m) for m in near],
+        "counts": counts,
     }
+    if facet_counts is not None:
+        out["facets"] = facet_counts
+    return out
 
 # Run main() when executed as a script
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--max-missing", type=int, default=2)
     parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--engine", choices=ENGINES, default=None, help="Matching backend (default: RECIPE_MATCH_ENGINE or index)")
+    parser.add_argument("--quantities", action="store_true", help="Also compare amounts (too little counts as missing)")
+    parser.add_argument("--fuzzy", action="store_true", help="Count close ingredient names as owned (chicken -> chicken thigh)")
+    parser.add_argument("--search", type=str, default=None, help='Only recipes matching these words, e.g. "curry"')
+    for name in FILTERS:
+        parser.add_argument(f"--{name}", action="append", default=[], help=f"Filter: {name} (repeatable)")
     args = parser.parse_args()
 
     inventory = load_inventory(INVENTORY_PATH)
-    matches = get_recipe_matches(inventory, args.max_missing, args.top)
+    filters = {name: getattr(args, name) for name in FILTERS}
+    matches = get_recipe_matches(inventory, args.max_missing, args.top, engine=args.engine, quantities=args.quantities, fuzzy=args.fuzzy, search=args.search, filters=filters)
     print(matches)
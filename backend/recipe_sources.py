@@ -5,8 +5,10 @@
 # ------------------------------------------------------------
 
 import json 
+import os
+import threading
 from pathlib import Path 
-from typing import List, Dict, Any, Set 
+from typing import List, Dict, Any, Set, Tuple, Optional, Callable
 
 BASE_DIR = Path(__file__).resolve().parent
 
@@ -14,6 +16,17 @@ API_RECIPES_PATH     = BASE_DIR / "data" / "recipes.json"
 CUSTOM_RECIPES_PATH  = BASE_DIR / "data" / "custom_recipes.json"
 FAVORITES_IDS_PATH   = BASE_DIR / "data" / "favorites.json"
 
+# Where recipes are read from: "json" (recipes.json + custom_recipes.json) or
+# "sqlite" (data/recipes.db, see recipe_store.py)
+STORE_BACKEND = os.environ.get("RECIPE_STORE", "json").strip().lower()
+
+def use_sqlite() -> bool:
+    return STORE_BACKEND == "sqlite"
+
+def get_store():
+    from recipe_store import SqliteRecipeStore  # only needed for the sqlite backend
+    return SqliteRecipeStore()
+
 def _load_meals_themealdb_wrapper(path: Path) -> List[Dict[str, Any]]:
     if not path.exists():
         return []
@@ -35,12 +48,135 @@ def _load_meals_plain_list(path: Path) -> List[Dict[str, Any]]:
         return []
     return [m for m in data if isinstance(m, dict)]
 
-def load_all_meals() -> List[Dict[str, Any]]:
+def _read_all_meals() -> List[Dict[str, Any]]:
     api_meals    = _load_meals_themealdb_wrapper(API_RECIPES_PATH)
     custom_meals = _load_meals_plain_list(CUSTOM_RECIPES_PATH)
     # show custom first, then API
     return list(custom_meals) + list(api_meals)
 
+# Catalog cache
+# Parsing recipes.json on every request is slow once a few thousand meals are imported.
+# RecipeCatalog watches the files (mtime or size) and keeps whatever was built from
+# them - the compact recipe records, indexes... - until one of them changes on disk or
+# someone calls invalidate(). The raw meal dicts are big (~50 keys each), so they are
+# only kept around once somebody actually asks for them through meals().
+def _file_signature(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None  # missing file is a valid state too
+    return (st.st_mtime_ns, st.st_size)
+
+class RecipeCatalog:
+    def __init__(self, paths: List[Path], reader: Callable[[], List[Dict[str, Any]]] = None):
+        self.paths = list(paths)
+        self.reader = reader or _read_all_meals
+        self._lock = threading.Lock()
+        self._meals: Optional[List[Dict[str, Any]]] = None
+        self._signature: Optional[Tuple] = None
+        # key -> (version, value) for indexes built from the meals
+        self._derived: Dict[str, Tuple[int, Any]] = {}
+        # bumped whenever the files change so derived data can tell when it is stale
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def _current_signature(self) -> Tuple:
+        return tuple(_file_signature(p) for p in self.paths)
+
+    def source_signature(self) -> Tuple:
+        # Cheap "has anything changed" key (just stat calls, nothing is loaded)
+        return self._current_signature()
+
+    def _sync(self, sig: Tuple) -> None:
+        # lock held: start a new version if the files changed since last time
+        if sig != self._signature:
+            self._signature = sig
+            self._meals = None
+            self._derived = {}
+            self.version += 1
+            self.reloads += 1
+
+    def snapshot(self) -> Tuple[int, List[Dict[str, Any]]]:
+        # (version, meals) read together so they always belong to the same load
+        sig = self._current_signature()
+        with self._lock:
+            self._sync(sig)
+            if self._meals is not None:
+                self.hits += 1
+                return self.version, self._meals
+            self.misses += 1
+            self._meals = self.reader()
+            return self.version, self._meals
+
+    def meals(self) -> List[Dict[str, Any]]:
+        return self.snapshot()[1]
+
+    def read_meals(self) -> List[Dict[str, Any]]:
+        # The meals for building derived data: the cached list if someone already
+        # loaded it, otherwise a fresh read that is not kept afterwards
+        with self._lock:
+            if self._meals is not None:
+                return self._meals
+        return self.reader()
+
+    def derived(self, key: str, build: Callable[[], Any]) -> Any:
+        # Build something once per catalog version and reuse it after that.
+        # build() takes no arguments; use read_meals() inside it if it needs the raw meals.
+        sig = self._current_signature()
+        with self._lock:
+            self._sync(sig)
+            version = self.version
+            entry = self._derived.get(key)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = build()
+        with self._lock:
+            if self.version == version:
+                self._derived[key] = (version, value)
+        return value
+
+    def put_derived(self, key: str, value: Any) -> None:
+        # Store something that was produced along with another derived value
+        # (e.g. title ranks read from a snapshot) for the current version
+        with self._lock:
+            self._derived[key] = (self.version, value)
+
+    def invalidate(self) -> None:
+        # Force the next call to re-read the files
+        with self._lock:
+            self._meals = None
+            self._signature = None
+            self._derived = {}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "version": self.version,
+                "raw_meals_loaded": len(self._meals) if self._meals is not None else 0,
+                "derived": sorted(self._derived),
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+            }
+
+# One catalog per process
+if use_sqlite():
+    from recipe_store import DB_PATH as _DB_PATH
+    CATALOG = RecipeCatalog([_DB_PATH], reader=lambda: get_store().load_all_meals())
+else:
+    CATALOG = RecipeCatalog([API_RECIPES_PATH, CUSTOM_RECIPES_PATH])
+
+def get_catalog() -> RecipeCatalog:
+    return CATALOG
+
+def load_all_meals() -> List[Dict[str, Any]]:
+    # Return a new list so callers can't reorder the cached one
+    return list(CATALOG.meals())
+
 def index_meals_by_id(meals: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
     out: Dict[str, Dict[str, Any]] = {}
     for m in meals:
@@ -66,9 +202,15 @@ def save_favorite_ids(ids: Set[str]) -> None:
         encoding="utf-8"
     )
 
-def get_favorite_meals(meals: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def get_favorite_meals(meals: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
     ids = load_favorite_ids()
     if not ids:
         return []
-    by_id = index_meals_by_id(meals)
+    if meals is None and use_sqlite():
+        # look the favorites up directly, no need to load the catalog
+        by_id = get_store().meals_by_ids(ids)
+    elif meals is None:
+        by_id = index_meals_by_id(CATALOG.meals())
+    else:
+        by_id = index_meals_by_id(meals)
     return [by_id[i] for i in ids if i in by_id]
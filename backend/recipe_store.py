@@ -0,0 +1,300 @@
+# SQLite recipe store
+# Alternative to data/recipes.json for big catalogs: meals live in data/recipes.db with
+# a normalized ingredient table, so imports only touch the rows they change and
+# matching runs as SQL (GROUP BY recipe, count pantry hits) without loading the whole
+# catalog into the Flask process.
+#
+# HOW TO RUN:
+    # python backend/recipe_store.py --migrate     <- copy recipes.json + custom_recipes.json into recipes.db
+    # python backend/recipe_store.py --stats
+    # python backend/recipe_store.py --reindex     <- re-key ingredients after changing data/synonyms.json
+    # RECIPE_STORE=sqlite python backend/app.py    <- use the database instead of the JSON files
+# ------------------------------------------------------------
+
+import argparse
+import json
+import os
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+DB_PATH = BASE_DIR / "data" / "recipes.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meals (
+    rid          INTEGER PRIMARY KEY,
+    id_meal      TEXT,                   -- TheMealDB idMeal (NULL for custom recipes without one); not
+                                         -- unique: a custom recipe may reuse an API id, the catalog keeps both
+    position     INTEGER NOT NULL,       -- catalog order (= catalog rid): custom recipes first, then API
+    title        TEXT NOT NULL,
+    title_lower  TEXT NOT NULL,          -- Python str.lower(), so ORDER BY matches the JSON engines
+    is_custom    INTEGER NOT NULL DEFAULT 0,
+    n_keys       INTEGER NOT NULL,       -- number of distinct canonical ingredients
+    image        TEXT NOT NULL DEFAULT '',
+    instructions TEXT NOT NULL DEFAULT '',
+    names        TEXT NOT NULL,          -- JSON list, normalized names (parallel to keys)
+    ingredients  TEXT NOT NULL,          -- JSON list of [name, measure] for the UI
+    data         TEXT NOT NULL           -- the original meal object as JSON
+);
+CREATE INDEX IF NOT EXISTS meals_n_keys ON meals(n_keys);
+CREATE INDEX IF NOT EXISTS meals_position ON meals(position);
+CREATE INDEX IF NOT EXISTS meals_id_meal ON meals(id_meal);
+
+CREATE TABLE IF NOT EXISTS meal_ingredients (
+    meal_rid  INTEGER NOT NULL REFERENCES meals(rid) ON DELETE CASCADE,
+    key       TEXT NOT NULL,             -- canonical ingredient key (see recipe_index.prepare_meal)
+    position  INTEGER NOT NULL,
+    PRIMARY KEY (meal_rid, key)
+);
+CREATE INDEX IF NOT EXISTS meal_ingredients_key ON meal_ingredients(key, meal_rid);
+"""
+
+
+class SqliteRecipeStore:
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or DB_PATH)
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path))
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    # ---- writing ---- #
+
+    def _insert(self, conn: sqlite3.Connection, meal: Dict[str, Any], position: int, is_custom: bool) -> None:
+        from recipe_index import prepare_meal  # imported here: recipe_index imports recipe_sources
+
+        r = prepare_meal(meal, position)
+        cur = conn.execute(
+            "INSERT INTO meals (id_meal, position, title, title_lower, is_custom, n_keys, image,"
+            " instructions, names, ingredients, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (r.id or None, position, r.title, r.title.lower(), int(is_custom), len(r.keys), r.image,
+             r.instructions, json.dumps(list(r.names)), json.dumps([list(p) for p in r.ingredients]),
+             json.dumps(meal, ensure_ascii=False)),
+        )
+        conn.executemany(
+            "INSERT INTO meal_ingredients (meal_rid, key, position) VALUES (?, ?, ?)",
+            [(cur.lastrowid, key, i) for i, key in enumerate(r.keys)],
+        )
+
+    def upsert_meals(self, meals: Iterable[Dict[str, Any]], is_custom: bool = False) -> int:
+        # Add or replace meals by idMeal (on the same side: an API import never replaces
+        # a custom recipe). Replaced meals keep their place in the catalog, new ones go
+        # to the end. Only these rows are written.
+        count = 0
+        with closing(self.connect()) as conn, conn:
+            conn.executescript(SCHEMA)
+            next_pos = conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM meals").fetchone()[0]
+            for meal in meals:
+                mid = str(meal.get("idMeal") or "").strip()
+                position = None
+                if mid:
+                    row = conn.execute("SELECT rid, position FROM meals WHERE id_meal = ? AND is_custom = ?"
+                                       " ORDER BY position LIMIT 1", (mid, int(is_custom))).fetchone()
+                    if row:
+                        conn.execute("DELETE FROM meals WHERE rid = ?", (row[0],))
+                        position = row[1]
+                if position is None:
+                    position = next_pos
+                    next_pos += 1
+                self._insert(conn, meal, position, is_custom)
+                count += 1
+        return count
+
+    def rebuild(self, custom_meals: List[Dict[str, Any]], api_meals: List[Dict[str, Any]]) -> int:
+        # Build a fresh database next to the real one, then swap it in. Every meal gets a
+        # row at its catalog position, duplicate idMeals included, so positions are the
+        # same rids the JSON engines use and engine=sql returns the same recipes.
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.unlink(missing_ok=True)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        count = 0
+        with closing(sqlite3.connect(str(tmp))) as conn, conn:
+            conn.executescript(SCHEMA)
+            for is_custom, meals in ((True, custom_meals), (False, api_meals)):
+                for meal in meals:
+                    self._insert(conn, meal, count, is_custom)
+                    count += 1
+        os.replace(tmp, self.path)
+        return count
+
+    def reindex(self) -> int:
+        # Recompute ingredient keys from the stored meals, e.g. after the synonyms or
+        # plural rules in ingredients.py changed. Positions and ids stay as they are.
+        from recipe_index import prepare_meal
+
+        count = 0
+        with closing(self.connect()) as conn, conn:
+            rows = conn.execute("SELECT rid, position, data FROM meals").fetchall()
+            conn.execute("DELETE FROM meal_ingredients")
+            for rid, position, data in rows:
+                r = prepare_meal(json.loads(data), position)
+                conn.execute("UPDATE meals SET n_keys = ?, names = ? WHERE rid = ?",
+                             (len(r.keys), json.dumps(list(r.names)), rid))
+                conn.executemany(
+                    "INSERT INTO meal_ingredients (meal_rid, key, position) VALUES (?, ?, ?)",
+                    [(rid, key, i) for i, key in enumerate(r.keys)],
+                )
+                count += 1
+        return count
+
+    # ---- reading ---- #
+
+    def load_all_meals(self) -> List[Dict[str, Any]]:
+        if not self.exists():
+            return []
+        with closing(self.connect()) as conn:
+            return [json.loads(d) for (d,) in conn.execute("SELECT data FROM meals ORDER BY position")]
+
+    def existing_ids(self) -> Set[str]:
+        if not self.exists():
+            return set()
+        with closing(self.connect()) as conn:
+            return {mid for (mid,) in conn.execute("SELECT id_meal FROM meals WHERE id_meal IS NOT NULL")}
+
+    def ingredient_keys(self) -> List[str]:
+        # every distinct ingredient key used by some meal
+        if not self.exists():
+            return []
+        with closing(self.connect()) as conn:
+            return [k for (k,) in conn.execute("SELECT DISTINCT key FROM meal_ingredients")]
+
+    def meals_by_ids(self, ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        ids = [str(i) for i in ids]
+        if not ids or not self.exists():
+            return {}
+        out: Dict[str, Dict[str, Any]] = {}
+        with closing(self.connect()) as conn:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                # in catalog order, so with a duplicate id the last one wins like index_meals_by_id
+                for mid, data in conn.execute(f"SELECT id_meal, data FROM meals WHERE id_meal IN ({marks})"
+                                              " ORDER BY position", chunk):
+                    out[mid] = json.loads(data)
+        return out
+
+    def stats(self) -> Dict[str, int]:
+        if not self.exists():
+            return {"meals": 0, "custom": 0, "ingredient_rows": 0, "distinct_ingredients": 0}
+        with closing(self.connect()) as conn:
+            meals, custom = conn.execute("SELECT COUNT(*), COALESCE(SUM(is_custom), 0) FROM meals").fetchone()
+            rows, distinct = conn.execute("SELECT COUNT(*), COUNT(DISTINCT key) FROM meal_ingredients").fetchone()
+        return {"meals": meals, "custom": custom, "ingredient_rows": rows, "distinct_ingredients": distinct}
+
+    # ---- matching ---- #
+
+    def match(self, owned: Set[str], max_missing: int, top: Optional[int] = 15, offset: int = 0):
+        # Same result as recipe_matcher.match_catalog: (cookable, near, counts), buckets hold
+        # (recipe, missing_count, missing_list). Only the returned rows are read from disk.
+        from recipe_index import Recipe, meal_labels
+
+        if not self.exists():
+            return [], [], {"cookable": 0, "near": 0}
+        keys = sorted(owned)
+        pantry = " UNION ALL ".join("SELECT ?" for _ in keys) or "SELECT NULL WHERE 0"
+        limit = -1 if top is None else top
+
+        with closing(self.connect()) as conn:
+            conn.execute("DROP TABLE IF EXISTS temp.matched")
+            conn.execute(
+                f"""
+                CREATE TEMP TABLE matched AS
+                WITH pantry(key) AS ({pantry}),
+                hits AS (
+                    SELECT mi.meal_rid AS rid, COUNT(*) AS n
+                    FROM meal_ingredients mi JOIN pantry p ON p.key = mi.key
+                    GROUP BY mi.meal_rid
+                )
+                SELECT m.rid AS rid, m.n_keys - h.n AS missing
+                FROM hits h JOIN meals m ON m.rid = h.rid
+                WHERE m.n_keys - h.n <= ?
+                UNION ALL
+                SELECT m.rid, m.n_keys
+                FROM meals m
+                WHERE m.n_keys <= ? AND m.rid NOT IN (SELECT rid FROM hits)
+                """,
+                (*keys, max_missing, max_missing),
+            )
+            counts_row = conn.execute(
+                "SELECT COALESCE(SUM(missing = 0), 0), COALESCE(SUM(missing > 0), 0) FROM matched"
+            ).fetchone()
+            columns = ("SELECT m.position, m.id_meal, m.title, m.image, m.instructions, m.names, "
+                       "m.ingredients, x.missing, m.rid, m.data FROM matched x JOIN meals m ON m.rid = x.rid ")
+            cookable_rows = conn.execute(
+                columns + "WHERE x.missing = 0 ORDER BY m.title_lower, m.position LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+            near_rows = conn.execute(
+                columns + "WHERE x.missing > 0 ORDER BY x.missing, m.title_lower, m.position LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+            # canonical keys for the returned rows only, in their stored order
+            rids = [row[8] for row in cookable_rows + near_rows]
+            keys_by_rid: Dict[int, List[str]] = {rid: [] for rid in rids}
+            for start in range(0, len(rids), 500):
+                chunk = rids[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                for rid, key in conn.execute(
+                    f"SELECT meal_rid, key FROM meal_ingredients WHERE meal_rid IN ({marks}) ORDER BY meal_rid, position",
+                    chunk,
+                ):
+                    keys_by_rid[rid].append(key)
+            conn.execute("DROP TABLE temp.matched")
+
+        def to_match(row) -> Tuple[Any, int, List[str]]:
+            position, mid, title, image, instructions, names, ingredients, missing, rid, data = row
+            names = tuple(json.loads(names))
+            keys = tuple(keys_by_rid[rid])
+            r = Recipe(
+                rid=position,
+                id=mid or "",
+                title=title,
+                image=image,
+                instructions=instructions,
+                names=names,
+                keys=keys,
+                ingredients=tuple(tuple(p) for p in json.loads(ingredients)),
+                labels=meal_labels(json.loads(data)),   # not worth columns: only the returned rows
+            )
+            missing_list = [n for n, k in zip(names, keys) if k not in owned] if missing else []
+            return r, missing, missing_list
+
+        counts = {"cookable": int(counts_row[0]), "near": int(counts_row[1])}
+        return [to_match(r) for r in cookable_rows], [to_match(r) for r in near_rows], counts
+
+
+def migrate_from_json(store: "SqliteRecipeStore" = None) -> int:
+    # One-shot copy of custom_recipes.json + recipes.json into the database
+    from recipe_sources import API_RECIPES_PATH, CUSTOM_RECIPES_PATH, _load_meals_plain_list, _load_meals_themealdb_wrapper
+
+    store = store or SqliteRecipeStore()
+    return store.rebuild(_load_meals_plain_list(CUSTOM_RECIPES_PATH), _load_meals_themealdb_wrapper(API_RECIPES_PATH))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite recipe store.")
+    parser.add_argument("--migrate", action="store_true", help="(Re)build recipes.db from the JSON files")
+    parser.add_argument("--reindex", action="store_true", help="Recompute ingredient keys (after changing synonyms/plural rules)")
+    parser.add_argument("--stats", action="store_true", help="Show what's in recipes.db")
+    parser.add_argument("--db", type=Path, default=None, help=f"Database path (default {DB_PATH})")
+    args = parser.parse_args()
+
+    store = SqliteRecipeStore(args.db)
+    if args.migrate:
+        n = migrate_from_json(store)
+        print(f"[ok] Migrated {n} meal(s) into {store.path}")
+        print("[info] Set RECIPE_STORE=sqlite to use it.")
+    if args.reindex:
+        n = store.reindex()
+        print(f"[ok] Re-keyed {n} meal(s) in {store.path}")
+    if args.stats or not (args.migrate or args.reindex):
+        print(json.dumps(store.stats(), indent=2))
+
+if __name__ == "__main__":
+    main()
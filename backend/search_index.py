@@ -0,0 +1,249 @@
+# Full-text recipe search
+# Search used to be a substring test on the title, run over every matched recipe after
+# matching. Now there is an inverted index over the words of each recipe's title,
+# ingredients, category, area, tags and instructions, built from the loaded Recipe
+# records once per catalog load, and a search picks its recipes first: matching then
+# only looks at those. A search that hits most of the catalog ("chicken", "dinner")
+# goes the other way: the engine matches first and only the matches get scored
+# (see recipe_matcher.match_catalog).
+#
+#   - words go through the same normalization as ingredient names (lowercase, accents
+#     dropped, punctuation removed) and plurals are folded ("tomatoes" -> "tomato")
+#   - every query word has to be found somewhere in the recipe; the last one also
+#     matches as a prefix ("chick" -> chicken, chickpea), for search-as-you-type
+#   - results are ranked with BM25, counting a word in the title more than one in the
+#     instructions (FIELD_WEIGHTS)
+#
+# Each posting stores idf * BM25 weight of the word in that recipe (term frequency,
+# document length and idf are all known at build time), so a query only adds them up.
+# With numpy the adding up happens in one dense score array per query instead of dicts,
+# which matters for words that are in most recipes ("chicken", tags like "dinner").
+#
+# HOW TO RUN:
+    # python backend/search_index.py "chicken curry"
+    # python backend/search_index.py "chick" --limit 20
+# ------------------------------------------------------------
+
+import argparse
+import math
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from itertools import chain
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ingredients import normalize_text, singularize
+from recipe_index import Recipe, get_prepared_recipes, np
+from recipe_sources import get_catalog
+
+# field -> how much one occurrence counts
+FIELD_WEIGHTS: Dict[str, float] = {
+    "title": 3.0,
+    "ingredients": 2.0,
+    "category": 1.5,
+    "area": 1.5,
+    "tags": 1.5,
+    "instructions": 1.0,
+}
+K1 = 1.2
+B = 0.75
+MIN_PREFIX = 2   # shorter last words only match whole words ("a" would match half the index)
+MAX_EXPANSIONS = 50   # a prefix stands for at most this many words, the most common ones
+
+STOPWORDS = frozenset({
+    "a", "an", "and", "the", "of", "in", "on", "to", "for", "with", "into", "onto", "or",
+    "at", "by", "it", "is", "be", "until", "then", "from", "over", "your", "you", "this",
+    "that", "are", "as", "if", "up", "so", "will", "all", "each", "about",
+})
+
+
+@lru_cache(maxsize=1 << 16)
+def _term(word: str) -> str:
+    return singularize(word)
+
+
+def tokenize(text: str) -> List[str]:
+    return [_term(w) for w in normalize_text(text).split() if w not in STOPWORDS]
+
+
+def recipe_fields(r: Recipe) -> Dict[str, str]:
+    # The searchable text of a loaded Recipe record
+    category, area, tags = r.labels
+    return {
+        "title": r.title,
+        "ingredients": " ".join(name for name, _ in r.ingredients),
+        "category": category,
+        "area": area,
+        "tags": tags.replace(",", " "),   # "Curry,Spicy"
+        "instructions": r.instructions,
+    }
+
+
+class SearchIndex:
+    # rids are positions in the catalog, the same ids the matcher uses
+    def __init__(self, docs: Iterable[Dict[str, str]], use_numpy: Optional[bool] = None):
+        tfs: List[Dict[str, float]] = []
+        lengths = array("f")
+        for fields in docs:
+            tf: Dict[str, float] = {}
+            length = 0.0
+            for field, weight in FIELD_WEIGHTS.items():
+                for term in tokenize(fields.get(field) or ""):
+                    tf[term] = tf.get(term, 0.0) + weight
+                    length += weight
+            tfs.append(tf)
+            lengths.append(length)
+        self.n_docs = len(tfs)
+        self.avg_len = (sum(lengths) / self.n_docs) if self.n_docs else 0.0
+
+        # idf is known once every recipe is counted, so postings store the finished
+        # idf * BM25 weight and a query only has to add them up
+        df: Dict[str, int] = {}
+        for term in chain.from_iterable(tfs):
+            df[term] = df.get(term, 0) + 1
+        idf = {t: math.log(1 + (self.n_docs - d + 0.5) / (d + 0.5)) for t, d in df.items()}
+        self.postings: Dict[str, Tuple[array, array]] = {t: (array("I"), array("f")) for t in df}
+        for rid, tf in enumerate(tfs):
+            norm = K1 * (1 - B + B * lengths[rid] / self.avg_len) if self.avg_len else K1
+            for term, f in tf.items():
+                rids, weights = self.postings[term]
+                rids.append(rid)
+                weights.append(idf[term] * f * (K1 + 1) / (f + norm))
+        self.terms: List[str] = sorted(self.postings)   # for prefix lookups
+        self.use_numpy = (np is not None) if use_numpy is None else use_numpy
+
+    def __len__(self) -> int:
+        return self.n_docs
+
+    def expand_prefix(self, prefix: str) -> List[str]:
+        out = []
+        for i in range(bisect_left(self.terms, prefix), len(self.terms)):
+            if not self.terms[i].startswith(prefix):
+                break
+            out.append(self.terms[i])
+        if len(out) > MAX_EXPANSIONS:
+            out.sort(key=lambda t: -len(self.postings[t][0]))
+            out = out[:MAX_EXPANSIONS]
+        return out
+
+    def _groups(self, query: str) -> List[List[str]]:
+        # one list of index terms per query word; the last word also as a prefix
+        words = normalize_text(query).split()
+        groups = []
+        for i, w in enumerate(words):
+            last = i == len(words) - 1
+            if w in STOPWORDS:
+                if not last or len(w) < MIN_PREFIX:
+                    continue
+                terms = set()   # "an" is not indexed, but may be the start of "anchovy"
+            else:
+                terms = {_term(w)} & self.postings.keys()
+            if last and len(w) >= MIN_PREFIX:
+                terms.update(self.expand_prefix(w))
+            groups.append(sorted(terms))
+        return groups
+
+    def estimate(self, query: str) -> int:
+        # Upper bound on how many recipes scores() would return, without scoring:
+        # the rarest query word's postings (prefix expansions added up)
+        groups = self._groups(query)
+        if not groups or not all(groups):
+            return 0
+        return min(self.n_docs, min(sum(len(self.postings[t][0]) for t in g) for g in groups))
+
+    def scores(self, query: str, among: Optional[Iterable[int]] = None) -> Dict[int, float]:
+        # rid -> BM25 score for every recipe containing all query words, or only for
+        # the recipes in `among` (e.g. the ones that already matched the pantry).
+        # Rarest word first, so later words only look up recipes still in the running.
+        groups = self._groups(query)
+        if not groups or not all(groups):
+            return {}
+        if self.use_numpy:
+            return self._scores_numpy(groups, among)
+        groups.sort(key=lambda g: sum(len(self.postings[t][0]) for t in g))
+        result: Optional[Dict[int, float]] = None if among is None else dict.fromkeys(among, 0.0)
+        for terms in groups:
+            best: Dict[int, float] = {}   # several prefix expansions in one recipe count once
+            for term in terms:
+                rids, weights = self.postings[term]
+                for rid, s in zip(rids, weights):
+                    if result is not None and rid not in result:
+                        continue
+                    if s > best.get(rid, 0.0):
+                        best[rid] = s
+            if result is None:
+                result = best
+            else:
+                result = {rid: result[rid] + s for rid, s in best.items()}
+            if not result:
+                break
+        return result or {}
+
+    def _scores_numpy(self, groups: List[List[str]], among: Optional[Iterable[int]]) -> Dict[int, float]:
+        total = np.zeros(self.n_docs)
+        alive = np.ones(self.n_docs, dtype=bool)
+        for terms in groups:
+            # all of a group's postings in one go: a prefix can stand for 50 words
+            # (ufunc.at only takes its fast path when the dtypes already agree)
+            rids = np.concatenate([np.frombuffer(self.postings[t][0], dtype=np.uint32) for t in terms]).astype(np.intp)
+            weights = np.concatenate([np.frombuffer(self.postings[t][1], dtype=np.float32) for t in terms]).astype(np.float64)
+            best = np.zeros(self.n_docs)
+            np.maximum.at(best, rids, weights)
+            alive &= best > 0
+            total += best
+        if among is None:
+            rids = np.flatnonzero(alive)
+        else:
+            rids = np.fromiter(among, dtype=np.int64)
+            rids = rids[alive[rids]]
+        return dict(zip(rids.tolist(), total[rids].tolist()))
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        # (rid, score), best first
+        ranked = sorted(self.scores(query).items(), key=lambda t: (-t[1], t[0]))
+        return ranked if limit is None else ranked[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "recipes": self.n_docs,
+            "terms": len(self.terms),
+            "postings": sum(len(r) for r, _ in self.postings.values()),
+            "avg_len": round(self.avg_len, 1),
+        }
+
+
+def build_search_index(recipes: List[Recipe], use_numpy: Optional[bool] = None) -> SearchIndex:
+    return SearchIndex((recipe_fields(r) for r in recipes), use_numpy)
+
+
+def get_search_index() -> SearchIndex:
+    # Built from the loaded Recipe records (snapshot or parsed), so rids line up
+    # and the raw meals never have to be read again
+    return get_catalog().derived("search_index", lambda: build_search_index(get_prepared_recipes()))
+
+
+def relevance_ranks(scores: Dict[int, float], rids: Iterable[int], n: int) -> List[int]:
+    # Rank list in the shape recipe_matcher.top_buckets takes (rid -> position), so
+    # search results come out best match first instead of by title. Only the given
+    # rids (the ones that matched the pantry) get sorted.
+    ranks = [0] * n
+    for pos, rid in enumerate(sorted(rids, key=lambda rid: (-scores[rid], rid))):
+        ranks[rid] = pos
+    return ranks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the recipe catalog.")
+    parser.add_argument("query", help='Words to look for, e.g. "chicken curry"')
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    index = get_search_index()
+    recipes = get_prepared_recipes()
+    hits = index.search(args.query)
+    print(f"[info] {len(hits)} recipe(s) match {args.query!r}")
+    for rid, score in hits[:args.limit]:
+        print(f" {score:6.2f}  {recipes[rid].title}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+# Shared, memory-mapped catalog for multi-worker deployments
+# With gunicorn -w N every worker used to parse the catalog and build its own index,
+# so memory grew N x catalog size. Here the matcher's data lives in one read-only file
+# that every worker mmaps: the OS keeps a single copy in the page cache and workers
+# only hold a few small objects on top of it.
+#
+# What is in the file (native uint32/uint64 arrays, read in place through memoryview.cast):
+#   sizes, title ranks, the inverted index (CSR: offsets + recipe ids per key),
+#   recipes grouped by size, and every Recipe record as a small pickled blob
+#   that is only decoded when a match is actually shown.
+#
+# A new version is written to a temp file and renamed over the old one, so a worker
+# never sees half a file; workers that still have the old one mapped keep using it
+# until their catalog signature changes and they reopen.
+#
+# HOW TO RUN:
+    # RECIPE_MATCH_ENGINE=shared gunicorn -w 4 app:app        <- workers match from the shared file
+    # python backend/shared_catalog.py --publish               <- (re)write it from the current catalog
+    # python backend/shared_catalog.py --stats
+# ------------------------------------------------------------
+
+import argparse
+import hashlib
+import json
+import mmap
+import pickle
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from atomic_write import atomic_write_bytes
+from catalog_snapshot import load_or_build
+from ingredients import rules_fingerprint
+from recipe_index import Recipe, intern_key, title_ranks
+from recipe_sources import get_catalog
+
+BASE_DIR = Path(__file__).resolve().parent
+SHARED_PATH = BASE_DIR / "data" / "catalog.shared"
+
+MAGIC = b"RCSH"
+FORMAT_VERSION = 2
+# sections, in file order; "recipe_offsets" has one more entry than there are recipes
+SECTIONS = ("sizes", "ranks", "post_offsets", "post_rids", "size_offsets", "size_rids",
+            "recipe_offsets", "recipe_blob", "vocab")
+_HEAD = struct.Struct("=4sII40s")          # magic, format, byte order marker, source hash
+_TABLE = struct.Struct("=" + "QQ" * len(SECTIONS))
+
+
+def source_hash() -> str:
+    # Identifies the catalog the file was built from (same idea as the snapshot header)
+    catalog = get_catalog()
+    data = json.dumps({"sources": [str(p) for p in catalog.paths],
+                       "signature": catalog.source_signature(),
+                       "rules": rules_fingerprint()}, sort_keys=True, default=list)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+# Writing
+def _csr(groups: List[List[int]]):
+    offsets = array("I", [0])
+    values = array("I")
+    for g in groups:
+        values.extend(g)
+        offsets.append(len(values))
+    return offsets, values
+
+
+def write_shared(recipes: List[Recipe], ranks: List[int], path: Path = None, tag: str = "") -> None:
+    path = path or SHARED_PATH
+    vocab: Dict[str, int] = {}
+    postings: List[List[int]] = []
+    by_size: List[List[int]] = []
+    blobs = []
+    for r in recipes:
+        for key in r.keys:
+            kid = vocab.get(key)
+            if kid is None:
+                kid = vocab[key] = len(vocab)
+                postings.append([])
+            postings[kid].append(r.rid)
+        n = len(r.key_ids)
+        while len(by_size) <= n:
+            by_size.append([])
+        by_size[n].append(r.rid)
+        # records carry key ids of this process; store them as ids into the file's vocab
+        state = list(r.to_state())
+        state[4] = array("I", [vocab[k] for k in r.keys]).tobytes()
+        blobs.append(pickle.dumps(tuple(state), protocol=pickle.HIGHEST_PROTOCOL))
+
+    post_offsets, post_rids = _csr(postings)
+    size_offsets, size_rids = _csr(by_size)
+    recipe_offsets = array("Q", [0])
+    for b in blobs:
+        recipe_offsets.append(recipe_offsets[-1] + len(b))
+
+    parts = {
+        "sizes": array("I", [len(r.key_ids) for r in recipes]).tobytes(),
+        "ranks": array("I", ranks).tobytes(),
+        "post_offsets": post_offsets.tobytes(),
+        "post_rids": post_rids.tobytes(),
+        "size_offsets": size_offsets.tobytes(),
+        "size_rids": size_rids.tobytes(),
+        "recipe_offsets": recipe_offsets.tobytes(),
+        "recipe_blob": b"".join(blobs),
+        "vocab": json.dumps(list(vocab)).encode("utf-8"),
+    }
+
+    head_size = _HEAD.size + _TABLE.size
+    table = []
+    body = bytearray()
+    for name in SECTIONS:
+        while (head_size + len(body)) % 8:
+            body.append(0)  # keep every array aligned
+        table += [head_size + len(body), len(parts[name])]
+        body += parts[name]
+    head = _HEAD.pack(MAGIC, FORMAT_VERSION, 0x01020304, (tag or source_hash()).encode("ascii"))
+    atomic_write_bytes(path, head + _TABLE.pack(*table) + bytes(body))
+
+
+def publish(path: Path = None) -> int:
+    # Write the current catalog; returns the number of recipes
+    recipes = load_or_build()
+    write_shared(recipes, title_ranks(recipes), path)
+    return len(recipes)
+
+
+# Reading
+class _Ragged:
+    # Read-only "dict of lists" over a CSR pair; slot_of turns a key into a row number
+    def __init__(self, offsets, values, slot_of):
+        self.offsets = offsets
+        self.values = values
+        self.slot_of = slot_of
+
+    def get(self, key, default=()):
+        slot = self.slot_of(key)
+        if slot is None or slot < 0 or slot + 1 >= len(self.offsets):
+            return default
+        return self.values[self.offsets[slot]:self.offsets[slot + 1]]
+
+
+class SharedRecipes:
+    # Sequence of Recipe records decoded on demand from the mapped file
+    def __init__(self, offsets, blob, vocab: List[str]):
+        self.offsets = offsets
+        self.blob = blob
+        self.vocab = vocab
+        self._remap: Optional[List[int]] = None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, rid: int) -> Recipe:
+        if rid < 0 or rid >= len(self):
+            raise IndexError(rid)
+        if self._remap is None:
+            self._remap = [intern_key(k) for k in self.vocab]  # file key ids -> ours
+        state = pickle.loads(self.blob[self.offsets[rid]:self.offsets[rid + 1]])
+        return Recipe.from_state(state, self._remap)
+
+
+class SharedIndex:
+    # Same shape recipe_matcher.indexed_candidates expects from IngredientIndex
+    # (postings.get / sizes / by_size.get), plus ranks and lazily decoded recipes
+    def __init__(self, path: Path = None):
+        self.path = Path(path or SHARED_PATH)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mm)
+        magic, fmt, marker, tag = _HEAD.unpack_from(view, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise ValueError(f"{self.path} is not a shared catalog (format {FORMAT_VERSION})")
+        if marker != 0x01020304:
+            raise ValueError(f"{self.path} was written on a machine with a different byte order")
+        self.tag = tag.decode("ascii")
+        table = _TABLE.unpack_from(view, _HEAD.size)
+        sec = {name: view[table[2 * i]:table[2 * i] + table[2 * i + 1]] for i, name in enumerate(SECTIONS)}
+
+        vocab = json.loads(bytes(sec["vocab"]))
+        self.key_slots: Dict[str, int] = {k: i for i, k in enumerate(vocab)}
+        self.sizes = sec["sizes"].cast("I")
+        self.ranks = sec["ranks"].cast("I")
+        self.postings = _Ragged(sec["post_offsets"].cast("I"), sec["post_rids"].cast("I"), self.key_slots.get)
+        self.by_size = _Ragged(sec["size_offsets"].cast("I"), sec["size_rids"].cast("I"), lambda n: n)
+        self.recipes = SharedRecipes(sec["recipe_offsets"].cast("Q"), sec["recipe_blob"], vocab)
+
+    def __len__(self) -> int:
+        return len(self.sizes)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "bytes": len(self._mm),
+            "recipes": len(self),
+            "keys": len(self.key_slots),
+            "postings": len(self.postings.values),
+            "source_hash": self.tag,
+        }
+
+
+def open_shared() -> SharedIndex:
+    # The mapped file for the current catalog, (re)publishing it first if it is
+    # missing or was built from other sources. Publishing twice at once is harmless:
+    # both write the same thing and the rename is atomic.
+    want = source_hash()
+    try:
+        index = SharedIndex()
+        if index.tag == want:
+            return index
+    except (OSError, ValueError):
+        pass
+    publish()
+    return SharedIndex()
+
+
+def get_shared_index() -> SharedIndex:
+    # Reopened whenever the catalog's signature changes (e.g. after bulk_import)
+    return get_catalog().derived("shared_index", open_shared)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory-mapped catalog shared by worker processes.")
+    parser.add_argument("--publish", action="store_true", help="Write the file from the current catalog")
+    parser.add_argument("--stats", action="store_true", help="Show what is in the current file")
+    args = parser.parse_args()
+
+    if args.publish or not args.stats:
+        n = publish()
+        print(f"[ok] Published {n} recipe(s) to {SHARED_PATH}")
+    if args.stats:
+        try:
+            print(json.dumps(SharedIndex().stats(), indent=2))
+        except (OSError, ValueError) as e:
+            print(f"[warn] {e}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
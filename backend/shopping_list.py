@@ -0,0 +1,124 @@
+# Shopping list for several recipes
+# Takes a set of recipes (favorites, a meal plan, ...) and works out what to buy:
+#   - ingredients are grouped by canonical key, so "Tomatoes" in one recipe and
+#     "tomato" in another are one line
+#   - amounts come from the QuantityIndex (measures parsed once per catalog load) and
+#     are summed per dimension in base units (g / ml / pcs), so "1 cup" + "200ml" of
+#     milk is 440 ml
+#   - the pantry is subtracted: 500 g needed and 200 g in stock is 300 g to buy
+# Measures we can't read ("to taste", "2 cans") are listed as they are, and only when
+# the pantry doesn't have the ingredient at all. Like the matcher, a pantry amount in
+# another dimension (2 pcs vs 500 g) can't be compared and counts as enough.
+# A recipe listed twice (a meal plan with leftovers night) counts twice.
+#
+# HOW TO RUN:
+    # python backend/shopping_list.py --favorites
+    # python backend/shopping_list.py --ids 52795 52772
+# ------------------------------------------------------------
+
+import argparse
+from typing import Any, Dict, Iterable, List
+
+from ingredients import ingredient_key
+from measures import DIMENSIONS, format_amount
+from recipe_index import Recipe, get_quantity_index, get_recipe_lookup, key_id, key_name
+from recipe_matcher import INVENTORY_PATH, build_inventory_amounts, build_inventory_flags, load_inventory
+from recipe_sources import load_favorite_ids
+
+
+class _Line:
+    # everything the recipes need of one ingredient
+    def __init__(self, name: str):
+        self.name = name
+        self.amounts = [0.0] * len(DIMENSIONS)
+        self.other: List[str] = []      # measures we couldn't read
+        self.recipes: List[str] = []
+
+
+def build_shopping_list(recipes: List[Recipe], inventory: dict) -> Dict[str, Any]:
+    # recipes: Recipe records (repeats allowed); inventory: {"name": {"quantity", "unit"}} or flags
+    qindex = get_quantity_index()
+    n_dims = len(DIMENSIONS)
+    lines: Dict[int, _Line] = {}
+    for r in recipes:
+        for kid, name in zip(r.key_ids, r.names):
+            line = lines.get(kid)
+            if line is None:
+                line = lines[kid] = _Line(name)   # shown as the first recipe spells it
+            if r.title not in line.recipes:
+                line.recipes.append(r.title)
+        measured = set()
+        for i in range(qindex.offsets[r.rid], qindex.offsets[r.rid + 1]):
+            kid, dim = divmod(qindex.slots[i], n_dims)
+            measured.add(kid)
+            lines[kid].amounts[dim] += qindex.amounts[i]
+        for name, measure in r.ingredients:
+            kid = key_id(ingredient_key(name))
+            if kid is not None and kid not in measured and measure.strip():
+                lines[kid].other.append(measure.strip())
+
+    flags = build_inventory_flags(inventory)
+    stock = build_inventory_amounts(inventory)
+    to_buy = []
+    covered = []
+    for kid, line in lines.items():
+        key = key_name(kid)
+        have = [stock.get(kid * n_dims + d) for d in range(n_dims)]
+        in_pantry = flags.get(key, False)
+        buy, need, had = [], [], []
+        for dim, amount in enumerate(line.amounts):
+            if amount <= 0:
+                continue
+            need.append(format_amount(dim, amount))
+            if not in_pantry:
+                buy.append(format_amount(dim, amount))
+            elif have[dim] is not None:
+                had.append(format_amount(dim, have[dim]))
+                if have[dim] < amount * (1 - 1e-9):   # unit factors leave float noise
+                    buy.append(format_amount(dim, amount - have[dim]))
+        other = [] if in_pantry else line.other
+        if buy or other:
+            to_buy.append({"ingredient": key, "name": line.name, "buy": buy, "other": other,
+                           "need": need, "have": had, "recipes": line.recipes})
+        else:
+            covered.append(key)
+    to_buy.sort(key=lambda item: item["ingredient"])
+    return {
+        "recipes": [{"id": r.id, "title": r.title} for r in recipes],
+        "items": to_buy,
+        "in_pantry": sorted(covered),
+    }
+
+
+def recipes_by_ids(ids: Iterable[str]) -> List[Recipe]:
+    # idMeal values -> Recipe records, in the given order; unknown ids are skipped
+    by_id = get_recipe_lookup().by_id
+    return [by_id[str(i).strip()] for i in ids if str(i).strip() in by_id]
+
+
+def print_shopping_list(result: Dict[str, Any]) -> None:
+    print(f"\n============= SHOPPING LIST ({len(result['recipes'])} recipe(s)) =============\n")
+    if not result["items"]:
+        print("(nothing to buy)")
+    for item in result["items"]:
+        what = ", ".join(item["buy"] + item["other"])
+        note = f"   (need {', '.join(item['need'])}, have {', '.join(item['have'])})" if item["have"] else ""
+        print(f" - {item['name']}: {what}{note}")
+    print(f"\n[info] Already in the pantry: {len(result['in_pantry'])} ingredient(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shopping list for several recipes, minus what's in the pantry.")
+    parser.add_argument("--ids", nargs="+", default=[], help="idMeal values (a recipe given twice counts twice)")
+    parser.add_argument("--favorites", action="store_true", help="All favorite recipes")
+    args = parser.parse_args()
+
+    ids = list(args.ids) + (sorted(load_favorite_ids()) if args.favorites else [])
+    recipes = recipes_by_ids(ids)
+    if not recipes:
+        print("No recipes found. Give --ids or --favorites.")
+        return
+    print_shopping_list(build_shopping_list(recipes, load_inventory(INVENTORY_PATH)))
+
+if __name__ == "__main__":
+    main()
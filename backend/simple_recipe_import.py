@@ -6,6 +6,7 @@ import sys
 import json
 from pathlib import Path
 import requests
+from http_cache import HttpCache
 
 OUT_PATH = Path(__file__).resolve().parent / "data" / "recipes.json"
 BASE_URL = "https://www.themealdb.com/api/json/v1/1/search.php?s="
@@ -18,10 +19,9 @@ def main():
     query = sys.argv[1]
     url = f"{BASE_URL}{query}"
 
-    resp = requests.get(url, timeout=20)
-    resp.raise_for_status()
-
-    data = resp.json()
+    # same on-disk cache as bulk_import, so repeating a search costs no network
+    cache = HttpCache()
+    data = cache.get_json(url, lambda headers: requests.get(url, headers=headers, timeout=20))
 
     OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
     OUT_PATH.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
@@ -6,6 +6,10 @@ const newQty = document.getElementById("new-qty");
 const newUnit = document.getElementById("new-unit");
 const addBtn = document.getElementById("add-btn");
 const resetBtn = document.getElementById("reset-btn");
+const saveAllBtn = document.getElementById("save-all-btn");
+
+// Every rendered row, so "Save All" can send them in one request
+let rows = [];
 
 const STANDARD_UNITS = ["pcs","cup","tbsp","tsp","g","kg","ml","L","oz","lbs","cloves","slices",""]
 
@@ -53,6 +57,7 @@ function renderRow(name, item) {
 
     tr.append(nameTd, qtyTd, unitTd, actTd);
     body.appendChild(tr);
+    rows.push({ name, nameInp, qtyInp, unitSel });
 }
 
 // Load full inventory
@@ -60,6 +65,7 @@ async function refresh() {
     const res = await fetch(API);
     const data = await res.json();
     body.innerHTML = "";
+    rows = [];
     Object.entries(data).forEach(([name, item]) => {
         renderRow(name, item);
     });
@@ -99,6 +105,31 @@ async function deleteItem(name) {
 }
 
 
+// One PATCH for the whole table instead of a PUT per row
+async function saveAll() {
+    const ops = [];
+    rows.forEach(row => {
+        const name = row.nameInp.value.trim();
+        if (!name) return;
+        if (name.toLowerCase() !== row.name) {
+            ops.push({ op: "delete", name: row.name });  // renamed
+        }
+        ops.push({ op: "upsert", name, quantity: Number(row.qtyInp.value) || 0, unit: row.unitSel.value });
+    });
+    if (!ops.length) return;
+
+    const res = await fetch(API, {
+        method: "PATCH",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ ops })
+    });
+    if (!res.ok) {
+        const err = await res.json();
+        alert((err.details || []).map(d => d.error).join("\n") || "Save failed");
+    }
+    refresh();
+}
+
 async function resetInventory() {
     await fetch(`${API}/reset`, { method: "POST" });
     refresh();
@@ -106,6 +137,7 @@ async function resetInventory() {
 
 addBtn.onclick = addItem;
 resetBtn.onclick = resetInventory;
+saveAllBtn.onclick = saveAll;
 
 // Initial load
 refresh();